@@ -3,6 +3,8 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+from dispatch_rules import update_customer_names
+from export_cache import dataset_hash, lazy_export
 
 
 st.set_page_config(layout="wide")
@@ -17,30 +19,8 @@ if uploaded_file:
     st.success('File Uploaded Successfully!')
 
     # ---------------- DATA CLEANING ----------------
-    # Customer Name Mapping
-    def update_customer_name(row):
-        name = str(row['Customer Name']).lower()
-        sold_to = str(row['Sold-to Party']).upper()
-        if name.startswith('ashok'):
-            return 'Ashok Leyland'
-        elif name.startswith('tata') and 'advanced' not in name:
-            return 'Tata Motors'
-        elif name.startswith('blue energy'):
-            return 'Blue Energy'
-        elif name.startswith('force'):
-            return 'Force Motors'
-        elif name.startswith('cnh'):
-            return 'CNH'
-        elif name.startswith('bajaj auto'):
-            return 'Bajaj Auto'
-        elif sold_to in ['M0163', 'M0164', 'M0231']:
-            return 'Mahindra Swaraj'
-        elif sold_to in ['M0009', 'M0010', 'M0221']:
-            return 'M&M'
-        else:
-            return row['Customer Name']
-
-    dispatch_df['Updated Customer Name'] = dispatch_df.apply(update_customer_name, axis=1)
+    # Customer Name Mapping (shared alias table in dispatch_rules)
+    dispatch_df['Updated Customer Name'] = update_customer_names(dispatch_df)
 
 
     # Material Category Mapping
@@ -173,7 +153,11 @@ if uploaded_file:
 
     # ---------------- DOWNLOAD CLEANED DATA ----------------
     st.header('Download Cleaned Data')
-    csv = dispatch_df.to_csv(index=False).encode('utf-8')
+    # CSV is generated only when the button is clicked
+    csv = lazy_export(
+        (dataset_hash(uploaded_file), 'Processed_Dispatch_Data.csv'),
+        lambda: dispatch_df.to_csv(index=False).encode('utf-8')
+    )
     st.download_button("Download Processed Data as CSV", data=csv, file_name='Processed_Dispatch_Data.csv', mime='text/csv')
 
 else:
@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatch_rules import update_customer_names  # noqa: E402
+from register import make_register  # noqa: E402
+
+# Updated Customer Name at register scale: update_customer_names (rules once
+# per distinct pair) against the np.select that new2.py used before, which
+# evaluated every rule on every row.
+#
+#   python bench/bench_customer_alias.py --rows 1000000
+
+
+def select_per_row(dispatch_data):
+    return np.select(
+        [
+            dispatch_data['Customer Name'].str.lower().str.startswith('ashok', na=False),
+            dispatch_data['Customer Name'].str.lower().str.startswith('tata', na=False) & ~dispatch_data['Customer Name'].str.lower().str.startswith('tata advanced', na=False),
+            dispatch_data['Customer Name'].str.lower().str.startswith('blue energy', na=False),
+            dispatch_data['Customer Name'].str.lower().str.startswith('force motors', na=False),
+            dispatch_data['Customer Name'].str.lower().str.startswith('cnh', na=False),
+            dispatch_data['Customer Name'].str.lower().str.startswith('bajaj auto', na=False),
+            dispatch_data['Sold-to Party'].str.upper().isin(['M0163', 'M0164', 'M0231']),
+            dispatch_data['Sold-to Party'].str.upper().isin(['M0009', 'M0010', 'M0221']),
+        ],
+        ['Ashok Leyland', 'Tata Motors', 'Blue Energy', 'Force Motors', 'CNH', 'Bajaj Auto', 'Mahindra Swaraj', 'M&M'],
+        default=dispatch_data['Customer Name'],
+    )
+
+
+def best_of(repeat, fn, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the customer alias rules.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--customers', type=int, default=121, help="distinct (Customer Name, Sold-to Party) pairs")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    df = make_register(args.rows, customers=args.customers)
+    pairs = len(df[['Customer Name', 'Sold-to Party']].drop_duplicates())
+    per_pair, aliases = best_of(args.repeat, update_customer_names, df)
+    per_row, expected = best_of(args.repeat, select_per_row, df)
+    assert (aliases.to_numpy() == expected).all(), "aliases differ from the per-row rules"
+    print(f"{args.rows} rows, {pairs} distinct pairs")
+    print(f"update_customer_names  {per_pair:.3f}s")
+    print(f"np.select per row      {per_row:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
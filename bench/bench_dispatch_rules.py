@@ -0,0 +1,106 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatch_rules import mech_kit_numbers, normalize_sold_to, power_kit_numbers  # noqa: E402
+from kit_catalog import KitLookup  # noqa: E402
+
+# Sold-to normalization and the Power / Mech kit number stages against the
+# row-wise apply(axis=1) functions manual_dispatch.py used before; both are
+# checked to give the same column.
+#
+#   python bench/bench_dispatch_rules.py --rows 200000
+
+
+# ---------------- ROW-WISE (previous manual_dispatch.py) ----------------
+
+def sold_to_per_row(df):
+    def normalize(row):
+        sold = str(row.get('Sold-to Party', '')) if pd.notna(row.get('Sold-to Party', '')) else ''
+        plant = str(row.get('Plant', '')).strip()
+        if plant.startswith("2000") and sold.upper().startswith(('A', 'F')):
+            if not sold.endswith('.'):
+                return sold + '.'
+        return sold
+    return df.apply(normalize, axis=1)
+
+
+def power_kit_per_row(df, stg, vp):
+    def get_power_kit(row):
+        desc = str(row.get('Description', '')).strip()
+        part = str(row.get('Part Number', ''))
+        if desc in ['STG GEAR KIT', 'STG GEAR KIT H-Pas']:
+            return stg.get(part, '')
+        if 'VANE PUMP KIT' in desc:
+            return vp.get(part, '')
+        return ''
+    return df.apply(get_power_kit, axis=1)
+
+
+def mech_kit_per_row(df, mech):
+    return df.apply(
+        lambda row: mech.get(str(row.get('Part Number', '')), '')
+        if str(row.get('Part Number', '')).startswith(('7820975', '734097')) else '',
+        axis=1
+    )
+
+
+# ---------------- DATA ----------------
+
+def make_frames(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    register = pd.DataFrame({
+        'Sold-to Party': pd.Series(rng.choice(['A001', 'f002', 'A003.', 'V001', 'B001', 'F004'], rows), dtype=object),
+        'Plant': rng.choice(['2000', '2000 ', '2100', '4000'], rows),
+    })
+    register.loc[rng.random(rows) < 0.02, 'Sold-to Party'] = np.nan
+    parts = np.array([f"{prefix}{i:03d}" for prefix in ('7820975', '734097', '80339') for i in range(400)], dtype=object)
+    schedule = pd.DataFrame({
+        'Description': rng.choice(['STG GEAR KIT', 'STG GEAR KIT H-Pas', 'VANE PUMP KIT 12', 'STG ASSY', None], rows),
+        'Part Number': rng.choice(parts, rows),
+    })
+    kits = {part: f"K{part}" for part in parts[::2]}
+    return register, schedule, kits
+
+
+def _lookup(mapping):
+    # parts sorted, as in a catalog snapshot
+    parts = sorted(mapping)
+    return KitLookup(pa.array(parts, pa.string()), pa.array([mapping[p] for p in parts], pa.string()))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized Sold-to and kit number stages.")
+    parser.add_argument('--rows', type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    register, schedule, kits = make_frames(args.rows)
+    lookup = _lookup(kits)
+    stages = [
+        ('Sold-to', lambda: normalize_sold_to(register, variant='manual'), lambda: sold_to_per_row(register)),
+        ('Power kit', lambda: power_kit_numbers(schedule, lookup, lookup), lambda: power_kit_per_row(schedule, kits, kits)),
+        ('Mech kit', lambda: mech_kit_numbers(schedule, lookup), lambda: mech_kit_per_row(schedule, kits)),
+    ]
+    print(f"{args.rows} rows")
+    for name, vectorized, per_row in stages:
+        vector_time, result = timed(vectorized)
+        row_time, expected = timed(per_row)
+        assert result.tolist() == expected.tolist(), f"{name}: results differ"
+        print(f"{name:<10} vectorized {vector_time:.3f}s   row-wise {row_time:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
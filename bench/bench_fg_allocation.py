@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fg_allocation import FGAllocation  # noqa: E402
+
+# Global FG allocation on generated schedule lines: the baseline allocation
+# (pool keys, order and the greedy pass), its explanation report, and a
+# what-if scenario against it.
+#
+#   python bench/bench_fg_allocation.py --lines 100000
+
+
+def make_case(lines, seed=0, parts=20_000, kits=2_000, customers=60):
+    # schedule lines sharing parts and kits, FG for most of them at three plants
+    rng = np.random.default_rng(seed)
+    part_numbers = np.array([f"80{i:08d}" for i in range(parts)], dtype=object)
+    kit_numbers = np.append(np.array([f"K{i:06d}" for i in range(kits)], dtype=object), [''] * kits)
+    plants = np.array(['2000', '2100', '4000'], dtype=object)
+    schedule = pd.DataFrame({
+        'Customer': rng.choice(np.array([f"Customer {i:03d}" for i in range(customers)], dtype=object), lines),
+        'Part Number': rng.choice(part_numbers, lines),
+        'Kit Part Number': rng.choice(kit_numbers, lines),
+        'Plant': rng.choice(plants, lines, p=[0.5, 0.3, 0.2]),
+        'Balance Dispatch': rng.integers(-10, 500, lines).astype(float),
+    })
+    rows = parts + kits
+    fg = pd.DataFrame({
+        'Material': rng.choice(np.append(part_numbers, kit_numbers[:kits]), rows),
+        'Plant': rng.choice(plants, rows),
+        'Unrestricted': rng.integers(0, 2_000, rows).astype(float),
+    })
+    ranking = [f"Customer {i:03d}" for i in rng.permutation(customers)[:10]]
+    return schedule, fg, ranking
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the global FG allocation.")
+    parser.add_argument('--lines', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    lines, fg, ranking = make_case(args.lines)
+    sources = {'4000': ['2000'], '2100': ['2000']}
+    print(f"{args.lines} lines, {len(fg)} FG rows")
+    for label, plant_sources in (('billing plant only', None), ('with plant sources', sources)):
+        seconds, allocation = min(
+            (timed(lambda: FGAllocation(lines, fg, ranking, plant_sources)) for _ in range(args.repeat)),
+            key=lambda run: run[0],
+        )
+        report_time, _ = timed(allocation.report)
+        material, plant = fg['Material'].iloc[0], fg['Plant'].iloc[0]
+        what_if_time, changed = timed(lambda: allocation.what_if({(material, plant): -500}, ranking[::-1]))
+        print(f"{label:<20} allocation {seconds:.3f}s   report {report_time:.3f}s   "
+              f"what-if {what_if_time:.3f}s ({len(changed)} lines changed)   "
+              f"allocated {allocation.allocated.sum():,.0f} of {allocation.balance.clip(0).sum():,.0f}")
+
+
+if __name__ == '__main__':
+    main()
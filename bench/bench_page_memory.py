@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from streamlit.testing.v1 import AppTest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from register import make_register  # noqa: E402
+
+# Peak memory of one new2.py page rerun, next to the size of the register
+# it filters. The page is run with streamlit's AppTest on a generated
+# register; after the first run a sidebar selection is changed and only
+# that rerun is traced.
+#
+#   python bench/bench_page_memory.py --rows 300000
+#
+# Compare with an earlier revision of the page:
+#   git show ee3f61e~1:new2.py > /tmp/new2_before.py
+#   python bench/bench_page_memory.py --rows 300000 --script /tmp/new2_before.py
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = {
+    'Invoice Value': 'Select Month-Year',
+    'Dispatch Details': 'Select Financial Year',
+    'Daywise Dispatch': 'Select Month-Year',
+}
+
+# the uploaded file is served from disk, the page runs unchanged
+WRAPPER = '''
+import io, runpy, sys
+import streamlit as st
+
+class _Upload(io.BytesIO):
+    name = {name!r}
+
+st.file_uploader = lambda *args, **kwargs: _Upload(open({path!r}, 'rb').read())
+sys.path.insert(0, {root!r})
+runpy.run_path({script!r}, run_name='__main__')
+'''
+
+
+def page_peak(wrapper, page, selectbox, timeout):
+    app = AppTest.from_file(wrapper, default_timeout=timeout)
+    app.run()
+    app.sidebar.radio[0].set_value(page).run()
+    select = next(s for s in app.sidebar.selectbox if s.label == selectbox)
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    select.set_value(select.options[1]).run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if app.exception:
+        raise RuntimeError(f"{page}: {app.exception[0].value}")
+    return peak - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Peak memory of a new2.py page rerun.")
+    parser.add_argument('--rows', type=int, default=300_000)
+    parser.add_argument('--script', default=os.path.join(ROOT, 'new2.py'))
+    parser.add_argument('--page', choices=list(PAGES), action='append', help="page to measure (default: all)")
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args(argv)
+
+    register = make_register(args.rows)
+    with tempfile.TemporaryDirectory() as directory:
+        data = os.path.join(directory, 'register.csv')
+        register.to_csv(data, index=False)
+        wrapper = os.path.join(directory, 'page.py')
+        with open(wrapper, 'w') as f:
+            f.write(WRAPPER.format(name='register.csv', path=data, root=ROOT, script=os.path.abspath(args.script)))
+
+        print(f"{args.rows} rows, register {register.memory_usage(deep=True).sum() / 2**20:.0f} MB in memory")
+        for page in args.page or PAGES:
+            print(f"{page:<18} rerun peak {page_peak(wrapper, page, PAGES[page], args.timeout) / 2**20:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
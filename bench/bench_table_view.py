@@ -0,0 +1,68 @@
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes  # noqa: E402
+
+from register import make_register  # noqa: E402
+from table_view import DEFAULT_PAGE_SIZE, prepare_display  # noqa: E402
+
+# Arrow serialization of a table as st.dataframe does it, for the frame as
+# the pages build it and after prepare_display. The frame has the column
+# kinds read from Excel uploads: part numbers mixing int and str, dates as
+# 'dd-mm-YYYY' strings, quantities mixing int and float.
+#
+#   python bench/bench_table_view.py --rows 200000
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = make_register(rows, seed)
+    # numeric part numbers come out of read_excel as ints
+    material = df['Material'].astype(object)
+    numeric = material.str.fullmatch(r'\d+')
+    df['Material'] = material.where(~numeric, material[numeric].astype(np.int64)).astype(object)
+    quantity = rng.integers(0, 500, rows).astype(object)
+    halves = rng.random(rows) < 0.1
+    quantity[halves] = quantity[halves] + 0.5
+    df['Dispatchable FG'] = quantity
+    return df
+
+
+def timed(fn, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Arrow serialization of display frames.")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    # streamlit logs each fallback to its per-column fixes with a traceback
+    logging.getLogger('streamlit.dataframe_util').setLevel(logging.WARNING)
+    df = make_frame(args.rows)
+    print(f"{args.rows} rows, {df.shape[1]} columns")
+    for label, frame in (('full frame', df), (f"one page ({DEFAULT_PAGE_SIZE} rows)", df.iloc[:DEFAULT_PAGE_SIZE])):
+        raw_time, raw = timed(lambda: convert_pandas_df_to_arrow_bytes(frame), args.repeat)
+        prepare_time, (prepared, _) = timed(lambda: prepare_display(frame), args.repeat)
+        prepared_time, arrow = timed(lambda: convert_pandas_df_to_arrow_bytes(prepared), args.repeat)
+        print(f"{label:<22} serialize as built {raw_time * 1000:7.1f} ms ({len(raw) / 2**20:.1f} MB)   "
+              f"prepare {prepare_time * 1000:7.1f} ms   "
+              f"serialize prepared {prepared_time * 1000:7.1f} ms ({len(arrow) / 2**20:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
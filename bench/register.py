@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+# Generated sales register with the columns the dispatch pages read. Shared
+# by the benchmarks in this directory; the customer list covers every
+# alias rule in dispatch_rules.CUSTOMER_ALIAS_RULES.
+
+CUSTOMERS = np.array([
+    'Ashok Leyland Ltd', 'TATA MOTORS', 'Tata Advanced Sys', 'Force Motors', 'Blue Energy Motors',
+    'Bajaj Auto Ltd', 'Mahindra X', 'M and M Ltd', 'Foo Traders', 'Bar Spares', 'CNH India',
+])
+SOLD_TO = np.array(['A001', 'T001', 'T002', 'F001', 'B001', 'B002', 'M0163', 'M0010', 'S0001', 'S0002', 'C0003'])
+MATERIALS = np.array([
+    '8033912345', '7820975123', '7613911111', '7860911111', '7325012999', '7632975501',
+    'C123', '8043975905', 'M033912', '1234472111', '7340911/RF',
+], dtype=object)
+
+
+def make_register(rows, seed=0, customers=None):
+    # customers: number of distinct (Customer Name, Sold-to Party) pairs; by
+    # default the named ones, more are generated as 'Customer NNN'
+    rng = np.random.default_rng(seed)
+    names, sold_to = CUSTOMERS, SOLD_TO
+    if customers and customers > len(names):
+        extra = np.arange(customers - len(names))
+        names = np.append(names, [f"Customer {i:03d}" for i in extra])
+        sold_to = np.append(sold_to, [f"X{i:04d}" for i in extra])
+    customer = rng.integers(0, len(names), rows)
+    dates = pd.Series((pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 700, rows), 'D')).strftime('%d-%m-%Y'))
+    dates[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        'Customer Name': names[customer],
+        'Sold-to Party': sold_to[customer],
+        'Material': MATERIALS[rng.integers(0, len(MATERIALS), rows)],
+        'Billing Date': dates,
+        'Cust PO Date': dates,
+        'Customer Group': rng.choice(['10', '11', '13', '20', '10.0'], rows),
+        'Basic Amt.LocCur': rng.integers(100, 10000, rows).astype(float),
+        'Tax Amount': rng.integers(10, 1000, rows).astype(float),
+        'Amt.Locl Currency': rng.integers(100, 10000, rows).astype(float),
+        'Inv Qty': rng.integers(0, 10, rows),
+        'Kit Qty': rng.integers(0, 3, rows),
+        'Plant': rng.choice([2000, 2100, 4000], rows),
+        'Billing Doc No.': rng.integers(90000000, 90000000 + max(rows // 3, 1), rows),
+        'Sales Order No': rng.choice(['1012345', '2012345', '3012'], rows),
+        'Item': rng.choice([10, 20, 30], rows),
+    })
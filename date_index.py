@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# Billing-date index for a frame kept sorted by date, rows without a date
+# last. Date-range, month and financial-year selections are contiguous runs
+# of rows, found by binary search, so a page can take them with iloc (a view,
+# no copy) instead of comparing every row.
+
+MONTH_LABEL_FORMAT = '%d %B-%y'  # '01 ' + Month-Year label, e.g. '01 April-24'
+FY_START_MONTH = 4
+
+
+def date_order(df, column):
+    # stable: rows of the same day keep their file order; NaT sorts last
+    days = df[column].dt.normalize().to_numpy()
+    return np.argsort(days, kind='stable')
+
+
+def sort_by_date(df, column):
+    return df.iloc[date_order(df, column)].reset_index(drop=True)
+
+
+def financial_year_labels(dates):
+    # 'FY 2024-25' for April 2024 - March 2025; None where the date is missing
+    start = dates.dt.year - (dates.dt.month < FY_START_MONTH)
+    labels = 'FY ' + start.astype('Int64').astype(str) + '-' + (start + 1).astype('Int64').astype(str).str[-2:]
+    return labels.astype(object).where(dates.notna(), None)
+
+
+def month_bounds(label):
+    start = pd.to_datetime('01 ' + label, format=MONTH_LABEL_FORMAT)
+    return start, start + pd.offsets.MonthEnd(0)
+
+
+def financial_year_bounds(label):
+    start_year = int(label.split()[1][:4])
+    return pd.Timestamp(start_year, FY_START_MONTH, 1), pd.Timestamp(start_year + 1, FY_START_MONTH, 1) - pd.Timedelta(days=1)
+
+
+def intersect(*slices):
+    start = max(s.start for s in slices)
+    return slice(start, max(start, min(s.stop for s in slices)))
+
+
+class DateIndex:
+
+    def __init__(self, dates):
+        # dates: the day of each row, in row order (ascending, NaT last)
+        self.dates = pd.to_datetime(pd.Series(dates)).dt.normalize().to_numpy(dtype='datetime64[ns]')
+        self._dated = len(self.dates) - int(np.isnat(self.dates).sum())
+
+    def __len__(self):
+        return len(self.dates)
+
+    def take(self, positions):
+        # index of a row subset (ascending positions keep the order)
+        return DateIndex(self.dates[positions])
+
+    @property
+    def all(self):
+        return slice(0, len(self.dates))
+
+    @property
+    def min(self):
+        return pd.Timestamp(self.dates[0]) if self._dated else pd.NaT
+
+    @property
+    def max(self):
+        return pd.Timestamp(self.dates[self._dated - 1]) if self._dated else pd.NaT
+
+    def between(self, start, end):
+        # rows dated start..end, both inclusive
+        dated = self.dates[:self._dated]
+        lo = np.searchsorted(dated, np.datetime64(pd.Timestamp(start).normalize()), side='left')
+        hi = np.searchsorted(dated, np.datetime64(pd.Timestamp(end).normalize()), side='right')
+        return slice(int(lo), int(max(lo, hi)))
+
+    def month(self, label):
+        return self.between(*month_bounds(label))
+
+    def financial_year(self, label):
+        return self.between(*financial_year_bounds(label))
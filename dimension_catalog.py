@@ -0,0 +1,104 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Option lists for the sidebar filters, computed once per dataset instead of
+# scanning the frame on every rerun. A catalog can be extended with more
+# rows (update) and only the new values are merged in.
+#
+# Sorted catalogs reproduce sorted(col.dropna().unique()); unsorted ones keep
+# first-appearance order like col.unique() (missing values included).
+# Columns absent from the data have no values.
+# text_columns are compared and listed as str, as the pages do for Plant,
+# Material and Billing Doc No.
+
+ALL = 'All'
+MAX_SESSION_CATALOGS = 4
+
+_MISSING = object()  # stands in for NaN/None, which do not work as dict keys
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value) or value is pd.NA or value is pd.NaT
+
+
+class DimensionCatalog:
+
+    def __init__(self, columns=(), text_columns=(), hierarchies=(), sort=True):
+        # hierarchies: (parent column, child column) pairs, e.g. Updated
+        # Customer Name -> Customer Name
+        self._text_columns = set(text_columns)
+        self._sort = sort
+        self._values = {col: {} for col in list(columns) + list(text_columns)}
+        self._children = {pair: {} for pair in hierarchies}
+        self._lists = {}
+
+    def _distinct(self, df, col):
+        values = pd.unique(df[col].to_numpy())
+        if col in self._text_columns:
+            values = [v if _is_missing(v) else str(v) for v in values]
+        return values
+
+    def update(self, df):
+        for col, seen in self._values.items():
+            if col not in df.columns:
+                continue
+            before = len(seen)
+            for value in self._distinct(df, col):
+                if _is_missing(value):
+                    if self._sort:
+                        continue
+                    value = _MISSING
+                seen.setdefault(value, True)
+            if len(seen) != before:
+                self._lists.pop(col, None)
+
+        for (parent, child), children in self._children.items():
+            if parent not in df.columns or child not in df.columns:
+                continue
+            pairs = df[[parent, child]].dropna().drop_duplicates()
+            for parent_value, child_value in zip(pairs[parent], pairs[child]):
+                group = children.setdefault(parent_value, {})
+                if child_value not in group:
+                    group[child_value] = True
+                    self._lists.pop((parent, child, parent_value), None)
+        return self
+
+    def values(self, col):
+        # distinct values of col (a new list, safe to modify)
+        if col not in self._lists:
+            values = [np.nan if v is _MISSING else v for v in self._values[col]]
+            self._lists[col] = sorted(values) if self._sort else values
+        return list(self._lists[col])
+
+    def options(self, col):
+        return [ALL] + self.values(col)
+
+    def child_options(self, parent, child, parent_value):
+        # options of `child` restricted to rows where parent == parent_value
+        if parent_value == ALL:
+            return self.options(child)
+        key = (parent, child, parent_value)
+        if key not in self._lists:
+            self._lists[key] = sorted(self._children[(parent, child)].get(parent_value, {}))
+        return [ALL] + self._lists[key]
+
+
+def session_catalog(key, df, extends=None, **spec):
+    # One catalog per dataset key (e.g. upload hash) kept in session state.
+    # extends: (key of the catalog of an earlier version of df, boolean mask
+    # of the rows of df added since); that catalog is taken over and only
+    # the added rows are merged in.
+    catalogs = st.session_state.setdefault('_dimension_catalogs', OrderedDict())
+    if key not in catalogs:
+        base = catalogs.pop(extends[0], None) if extends else None
+        if base is not None:
+            catalogs[key] = base.update(df[extends[1]])
+        else:
+            catalogs[key] = DimensionCatalog(**spec).update(df)
+        while len(catalogs) > MAX_SESSION_CATALOGS:
+            catalogs.popitem(last=False)
+    catalogs.move_to_end(key)
+    return catalogs[key]
@@ -0,0 +1,219 @@
+import numpy as np
+import pandas as pd
+
+# Business rules shared by the dispatch apps (app.py, new2.py,
+# manual_dispatch.py, new_dispatch.py). Everything here is vectorized so
+# it scales linearly with the sales register.
+
+
+# ---------------- INVOICE DEDUP ----------------
+# "Sales Order starts with 10 / Billing Doc duplicates / keep Item 10".
+# The pages apply the rule slightly differently, so each behaviour is an
+# explicit variant:
+#   'register' - schedule apps: SO-10 rows always kept; among the other rows a
+#                Billing Doc seen more than once keeps only Item 10.
+#                Rows come back grouped as [SO-10, unique, duplicates].
+#   'daywise'  - Daywise page: Billing Doc counted over all rows; keep a row if
+#                its doc is unique, its SO starts with 10, or it is Item 10.
+#                Row order and index are preserved.
+#   'invoice'  - Invoice Value page: keep every row of a Billing Doc that has
+#                any SO-10 row, otherwise only its Item 10 rows. Rows without
+#                a Billing Doc are dropped.
+
+DEDUP_VARIANTS = ('register', 'daywise', 'invoice')
+
+
+def _doc_counts(codes, rows):
+    # occurrences of each Billing Doc code over the selected rows (NaN codes are -1)
+    valid = rows & (codes >= 0)
+    counts = np.bincount(codes[valid], minlength=codes.max() + 1 if len(codes) else 0)
+    return np.where(codes >= 0, counts[np.maximum(codes, 0)], 0)
+
+
+def _register_blocks(so_10, codes):
+    # 0: SO-10 rows, 1: unique Billing Doc among the rest, 2: duplicated Billing Doc
+    duplicated = ~so_10 & (_doc_counts(codes, ~so_10) > 1)
+    return np.where(so_10, 0, np.where(duplicated, 2, 1)).astype(np.int8)
+
+
+def dedup_mask(df, variant='register', billing_col='Billing Doc No.', so_col='Sales Order No', item_col='Item'):
+    if variant not in DEDUP_VARIANTS:
+        raise ValueError(f"Unknown dedup variant: {variant}")
+
+    n = len(df)
+    so_10 = df[so_col].astype(str).str.startswith('10').to_numpy(dtype=bool)
+    if item_col in df.columns:
+        item_10 = (df[item_col] == 10).to_numpy(dtype=bool)
+    else:
+        # no Item column: duplicates cannot be narrowed down, keep them
+        item_10 = np.ones(n, dtype=bool)
+
+    if billing_col is None or billing_col not in df.columns:
+        # no Billing Doc column: every row counts as a unique invoice
+        return np.ones(n, dtype=bool)
+
+    codes, _ = pd.factorize(df[billing_col])
+
+    if variant == 'register':
+        return (_register_blocks(so_10, codes) < 2) | item_10
+
+    if variant == 'daywise':
+        unique = _doc_counts(codes, np.ones(n, dtype=bool)) == 1
+        # rows without a Billing Doc are treated as unique invoices
+        return unique | (codes < 0) | so_10 | item_10
+
+    valid = codes >= 0
+    doc_has_so_10 = np.bincount(codes[valid], weights=so_10[valid], minlength=codes.max() + 1 if n else 0) > 0
+    return valid & (doc_has_so_10[np.maximum(codes, 0)] | item_10)
+
+
+def dedup_dispatch(df, variant='register', billing_col='Billing Doc No.', so_col='Sales Order No', item_col='Item'):
+    mask = dedup_mask(df, variant, billing_col, so_col, item_col)
+
+    if variant == 'daywise':
+        return df[mask]
+
+    if variant == 'register':
+        so_10 = df[so_col].astype(str).str.startswith('10').to_numpy(dtype=bool)
+        if billing_col is None or billing_col not in df.columns:
+            # no duplicates can be found, but SO-10 rows still come first
+            blocks = np.where(so_10, 0, 1).astype(np.int8)
+        else:
+            codes, _ = pd.factorize(df[billing_col])
+            blocks = _register_blocks(so_10, codes)
+        # stable radix sort on the int8 block id keeps the [SO-10, unique, duplicates] order
+        order = np.argsort(blocks[mask], kind='stable')
+        return df[mask].iloc[order].reset_index(drop=True)
+
+    # 'invoice': rows come back ordered by Billing Doc, as the per-doc groupby did
+    kept = df[mask]
+    codes, _ = pd.factorize(kept[billing_col], sort=True)
+    return kept.iloc[np.argsort(codes, kind='stable')].reset_index(drop=True)
+
+
+# ---------------- CUSTOMER ALIASES ----------------
+# Single source for "Updated Customer Name". Rules are checked in order; the
+# first match wins, otherwise the original Customer Name is kept.
+# (alias, Customer Name prefixes, excluded Customer Name prefixes, Sold-to Party codes)
+
+CUSTOMER_ALIAS_RULES = [
+    ('Ashok Leyland', ('ashok',), (), ()),
+    ('Tata Motors', ('tata',), ('tata advanced',), ()),
+    ('Blue Energy', ('blue energy',), (), ()),
+    ('Force Motors', ('force motors',), (), ()),
+    ('CNH', ('cnh',), (), ()),
+    ('Bajaj Auto', ('bajaj auto',), (), ()),
+    ('Mahindra Swaraj', (), (), ('M0163', 'M0164', 'M0231')),
+    ('M&M', (), (), ('M0009', 'M0010', 'M0221')),
+]
+
+
+def _alias_for_pairs(names, sold_to):
+    # names / sold_to: one entry per distinct (Customer Name, Sold-to Party) pair
+    lower = names.astype(str).str.lower()
+    upper = sold_to.astype(str).str.upper()
+    conditions = []
+    for alias, prefixes, excluded, codes in CUSTOMER_ALIAS_RULES:
+        cond = np.zeros(len(names), dtype=bool)
+        if prefixes:
+            cond |= lower.str.startswith(prefixes).to_numpy(dtype=bool)
+            if excluded:
+                cond &= ~lower.str.startswith(excluded).to_numpy(dtype=bool)
+        if codes:
+            cond |= upper.isin(codes).to_numpy(dtype=bool)
+        conditions.append(cond)
+    aliases = [alias for alias, _, _, _ in CUSTOMER_ALIAS_RULES]
+    return np.select(conditions, aliases, default=names.to_numpy(dtype=object))
+
+
+def update_customer_names(df, name_col='Customer Name', sold_to_col='Sold-to Party'):
+    # The register has a few hundred distinct customers against up to millions
+    # of rows: evaluate the rules once per distinct pair and map back by codes.
+    name_codes, name_uniques = pd.factorize(df[name_col])
+    sold_codes, sold_uniques = pd.factorize(df[sold_to_col])
+
+    width = len(sold_uniques) + 1
+    pair_codes, pairs = pd.factorize(name_codes.astype(np.int64) * width + (sold_codes + 1))
+    pair_name_codes = pairs // width
+    pair_sold_codes = pairs % width - 1
+
+    # code -1 (missing value) picks the trailing NaN
+    pair_names = pd.Series(np.append(np.asarray(name_uniques, dtype=object), np.nan)[pair_name_codes], dtype=object)
+    pair_sold = pd.Series(np.append(np.asarray(sold_uniques, dtype=object), np.nan)[pair_sold_codes], dtype=object)
+    pair_alias = _alias_for_pairs(pair_names, pair_sold)
+
+    return pd.Series(pair_alias[pair_codes], index=df.index, dtype=object)
+
+
+# ---------------- SOLD-TO NORMALIZATION ----------------
+# Plant 2000 invoices are booked against a separate customer code in the
+# schedule: the Sold-to Party gets a trailing ".". Variants:
+#   'manual' - Manual Dispatch page: Plant starting with "2000" and Sold-to
+#              starting with A or F (any case); the "." is added once.
+#              Missing Sold-to becomes ''.
+#   'report' - Schedule vs Dispatch report: Plant == 2000 and Sold-to not
+#              starting with V (any case); other values are left untouched.
+
+SOLD_TO_VARIANTS = ('manual', 'report')
+DOTTED_SOLD_TO_PLANT = 2000
+DOTTED_SOLD_TO_PREFIXES = ('A', 'F')
+
+
+def normalize_sold_to(df, variant='manual', sold_to_col='Sold-to Party', plant_col='Plant'):
+    if variant not in SOLD_TO_VARIANTS:
+        raise ValueError(f"Unknown Sold-to variant: {variant}")
+
+    if variant == 'report':
+        # str() of every value, missing ones included ('nan.')
+        text = df[sold_to_col].astype(str).fillna('nan')
+        dotted = (df[plant_col] == DOTTED_SOLD_TO_PLANT) & ~text.str.upper().str.startswith('V')
+        return df[sold_to_col].mask(dotted, text + '.')
+
+    sold = df[sold_to_col].where(df[sold_to_col].notna(), '').astype(str)
+    if plant_col not in df.columns:
+        return sold
+    plant = df[plant_col].astype(str).str.strip()
+    dotted = (
+        plant.str.startswith(str(DOTTED_SOLD_TO_PLANT)).fillna(False).astype(bool)
+        & sold.str.upper().str.startswith(DOTTED_SOLD_TO_PREFIXES)
+        & ~sold.str.endswith('.')
+    )
+    return sold.mask(dotted, sold + '.')
+
+
+# ---------------- KIT PART NUMBERS ----------------
+# Schedule rows that are kits get the kit part number from the Kit catalog
+# (kit_catalog.KitLookup); other rows get ''.
+
+POWER_STG_KIT_DESCRIPTIONS = ('STG GEAR KIT', 'STG GEAR KIT H-Pas')
+POWER_VP_KIT_DESCRIPTION = 'VANE PUMP KIT'
+MECH_KIT_PART_PREFIXES = ('7820975', '734097')
+
+
+def _kit_numbers(parts, rules, index):
+    # rules: (row mask, lookup) pairs; the first matching rule wins
+    kits = np.full(len(parts), '', dtype=object)
+    taken = np.zeros(len(parts), dtype=bool)
+    for mask, lookup in rules:
+        rows = mask & ~taken
+        kits[rows] = lookup.map(parts[rows])
+        taken |= rows
+    return pd.Series(kits, index=index, dtype=object)
+
+
+def power_kit_numbers(df, lookup_stg, lookup_vp, desc_col='Description', part_col='Part Number'):
+    if desc_col not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    desc = df[desc_col].astype(str).str.strip()
+    parts = df[part_col].astype(str).to_numpy(dtype=object)
+    return _kit_numbers(parts, [
+        (desc.isin(POWER_STG_KIT_DESCRIPTIONS).to_numpy(dtype=bool), lookup_stg),
+        (desc.str.contains(POWER_VP_KIT_DESCRIPTION, regex=False).fillna(False).to_numpy(dtype=bool), lookup_vp),
+    ], df.index)
+
+
+def mech_kit_numbers(df, lookup_mech, part_col='Part Number'):
+    parts = df[part_col].astype(str)
+    return _kit_numbers(parts.to_numpy(dtype=object), [
+        (parts.str.startswith(MECH_KIT_PART_PREFIXES).fillna(False).to_numpy(dtype=bool), lookup_mech),
+    ], df.index)
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+# Drill-down totals for the OEM page, materialized once per dataset.
+# Rows are first summed into a cube over the hierarchy
+#   Updated Customer Name -> Customer Name -> Model New -> Material
+# crossed with Month-Year and Material Category. From the cube, every
+# breakdown the page charts is pre-aggregated for each combination of
+# selectable levels, with and without a month, for each category and for all
+# categories (ALL). Drilling down or up is then a lookup on a sorted index
+# instead of a groupby over the register.
+#
+# Like a plain groupby, rows missing any key or breakdown value are left out.
+
+ALL = 'All'
+LEVELS = ('Updated Customer Name', 'Customer Name', 'Model New', 'Material')
+MONTH = 'Month-Year'
+MONTH_START = 'Month Start Date'
+CATEGORY = 'Material Category'
+MEASURES = ('Inv Qty', 'Basic Amt.LocCur')
+# level combinations the page can select (Customer Name also without its parent)
+SELECTIONS = (
+    (),
+    ('Updated Customer Name',),
+    ('Customer Name',),
+    ('Updated Customer Name', 'Customer Name'),
+)
+
+BREAKDOWNS = (
+    ('Updated Customer Name',),
+    ('Customer Name',),
+    ('Model New',),
+    ('Material', 'Updated Customer Name'),
+    (MONTH, MONTH_START, 'Updated Customer Name'),
+)
+MAX_SESSION_ROLLUPS = 4
+
+
+def _grouping_sets(cube, keys, breakdown):
+    # totals per keys + category + breakdown, plus the same with category ALL
+    by_category = cube.groupby(keys + [CATEGORY] + breakdown)[list(MEASURES)].sum()
+    overall = cube.groupby(keys + breakdown)[list(MEASURES)].sum()
+    # category goes after the keys (by position: key and breakdown names may repeat)
+    order = list(range(1, len(keys) + 1)) + [0] + list(range(len(keys) + 1, len(keys) + len(breakdown) + 1))
+    overall = pd.concat({ALL: overall}, names=[CATEGORY]).reorder_levels(order)
+    return pd.concat([by_category, overall]).sort_index()
+
+
+class DrillRollup:
+
+    def __init__(self, df, selections=SELECTIONS, breakdowns=BREAKDOWNS):
+        columns = list(LEVELS) + [MONTH, MONTH_START, CATEGORY]
+        cube = df.groupby(columns, dropna=False, sort=False)[list(MEASURES)].sum().reset_index()
+        self._tables = {}
+        for levels in selections:
+            for by_month in (False, True):
+                keys = list(levels) + ([MONTH] if by_month else [])
+                for breakdown in breakdowns:
+                    if by_month and MONTH in breakdown:
+                        continue  # served from the all-months table
+                    self._tables[(tuple(levels), by_month, breakdown)] = _grouping_sets(cube, keys, list(breakdown))
+
+    def totals(self, breakdown, selection=None, month=ALL, category=ALL):
+        # Measures by breakdown for rows matching `selection` ({level: value},
+        # 'All' = no filter), `month` and `category`; indexed by the
+        # breakdown, sorted by key
+        selection = {level: value for level, value in (selection or {}).items() if value != ALL}
+        levels = tuple(level for level in LEVELS if level in selection)
+        breakdown = tuple(breakdown)
+        by_month = month != ALL and MONTH not in breakdown
+        table = self._tables[(levels, by_month, breakdown)]
+        key = tuple(selection[level] for level in levels) + ((month,) if by_month else ()) + (category,)
+        try:
+            result = table.loc[key]
+        except KeyError:
+            result = table.iloc[:0].droplevel(list(range(len(key))))
+        if month != ALL and not by_month:
+            result = result[result.index.get_level_values(MONTH) == month]
+        return result
+
+
+def session_rollup(key, df, **spec):
+    # One rollup per dataset key (e.g. upload hash) kept in session state
+    rollups = st.session_state.setdefault('_drill_rollups', OrderedDict())
+    if key not in rollups:
+        rollups[key] = DrillRollup(df, **spec)
+        while len(rollups) > MAX_SESSION_ROLLUPS:
+            rollups.popitem(last=False)
+    rollups.move_to_end(key)
+    return rollups[key]
@@ -0,0 +1,209 @@
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from io import BytesIO
+
+from openpyxl import Workbook
+from openpyxl.styles import Font, Border, Side, Alignment
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.dataframe import dataframe_to_rows
+
+# Sheets are rendered in worker processes (openpyxl is pure Python, so threads
+# would serialize on the GIL) and then grafted into the final workbook here.
+# The serial path goes through the same render + graft steps, so parallel and
+# serial runs produce identical workbooks.
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(max_workers=None):
+    # one pool per worker count, shared by every caller asking for that count
+    with _pools_lock:
+        pool = _pools.get(max_workers)
+        if pool is None:
+            # spawn: the Streamlit server is multi-threaded, fork is not safe there
+            pool = _pools[max_workers] = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return pool
+
+
+@atexit.register
+def _shutdown_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+# ---------------- SHEET WRITERS ----------------
+# Writers must live in an importable module so worker processes can unpickle them.
+
+def format_worksheet(ws):
+    thin = Side(border_style="thin", color="000000")
+    for i, row in enumerate(ws.iter_rows(), 1):
+        is_header = (i == 1)
+        is_subtotal = False
+        for cell in row:
+            if is_header:
+                cell.font = Font(bold=True)
+            if str(cell.value).strip().lower() == "subtotal":
+                is_subtotal = True
+        if is_subtotal:
+            for c in row:
+                c.font = Font(bold=True)
+        for cell in row:
+            cell.border = Border(top=thin, bottom=thin, left=thin, right=thin)
+            if is_header or is_subtotal:
+                cell.alignment = Alignment(horizontal="center")
+    # Auto-fit columns
+    for col in ws.columns:
+        max_length = 0
+        col_letter = col[0].column_letter
+        for cell in col:
+            length = len(str(cell.value)) if cell.value is not None else 0
+            if length > max_length:
+                max_length = length
+        ws.column_dimensions[col_letter].width = max_length + 2
+
+
+def write_fg_sheet(ws, df):
+    for row in dataframe_to_rows(df, index=False, header=True):
+        ws.append(row)
+    format_worksheet(ws)
+
+
+def write_aging_sheet(ws, data):
+    border_style = Border(
+        left=Side(border_style="thin"),
+        right=Side(border_style="thin"),
+        top=Side(border_style="thin"),
+        bottom=Side(border_style="thin")
+    )
+    for customer, group in data.groupby('Name'):
+        ws.append([])  # Blank row before customer header
+        ws.append([customer])
+        cell = ws.cell(row=ws.max_row, column=1)
+        cell.font = Font(bold=True)
+        cell.alignment = Alignment(horizontal='left')
+        ws.merge_cells(start_row=ws.max_row, start_column=1, end_row=ws.max_row, end_column=11)
+        ws.append([])  # Blank row after customer header
+
+        ws.append(['Code', 'Name', 'Inv No', 'Inv Date', 'Item Code', 'Item Desc',
+                   'Qty', 'Amount', 'Days', 'GDN Receipt', 'ASN'])
+        header_row = ws.max_row
+        for col in range(1, 12):
+            ws.cell(row=header_row, column=col).border = border_style
+
+        for r in dataframe_to_rows(group, index=False, header=False):
+            ws.append(r)
+            for col in range(1, 12):
+                ws.cell(row=ws.max_row, column=col).border = border_style
+
+        ws.append([])  # Blank row after each group
+
+    # Auto-fit columns
+    for col_idx, col_cells in enumerate(ws.columns, 1):
+        max_length = 0
+        for cell in col_cells:
+            if not cell.value or cell.coordinate in ws.merged_cells:
+                continue
+            max_length = max(max_length, len(str(cell.value)))
+        adjusted_width = max_length + 2
+        ws.column_dimensions[get_column_letter(col_idx)].width = adjusted_width
+
+
+# ---------------- RENDER + ASSEMBLE ----------------
+
+def render_sheet(writer, sheet_name, df):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = sheet_name
+    writer(ws, df)
+    return ws
+
+
+def _remap_style(style, src_wb, dst_wb):
+    style = copy(style)
+    style.fontId = dst_wb._fonts.add(src_wb._fonts[style.fontId])
+    style.fillId = dst_wb._fills.add(src_wb._fills[style.fillId])
+    style.borderId = dst_wb._borders.add(src_wb._borders[style.borderId])
+    style.protectionId = dst_wb._protections.add(src_wb._protections[style.protectionId])
+    style.alignmentId = dst_wb._alignments.add(src_wb._alignments[style.alignmentId])
+    if style.numFmtId >= BUILTIN_FORMATS_MAX_SIZE:
+        fmt = src_wb._number_formats[style.numFmtId - BUILTIN_FORMATS_MAX_SIZE]
+        style.numFmtId = dst_wb._number_formats.add(fmt) + BUILTIN_FORMATS_MAX_SIZE
+    return style
+
+
+def graft_sheet(wb, ws):
+    # Move a worksheet rendered in its own workbook into `wb`, re-indexing the
+    # style ids against the destination workbook's style tables.
+    src_wb = ws.parent
+    remapped = {}
+
+    def remap(obj):
+        if not obj._style:
+            return
+        key = tuple(obj._style)
+        if key not in remapped:
+            remapped[key] = _remap_style(obj._style, src_wb, wb)
+        obj._style = copy(remapped[key])
+
+    for cell in ws._cells.values():
+        remap(cell)
+    for dim in list(ws.column_dimensions.values()) + list(ws.row_dimensions.values()):
+        remap(dim)
+
+    ws._parent = wb
+    wb._sheets.append(ws)
+    return ws
+
+
+def assemble_workbook(worksheets):
+    out = BytesIO()
+    wb = Workbook()
+    wb.remove(wb.active)
+    for ws in worksheets:
+        graft_sheet(wb, ws)
+    wb.save(out)
+    out.seek(0)
+    return out
+
+
+def build_workbooks(workbooks, writer, parallel=True, max_workers=None, progress=None):
+    # workbooks: {workbook name: {sheet name: DataFrame}}
+    # returns {workbook name: BytesIO}, in the same order as the input
+    # progress(step, total) is called as each sheet is rendered
+    tasks = [
+        (book_name, sheet_name, df)
+        for book_name, sheets in workbooks.items()
+        for sheet_name, df in sheets.items()
+    ]
+
+    if parallel and len(tasks) > 1:
+        pool = _get_pool(max_workers)
+        futures = [pool.submit(render_sheet, writer, sheet_name, df) for _, sheet_name, df in tasks]
+        rendered = []
+        for (_, sheet_name, _), future in zip(tasks, futures):
+            rendered.append(future.result())
+            if progress:
+                progress(sheet_name, len(tasks))
+    else:
+        rendered = []
+        for _, sheet_name, df in tasks:
+            rendered.append(render_sheet(writer, sheet_name, df))
+            if progress:
+                progress(sheet_name, len(tasks))
+
+    outputs = {}
+    for book_name in workbooks:
+        book_sheets = [ws for (name, _, _), ws in zip(tasks, rendered) if name == book_name]
+        outputs[book_name] = assemble_workbook(book_sheets)
+    return outputs
+
@@ -0,0 +1,58 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Download files are generated only when the user clicks the download button
+# (st.download_button runs a callable `data` on demand), and the bytes are
+# kept per (dataset hash, view, filter state), so filter tweaks never pay the
+# export cost and repeated downloads of the same view are free.
+
+MAX_CACHED_EXPORTS = 32
+
+_exports = OrderedDict()
+_lock = threading.Lock()
+
+
+def dataset_hash(*files):
+    # Uploaded files (or None) that the report is built from
+    digest = hashlib.sha1()
+    for f in files:
+        digest.update(b'\0' if f is None else f.getvalue())
+    return digest.hexdigest()
+
+
+def filter_state(**filters):
+    # Hashable, order-independent snapshot of the sidebar selections
+    return tuple(sorted(
+        (name, tuple(value) if isinstance(value, (list, tuple, set)) else value)
+        for name, value in filters.items()
+    ))
+
+
+def cached_export(key):
+    # bytes built earlier for key, or None
+    with _lock:
+        if key in _exports:
+            _exports.move_to_end(key)
+            return _exports[key]
+    return None
+
+
+def store_export(key, data):
+    if hasattr(data, 'getvalue'):
+        data = data.getvalue()
+    with _lock:
+        _exports[key] = data
+        while len(_exports) > MAX_CACHED_EXPORTS:
+            _exports.popitem(last=False)
+    return data
+
+
+def lazy_export(key, build):
+    # Returns a zero-argument callable for st.download_button(data=...)
+    def generate():
+        data = cached_export(key)
+        if data is None:
+            data = store_export(key, build())
+        return data
+    return generate
@@ -1,9 +1,12 @@
+import os
+from datetime import date
+
 import streamlit as st
 import pandas as pd
-from io import BytesIO
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import Font, Border, Side, Alignment
-from openpyxl import Workbook
+from excel_export import build_workbooks, write_fg_sheet
+from export_cache import dataset_hash
+from fg_history import add_snapshot
+from report_jobs import job_download_button
 
 # Material group codes as per your specification
 power_codes = ['80339', '80379', '80349', '80439', '80469', '80489', '80499', '88439', 'M0339', 'M0439']
@@ -37,48 +40,6 @@ def add_subtotal(df):
     df = pd.concat([df, pd.DataFrame([subtotal_row])], ignore_index=True)
     return df
 
-def format_worksheet(ws):
-    thin = Side(border_style="thin", color="000000")
-    max_row = ws.max_row
-    for i, row in enumerate(ws.iter_rows(), 1):
-        is_header = (i == 1)
-        is_subtotal = False
-        for cell in row:
-            if is_header:
-                cell.font = Font(bold=True)
-            if str(cell.value).strip().lower() == "subtotal":
-                is_subtotal = True
-        if is_subtotal:
-            for c in row:
-                c.font = Font(bold=True)
-        for cell in row:
-            cell.border = Border(top=thin, bottom=thin, left=thin, right=thin)
-            if is_header or is_subtotal:
-                cell.alignment = Alignment(horizontal="center")
-    # Auto-fit columns
-    for col in ws.columns:
-        max_length = 0
-        col_letter = col[0].column_letter
-        for cell in col:
-            length = len(str(cell.value)) if cell.value is not None else 0
-            if length > max_length:
-                max_length = length
-        ws.column_dimensions[col_letter].width = max_length + 2
-
-def to_excel(sheets):
-    out = BytesIO()
-    wb = Workbook()
-    default_sheet = wb.active
-    wb.remove(default_sheet)
-    for sheet_name, df in sheets.items():
-        ws = wb.create_sheet(sheet_name)
-        for row in dataframe_to_rows(df, index=False, header=True):
-            ws.append(row)
-        format_worksheet(ws)
-    wb.save(out)
-    out.seek(0)
-    return out
-
 st.title("FG Stock Report")
 
 uploaded_file = st.file_uploader("Upload your fg.XLSX file", type="xlsx")
@@ -88,49 +49,63 @@ if uploaded_file:
         df['Unrestricted'] = pd.to_numeric(df['Unrestricted'], errors='coerce')
     col7 = df.columns[:7]
 
-    sheets1 = {
-        "Power": add_subtotal(df[df['Material'].apply(lambda x: matches_any(x, power_codes))][col7]),
-        "Vane Pump": add_subtotal(
-            df[
-                df['Material'].apply(lambda x: matches_any(x, vane_pump_codes))
-                & df['Material'].apply(not_761395513799_and_513899)
-            ][col7]
-        ),
-        "Mechanical": add_subtotal(df[df['Material'].apply(lambda x: matches_any(x, mechanical_codes))][col7]),
-        "Bevel Gear": add_subtotal(df[df['Material'].apply(lambda x: matches_any(x, bevel_gear_codes))][col7]),
-        "Drop Arm": add_subtotal(
-            df[
-                df['Material'].apply(lambda x: matches_any(x, drop_arm_codes))
-                & df['Material'].apply(drop_arm_no_slash)
-            ][col7]
-        ),
-        "Oil Tank": add_subtotal(df[df['Material'].apply(lambda x: matches_any(x, oil_tank_codes))][col7]),
-        "All FG": add_subtotal(df[df['Material'].apply(not_761395513799_and_513899)][col7])
-    }
-    out1 = to_excel(sheets1)
-    st.download_button(
+    # Sheets are filtered and rendered only when a download is requested
+    def all_fg_sheets():
+        return {
+            "Power": add_subtotal(df[df['Material'].apply(lambda x: matches_any(x, power_codes))][col7]),
+            "Vane Pump": add_subtotal(
+                df[
+                    df['Material'].apply(lambda x: matches_any(x, vane_pump_codes))
+                    & df['Material'].apply(not_761395513799_and_513899)
+                ][col7]
+            ),
+            "Mechanical": add_subtotal(df[df['Material'].apply(lambda x: matches_any(x, mechanical_codes))][col7]),
+            "Bevel Gear": add_subtotal(df[df['Material'].apply(lambda x: matches_any(x, bevel_gear_codes))][col7]),
+            "Drop Arm": add_subtotal(
+                df[
+                    df['Material'].apply(lambda x: matches_any(x, drop_arm_codes))
+                    & df['Material'].apply(drop_arm_no_slash)
+                ][col7]
+            ),
+            "Oil Tank": add_subtotal(df[df['Material'].apply(lambda x: matches_any(x, oil_tank_codes))][col7]),
+            "All FG": add_subtotal(df[df['Material'].apply(not_761395513799_and_513899)][col7])
+        }
+
+    def plant_2000_sheets():
+        df2000 = df[df['Plant'] == "2000"]
+        return {
+            "Power": add_subtotal(df2000[df2000['Material'].apply(lambda x: matches_any(x, power_codes))][col7]),
+            "Vane Pump": add_subtotal(
+                df2000[
+                    df2000['Material'].apply(lambda x: matches_any(x, vane_pump_codes))
+                    & df2000['Material'].apply(not_761395513799_and_513899)
+                ][col7]
+            ),
+        }
+
+    # Workbooks are built in the background; the page stays usable meanwhile
+    upload_hash = dataset_hash(uploaded_file)
+    job_download_button(
+        (upload_hash, "ALL FG.xlsx"),
+        lambda progress: build_workbooks({"ALL FG.xlsx": all_fg_sheets()}, write_fg_sheet, progress=progress)["ALL FG.xlsx"],
         label="Download ALL FG.xlsx",
-        data=out1,
         file_name="ALL FG.xlsx",
         mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
 
-    df2000 = df[df['Plant'] == "2000"]
-    sheets2 = {
-        "Power": add_subtotal(df2000[df2000['Material'].apply(lambda x: matches_any(x, power_codes))][col7]),
-        "Vane Pump": add_subtotal(
-            df2000[
-                df2000['Material'].apply(lambda x: matches_any(x, vane_pump_codes))
-                & df2000['Material'].apply(not_761395513799_and_513899)
-            ][col7]
-        ),
-    }
-    out2 = to_excel(sheets2)
-    st.download_button(
+    job_download_button(
+        (upload_hash, "2000 Plant FG.xlsx"),
+        lambda progress: build_workbooks({"2000 Plant FG.xlsx": plant_2000_sheets()}, write_fg_sheet, progress=progress)["2000 Plant FG.xlsx"],
         label="Download 2000 Plant FG.xlsx",
-        data=out2,
         file_name="2000 Plant FG.xlsx",
         mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
 
     st.success("Download Your FG Files")
+
+    # Keep this file in the FG stock history (used for as-of lookups)
+    st.subheader("FG Stock History")
+    history_day = st.date_input("Snapshot date of this file", value=date.today())
+    if st.button("Add to FG history"):
+        path = add_snapshot(uploaded_file.getvalue(), history_day)
+        st.success(f"Stored as the FG snapshot for {history_day:%d-%m-%Y} ({os.path.basename(path)})")
@@ -0,0 +1,314 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from key_encoding import KeyEncoder, MISSING_KEY, clean_text, sum_by_key
+
+# Dispatchable FG allocation over every schedule line at once (Power and
+# Mech together). FG stock is held in pools, one per (Material, Plant). A
+# line draws on the pool of its Part Number and then on the pool of its Kit
+# Part Number, at its billing plant and then at any further plants allowed
+# to supply it; a kit or a part listed on several lines is one shared pool.
+#
+# Lines are served greedily in one global order: customer priority, then
+# largest Balance Dispatch, then sheet/row order. The order comes from one
+# lexsort and the pass over the lines touches plain Python lists only, so
+# 100k lines take a fraction of a second. Every line gets an explanation:
+# its rank, what it took from which pool and why it got less than asked.
+#
+# What-if scenarios (FG added or removed, another customer ranking) reuse
+# the baseline and allocate again only the groups of pools that the change
+# can reach: pools linked through lines that draw on more than one of them.
+
+# lines frame expected by allocate_fg (index: any unique line id)
+LINE_COLUMNS = ('Customer', 'Part Number', 'Kit Part Number', 'Plant', 'Balance Dispatch')
+ALLOCATION_VARIANTS = ('global', 'per_part')
+MAX_SESSION_ALLOCATIONS = 4
+
+NO_BALANCE = 'No balance to dispatch'
+NO_STOCK = 'No FG for part or kit at the allowed plants'
+FULL = 'Fully allocated'
+PARTIAL = 'Partly allocated: FG used up'
+TAKEN = 'FG used up by higher-ranked lines'
+
+
+def customer_priorities(customers, ranking):
+    # ranking: customers in priority order; unlisted customers come after them
+    order = {customer: position for position, customer in enumerate(ranking)}
+    return pd.Series(customers).map(order).fillna(len(order)).astype(np.int64).to_numpy()
+
+
+def slot_keys(lines, encoder, plant_sources=None):
+    # (lines x slots) (Material, Plant) pair keys in drawing order: part then
+    # kit at each allowed plant, the billing plant first; MISSING_KEY where a
+    # line has no such pool. plant_sources maps a billing plant to further
+    # plants whose FG may serve it.
+    part, kit, plant = clean_text(lines['Part Number']), clean_text(lines['Kit Part Number']), clean_text(lines['Plant'])
+    sources = [plant]
+    if plant_sources:
+        extra = plant.map(lambda p: [str(s) for s in plant_sources.get(p, ()) if str(s) != p])
+        for i in range(max(map(len, extra), default=0)):
+            sources.append(extra.map(lambda s: s[i] if i < len(s) else ''))
+    slots = []
+    for source in sources:
+        for material in (part, kit):
+            keys = encoder.pair_key('material', material, 'plant', source)
+            # no kit pool either when the line has no part number (same as the FG column)
+            keys[((material == '') | (part == '') | (source == '')).to_numpy()] = MISSING_KEY
+            slots.append(keys)
+    return np.column_stack(slots)
+
+
+def allocation_order(balance, priority):
+    # priority ascending, then balance descending, then line order
+    return np.lexsort((np.arange(len(balance)), -balance, priority))
+
+
+def greedy_allocate(order, balance, slots, stock):
+    # Serves lines in `order` from their pool slots; returns (taken per
+    # line and slot, stock left per pool). Pools shared by several lines or
+    # slots are drawn down in that order.
+    remaining = stock.astype(float).tolist()
+    rows = slots.tolist()
+    need_by_line = balance.tolist()
+    width = slots.shape[1]
+    taken = [0.0] * (len(rows) * width)
+    for line in order.tolist():
+        need = need_by_line[line]
+        if need <= 0:
+            continue
+        base = line * width
+        for slot, pool in enumerate(rows[line]):
+            if pool < 0:
+                continue
+            have = remaining[pool]
+            if have <= 0:
+                continue
+            take = need if have >= need else have
+            remaining[pool] = have - take
+            taken[base + slot] = take
+            need -= take
+            if need <= 0:
+                break
+    return np.array(taken, dtype=float).reshape(len(rows), width), np.array(remaining, dtype=float)
+
+
+def pool_components(slots, pool_count):
+    # Connected groups of pools: two pools are linked when one line can draw
+    # on both. Allocation in one group never affects another, so a change
+    # only needs its group recomputed. Returns (group per pool, group per
+    # line; -1 for lines without any pool).
+    parent = list(range(pool_count))
+
+    def find(pool):
+        root = pool
+        while parent[root] != root:
+            root = parent[root]
+        while parent[pool] != root:
+            parent[pool], pool = root, parent[pool]
+        return root
+
+    for row in slots.tolist():
+        pools = [pool for pool in row if pool >= 0]
+        for other in pools[1:]:
+            a, b = find(pools[0]), find(other)
+            if a != b:
+                parent[b] = a
+    pool_group = np.array([find(pool) for pool in range(pool_count)], dtype=np.int64)
+    first = np.where(slots >= 0, slots, pool_count).min(axis=1) if slots.size else np.zeros(0, dtype=np.int64)
+    line_group = np.where(first < pool_count, np.append(pool_group, -1)[np.minimum(first, pool_count)], -1)
+    return pool_group, line_group
+
+
+class FGAllocation:
+    # Global allocation of `fg` (Material, Plant, Unrestricted rows) to
+    # `lines` (LINE_COLUMNS). Kept whole so that what-if scenarios can be
+    # recomputed for the affected pool groups only.
+
+    def __init__(self, lines, fg, priority_ranking=(), plant_sources=None):
+        self.lines = lines
+        self.priority_ranking = tuple(priority_ranking)
+        encoder = self.encoder = KeyEncoder()
+        encoder.fit('material', clean_text(fg['Material']), clean_text(lines['Part Number']), clean_text(lines['Kit Part Number']))
+        plants = [clean_text(fg['Plant']), clean_text(lines['Plant'])]
+        if plant_sources:
+            plants.append(pd.Series([str(p) for targets in plant_sources.values() for p in targets], dtype=object))
+        encoder.fit('plant', *plants)
+
+        # one pool per (Material, Plant) in the FG file or drawn on by a line
+        stock = sum_by_key(
+            encoder.pair_key('material', clean_text(fg['Material']), 'plant', clean_text(fg['Plant'])),
+            pd.to_numeric(fg['Unrestricted'], errors='coerce').fillna(0),
+        )
+        keys = slot_keys(lines, encoder, plant_sources)
+        self.pool_keys = pd.Index(np.union1d(stock.index.to_numpy(dtype=np.int64), keys[keys != MISSING_KEY]))
+        self.stock = stock.reindex(self.pool_keys).fillna(0).to_numpy(dtype=float)
+        self.slots = np.where(keys == MISSING_KEY, -1, self.pool_keys.get_indexer(keys.ravel()).reshape(keys.shape))
+
+        self.balance = pd.to_numeric(lines['Balance Dispatch'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        self.priority = customer_priorities(lines['Customer'], self.priority_ranking)
+        self.order = allocation_order(self.balance, self.priority)
+        self.taken, _ = greedy_allocate(self.order, self.balance, self.slots, self.stock)
+        self._groups = None
+        self._report = None
+
+    @property
+    def allocated(self):
+        return pd.Series(self.taken.sum(axis=1), index=self.lines.index, name='Dispatchable FG')
+
+    def labels(self):
+        # 'Material @ Plant' per pool position
+        material, plant = np.divmod(self.pool_keys.to_numpy(), self.encoder.size('plant'))
+        return (pd.Series(self.encoder.decode('material', material)).astype(str) + ' @ '
+                + pd.Series(self.encoder.decode('plant', plant)).astype(str)).to_numpy(dtype=object)
+
+    def report(self):
+        # why each line got what it got, one row per line in allocation order
+        if self._report is None:
+            self._report = explain(self.lines, self.balance, self.priority, self.order, self.slots, self.taken, self.stock, self.labels())
+        return self._report
+
+    def groups(self):
+        if self._groups is None:
+            self._groups = pool_components(self.slots, len(self.pool_keys))
+        return self._groups
+
+    def pool_position(self, material, plant):
+        key = self.encoder.pair_key('material', clean_text([material]), 'plant', clean_text([plant]))[0]
+        return -1 if key == MISSING_KEY else int(self.pool_keys.get_indexer([key])[0])
+
+    def what_if(self, stock_changes=None, priority_ranking=None):
+        # Scenario against this allocation: stock_changes {(material, plant):
+        # quantity added (negative removes)}, priority_ranking replaces the
+        # customer ranking. Only the pool groups touched by a change are
+        # allocated again. Returns the changed lines side by side with the
+        # baseline (indexed like `lines`).
+        pool_group, line_group = self.groups()
+        stock = self.stock.copy()
+        touched = set()
+        for (material, plant), quantity in (stock_changes or {}).items():
+            position = self.pool_position(material, plant)
+            if position >= 0:  # a pool no line can draw on changes nothing
+                stock[position] = max(stock[position] + float(quantity), 0.0)
+                touched.add(pool_group[position])
+        priority = self.priority
+        if priority_ranking is not None and tuple(priority_ranking) != self.priority_ranking:
+            priority = customer_priorities(self.lines['Customer'], priority_ranking)
+            touched.update(line_group[(priority != self.priority) & (line_group >= 0)].tolist())
+
+        affected = np.flatnonzero(np.isin(line_group, list(touched)))
+        taken = self.taken.copy()
+        if len(affected):
+            balance, slots = self.balance[affected], self.slots[affected]
+            taken[affected], _ = greedy_allocate(allocation_order(balance, priority[affected]), balance, slots, stock)
+
+        baseline, scenario = self.taken.sum(axis=1), taken.sum(axis=1)
+        changed = affected[scenario[affected] != baseline[affected]]
+        lines = self.lines.iloc[changed]
+        return pd.DataFrame({
+            'Customer': lines['Customer'].to_numpy(),
+            'Part Number': lines['Part Number'].to_numpy(),
+            'Kit Part Number': lines['Kit Part Number'].to_numpy(),
+            'Plant': lines['Plant'].to_numpy(),
+            'Balance Dispatch': self.balance[changed],
+            'Baseline Dispatchable FG': baseline[changed],
+            'Scenario Dispatchable FG': scenario[changed],
+            'Change': scenario[changed] - baseline[changed],
+        }, index=lines.index)
+
+
+def explain(lines, balance, priority, order, slots, taken, stock, labels):
+    # one report row per line, in allocation order
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(1, len(order) + 1)
+    allocated = taken.sum(axis=1)
+    stock_at_start = np.where(slots >= 0, stock[np.maximum(slots, 0)], 0).sum(axis=1)
+    reason = np.select(
+        [balance <= 0, stock_at_start <= 0, allocated >= balance, allocated > 0],
+        [NO_BALANCE, NO_STOCK, FULL, PARTIAL],
+        default=TAKEN,
+    )
+    # pools actually drawn on, e.g. '8043975901 @ 2000: 30; K8043 @ 2000: 20'
+    drawn = np.full(len(lines), '', dtype=object)
+    for line in np.flatnonzero(allocated > 0).tolist():
+        drawn[line] = '; '.join(
+            f"{labels[pool]}: {take:g}"
+            for pool, take in zip(slots[line].tolist(), taken[line].tolist()) if take > 0
+        )
+    part_pool = slots[:, 0]
+    report = pd.DataFrame({
+        'Rank': rank,
+        'Priority': priority,
+        'Customer': lines['Customer'].to_numpy(),
+        'Part Number': lines['Part Number'].to_numpy(),
+        'Kit Part Number': lines['Kit Part Number'].to_numpy(),
+        'Plant': lines['Plant'].to_numpy(),
+        'Balance Dispatch': balance,
+        'FG Available': stock_at_start,
+        'Part FG Used': taken[:, 0::2].sum(axis=1),
+        'Kit FG Used': taken[:, 1::2].sum(axis=1),
+        'Dispatchable FG': allocated,
+        'Short': np.clip(balance - allocated, 0, None),
+        'Lines Sharing Part FG': pd.Series(part_pool).groupby(part_pool).transform('size').where(part_pool >= 0, 0).to_numpy(),
+        'Drawn From': drawn,
+        'Reason': reason,
+    }, index=lines.index)
+    return report.iloc[order]
+
+
+def allocate_fg(lines, fg, priority_ranking=(), plant_sources=None):
+    # lines: LINE_COLUMNS; fg: FG rows (Material, Plant, Unrestricted).
+    # Returns the explanation report (indexed like `lines`, in allocation
+    # order); its 'Dispatchable FG' column is the allocation.
+    return FGAllocation(lines, fg, priority_ranking, plant_sources).report()
+
+
+def session_allocation(key, lines, fg, priority_ranking=(), plant_sources=None):
+    # One baseline allocation per data version kept in session state, so
+    # reruns and what-if scenarios start from it
+    allocations = st.session_state.setdefault('_fg_allocations', OrderedDict())
+    if key not in allocations:
+        allocations[key] = FGAllocation(lines, fg, priority_ranking, plant_sources)
+        while len(allocations) > MAX_SESSION_ALLOCATIONS:
+            allocations.popitem(last=False)
+    allocations.move_to_end(key)
+    return allocations[key]
+
+
+def dispatchable_values(allocated):
+    # whole quantities as int, as the schedule has always shown them
+    allocated = pd.Series(allocated)
+    return allocated.astype(np.int64) if (allocated % 1 == 0).all() else allocated
+
+
+def allocate_per_part(df, part_col='Part Number', fg_col='FG', balance_col='Balance Dispatch', out_col='Dispatchable FG'):
+    # Previous rule, kept as the 'per_part' variant: within one sheet, each
+    # part's FG (the largest FG of its lines) goes to its lines largest
+    # balance first
+    grouped = df.groupby(part_col).groups
+    for part, idxs in grouped.items():
+        idxs_list = list(idxs)
+        idxs_list.sort(
+            key=lambda i: float(df.at[i, balance_col]) if pd.notna(df.at[i, balance_col]) else 0.0,
+            reverse=True
+        )
+        # Use single FG value (max) per part
+        fg_series = df.loc[idxs_list, fg_col].fillna(0).astype(float)
+        total_fg = float(fg_series.max()) if not fg_series.empty else 0.0
+        remaining = float(total_fg)
+        if remaining <= 0:
+            continue
+        for i in idxs_list:
+            bal = float(df.at[i, balance_col]) if pd.notna(df.at[i, balance_col]) else 0.0
+            if bal <= 0 or remaining <= 0:
+                continue
+            alloc = bal if remaining >= bal else remaining
+            if alloc > 0:
+                if float(alloc).is_integer():
+                    df.at[i, out_col] = int(alloc)
+                else:
+                    df.at[i, out_col] = alloc
+                remaining -= alloc
+    return df
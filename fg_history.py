@@ -0,0 +1,205 @@
+import argparse
+import hashlib
+import os
+from bisect import bisect_left, bisect_right
+from functools import cached_property, lru_cache
+from datetime import date, datetime
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from snapshot_io import read_mapped, stored_text, write_atomic
+
+# FG stock history: every FG file added is kept as an Arrow (Feather v2)
+# part under its snapshot date, so Unrestricted stock can be looked up as it
+# was on a past day. The store is append-only: a date may get further parts
+# (a corrected file), the latest part of a date is the one in effect, and
+# nothing is overwritten. Parts are sorted by (Material, Plant, Storage
+# Location), so lookups are binary searches on that key.
+#
+#   fg_history/2026-10-19/0001-<sha1 of the FG file>.feather
+#
+# Add a file from the command line:
+#   python fg_history.py --source fg.XLSX --date 2026-10-19
+
+SNAPSHOT_FORMAT = '1'
+HISTORY_DIR = os.environ.get('FG_HISTORY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fg_history'))
+DATE_FORMAT = '%Y-%m-%d'
+KEY_COLUMNS = ['Material', 'Plant', 'Storage Location']
+
+
+def source_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def read_fg(data):
+    # FG file as the pages read it (first unintended index column dropped)
+    fg = pd.read_excel(BytesIO(data))
+    if 'Unnamed: 0' in fg.columns:
+        fg = fg.drop(columns=['Unnamed: 0'])
+    return fg
+
+
+# ---------------- STORE ----------------
+
+def snapshot_dates(directory=HISTORY_DIR):
+    # dates with at least one part, oldest first
+    if not os.path.isdir(directory):
+        return []
+    days = []
+    for name in os.listdir(directory):
+        try:
+            day = datetime.strptime(name, DATE_FORMAT).date()
+        except ValueError:
+            continue
+        if _parts(os.path.join(directory, name)):
+            days.append(day)
+    return sorted(days)
+
+
+def _parts(partition):
+    return sorted(f for f in os.listdir(partition) if f.endswith('.feather'))
+
+
+def latest_part(day, directory=HISTORY_DIR):
+    # path of the part in effect for `day`, or None
+    partition = os.path.join(directory, day.strftime(DATE_FORMAT))
+    parts = _parts(partition) if os.path.isdir(partition) else []
+    return os.path.join(partition, parts[-1]) if parts else None
+
+
+def as_of_date(day, directory=HISTORY_DIR):
+    # latest snapshot date on or before `day`, or None
+    earlier = [d for d in snapshot_dates(directory) if d <= day]
+    return earlier[-1] if earlier else None
+
+
+def compile_snapshot(fg, source_sha1, day):
+    frame = fg.copy()
+    for col in frame.columns:
+        if col in KEY_COLUMNS or frame[col].dtype == object or pd.api.types.is_string_dtype(frame[col]):
+            frame[col] = stored_text(frame[col])
+    frame = frame.sort_values([c for c in KEY_COLUMNS if c in frame.columns], kind='stable')
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    return table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'format': SNAPSHOT_FORMAT.encode(),
+        b'source_sha1': source_sha1.encode(),
+        b'snapshot_date': day.strftime(DATE_FORMAT).encode(),
+    })
+
+
+def add_snapshot(data, day, directory=HISTORY_DIR):
+    # Appends the FG file (raw bytes) as the latest part of `day`; a file
+    # that is already the latest part of that day is not stored twice
+    digest = source_hash(data)
+    current = latest_part(day, directory)
+    if current is not None and os.path.basename(current)[5:-len('.feather')] == digest[:16]:
+        return current
+    partition = os.path.join(directory, day.strftime(DATE_FORMAT))
+    os.makedirs(partition, exist_ok=True)
+    path = os.path.join(partition, f"{len(_parts(partition)) + 1:04d}-{digest[:16]}.feather")
+    table = compile_snapshot(read_fg(data), digest, day)
+    write_atomic(path, lambda tmp: feather.write_feather(table, tmp, compression='uncompressed'))
+    return path
+
+
+# ---------------- LOAD ----------------
+
+class FGSnapshot:
+    # One history part over its memory-mapped table. Rows are sorted by the
+    # key columns, so a lookup is a binary search on them and only the rows
+    # found are converted; the whole frame is built only when asked for.
+
+    def __init__(self, table, path):
+        metadata = table.schema.metadata or {}
+        if metadata.get(b'format') != SNAPSHOT_FORMAT.encode():
+            raise ValueError(f"Unsupported FG history part: {path}")
+        self.path = path
+        self.day = datetime.strptime(metadata[b'snapshot_date'].decode(), DATE_FORMAT).date()
+        self.version = metadata[b'source_sha1'].decode()
+        self._table = table
+        self._keys = [table.column(c) for c in KEY_COLUMNS if c in table.column_names]
+
+    @cached_property
+    def frame(self):
+        # the FG file as stored (rows sorted by key); copy before mutating
+        return self._table.to_pandas()
+
+    def _row_key(self, row, width):
+        # sort key of a row's first `width` key columns; missing values sort
+        # last, as compile_snapshot's sort_values put them
+        values = (column[row].as_py() for column in self._keys[:width])
+        return tuple((1, '') if value is None else (0, value) for value in values)
+
+    def _span(self, key):
+        # (start, stop) of the rows whose leading key columns equal `key`
+        width = len(key)
+        if width > len(self._keys):
+            return 0, 0
+        target = tuple((0, value) for value in key)
+        rows = range(self._table.num_rows)
+        start = bisect_left(rows, target, key=lambda row: self._row_key(row, width))
+        stop = bisect_right(rows, target, lo=start, key=lambda row: self._row_key(row, width))
+        return start, stop
+
+    def lookup(self, material, plant=None, storage_location=None):
+        # rows of one material, optionally narrowed to a plant / storage location
+        key = tuple(str(v) for v in (material, plant, storage_location) if v is not None)
+        start, stop = self._span(key)
+        return self._table.slice(start, stop - start).to_pandas()
+
+    def unrestricted(self, material, plant=None, storage_location=None):
+        rows = self.lookup(material, plant, storage_location)
+        return float(pd.to_numeric(rows['Unrestricted'], errors='coerce').sum())
+
+
+@lru_cache(maxsize=64)
+def open_part(path):
+    # parts are never rewritten, so an opened part stays valid for the
+    # process; opening maps the file and reads nothing else
+    return FGSnapshot(read_mapped(path), path)
+
+
+def open_as_of(day, directory=HISTORY_DIR):
+    # FG stock as it was on `day`: the latest part of the latest date on or
+    # before it; None when the history starts later
+    snapshot_day = as_of_date(day, directory)
+    return None if snapshot_day is None else open_part(latest_part(snapshot_day, directory))
+
+
+def unrestricted_history(material, plant=None, storage_location=None, directory=HISTORY_DIR):
+    # Unrestricted stock of one key on every snapshot date
+    return pd.Series({
+        day: open_part(latest_part(day, directory)).unrestricted(material, plant, storage_location)
+        for day in snapshot_dates(directory)
+    }, name='Unrestricted', dtype=float)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add an FG file to the FG stock history or query it.")
+    parser.add_argument('--source', help="FG workbook to add")
+    parser.add_argument('--date', default=date.today().strftime(DATE_FORMAT), help="snapshot date (YYYY-MM-DD)")
+    parser.add_argument('--material', help="print the Unrestricted stock of a material as of --date")
+    parser.add_argument('--plant')
+    parser.add_argument('--storage-location')
+    parser.add_argument('--dir', default=HISTORY_DIR, help="history directory")
+    args = parser.parse_args(argv)
+    day = datetime.strptime(args.date, DATE_FORMAT).date()
+
+    if args.source:
+        with open(args.source, 'rb') as f:
+            print(f"stored: {add_snapshot(f.read(), day, args.dir)}")
+    if args.material:
+        snapshot = open_as_of(day, args.dir)
+        if snapshot is None:
+            print(f"no FG snapshot on or before {args.date}")
+            return
+        stock = snapshot.unrestricted(args.material, args.plant, args.storage_location)
+        print(f"{args.material} as of {args.date} (snapshot {snapshot.day}): {stock:g}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from key_encoding import KeyEncoder
+from snapshot_io import read_mapped, stored_text, write_atomic
+
+# Pending godown stock aging: rows are bucketed by Days in one pd.cut, and
+# every upload can be kept as a daily snapshot (Arrow / Feather v2, one file
+# per day) so that two days are compared by key instead of by reading two
+# workbooks side by side. A line of stock is identified by (Inv No, Item Code).
+#
+# Movement between two snapshots:
+#   New      - key not pending in the earlier snapshot
+#   Aged     - pending in both, now in an older bucket (or newly in a bucket)
+#   Received - pending in the earlier snapshot, gone from the later one
+
+AGING_EDGES = (30, 46, 61)  # bucket starts in days; the last bucket is open-ended
+KEY_COLUMNS = ('Inv No', 'Item Code')
+MOVEMENTS = ('New', 'Aged', 'Received')
+
+SNAPSHOT_FORMAT = '1'
+SNAPSHOT_DIR = os.environ.get('GODOWN_SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'godown_snapshots'))
+SNAPSHOT_DATE_FORMAT = '%Y-%m-%d'
+KEEP_SNAPSHOTS = 90
+
+
+# ---------------- BUCKETS ----------------
+
+def bucket_labels(edges=AGING_EDGES):
+    # (30, 46, 61) -> '30 - 45 Days', '46 - 60 Days', '61 & Above Days'
+    labels = [f"{lo} - {hi - 1} Days" for lo, hi in zip(edges, edges[1:])]
+    return labels + [f"{edges[-1]} & Above Days"]
+
+
+def aging_buckets(days, edges=AGING_EDGES):
+    # Categorical bucket per row; NaN below the first edge or without Days
+    days = pd.to_numeric(days, errors='coerce')
+    return pd.cut(days, bins=list(edges) + [np.inf], right=False, labels=bucket_labels(edges))
+
+
+def split_by_bucket(df, buckets):
+    # {label: rows of that bucket}, in bucket order, empty buckets included
+    return {label: df[(buckets == label).to_numpy()] for label in buckets.cat.categories}
+
+
+# ---------------- SNAPSHOT STORE ----------------
+
+def snapshot_frame(df):
+    # Upload as stored: text columns as strings, quantities numeric
+    frame = df.copy()
+    for col in frame.columns:
+        if col in ('Qty', 'Amount', 'Days'):
+            frame[col] = pd.to_numeric(frame[col], errors='coerce')
+        elif frame[col].dtype == object or pd.api.types.is_string_dtype(frame[col]):
+            frame[col] = stored_text(frame[col])
+    return frame.reset_index(drop=True)
+
+
+def snapshot_path(day, directory=SNAPSHOT_DIR):
+    return os.path.join(directory, f"godown-{day.strftime(SNAPSHOT_DATE_FORMAT)}.feather")
+
+
+def snapshot_dates(directory=SNAPSHOT_DIR):
+    # days with a stored snapshot, oldest first
+    if not os.path.isdir(directory):
+        return []
+    days = []
+    for name in os.listdir(directory):
+        if name.startswith('godown-') and name.endswith('.feather'):
+            try:
+                days.append(datetime.strptime(name[len('godown-'):-len('.feather')], SNAPSHOT_DATE_FORMAT).date())
+            except ValueError:
+                continue
+    return sorted(days)
+
+
+def _prune(directory, keep):
+    for day in snapshot_dates(directory)[:-keep]:
+        os.remove(snapshot_path(day, directory))
+
+
+def save_snapshot(df, day, source_sha1, directory=SNAPSHOT_DIR):
+    # One snapshot per day: saving again for the same day replaces it
+    os.makedirs(directory, exist_ok=True)
+    path = snapshot_path(day, directory)
+    table = pa.Table.from_pandas(snapshot_frame(df), preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'format': SNAPSHOT_FORMAT.encode(),
+        b'source_sha1': source_sha1.encode(),
+    })
+    write_atomic(path, lambda tmp: feather.write_feather(table, tmp, compression='uncompressed'))
+    _prune(directory, KEEP_SNAPSHOTS)
+    return path
+
+
+def snapshot_source(day, directory=SNAPSHOT_DIR):
+    # SHA-1 of the upload stored for `day`, or None if there is no snapshot
+    path = snapshot_path(day, directory)
+    if not os.path.exists(path):
+        return None
+    metadata = read_mapped(path, schema_only=True).metadata or {}
+    value = metadata.get(b'source_sha1')
+    return value.decode() if value is not None else None
+
+
+def load_snapshot(day, directory=SNAPSHOT_DIR):
+    path = snapshot_path(day, directory)
+    table = read_mapped(path)
+    if (table.schema.metadata or {}).get(b'format') != SNAPSHOT_FORMAT.encode():
+        raise ValueError(f"Unsupported godown snapshot: {path}")
+    return table.to_pandas()
+
+
+def previous_snapshot_date(day, directory=SNAPSHOT_DIR):
+    # latest snapshot before `day`, or None
+    earlier = [d for d in snapshot_dates(directory) if d < day]
+    return earlier[-1] if earlier else None
+
+
+# ---------------- DIFF ----------------
+
+def _by_key(df, keys):
+    # one row per key: quantities summed, the oldest Days, other fields first seen
+    agg = {col: 'first' for col in df.columns}
+    agg.update({'Qty': 'sum', 'Amount': 'sum', 'Days': 'max'})
+    return df.groupby(keys, sort=False).agg(agg)
+
+
+def diff_snapshots(previous, current, edges=AGING_EDGES):
+    # Movement report between two snapshot frames (see snapshot_frame):
+    # the columns of the snapshot plus Movement, Previous Bucket and Bucket
+    encoder = KeyEncoder()
+    invoice, item = KEY_COLUMNS
+    encoder.fit('invoice', previous[invoice], current[invoice]).fit('item', previous[item], current[item])
+    previous = _by_key(previous, encoder.pair_key('invoice', previous[invoice], 'item', previous[item]))
+    current = _by_key(current, encoder.pair_key('invoice', current[invoice], 'item', current[item]))
+
+    previous_bucket = aging_buckets(previous['Days'], edges)
+    current_bucket = aging_buckets(current['Days'], edges)
+    positions = previous.index.get_indexer(current.index)
+    previous_codes = previous_bucket.cat.codes.to_numpy()
+    current_codes = current_bucket.cat.codes.to_numpy()
+
+    new = positions < 0
+    # positions is -1 for new keys: compare buckets only where the key was pending
+    aged = np.zeros(len(positions), dtype=bool)
+    aged[~new] = current_codes[~new] > previous_codes[positions[~new]]
+    received = ~previous.index.isin(current.index)
+
+    columns = list(current.columns)
+    parts = {
+        'New': current[new].assign(**{
+            'Previous Bucket': None,
+            'Bucket': current_bucket[new].astype(object).to_numpy(),
+        }),
+        'Aged': current[aged].assign(**{
+            'Previous Bucket': previous_bucket.astype(object).to_numpy()[positions[aged]],
+            'Bucket': current_bucket[aged].astype(object).to_numpy(),
+        }),
+        'Received': previous.loc[received, columns].assign(**{
+            'Previous Bucket': previous_bucket[received].astype(object).to_numpy(),
+            'Bucket': None,
+        }),
+    }
+    report = pd.concat(
+        [part.assign(Movement=movement) for movement, part in parts.items()],
+        ignore_index=True,
+    )
+    return report[['Movement'] + columns + ['Previous Bucket', 'Bucket']]
+
+
+def movement_summary(report):
+    # rows and Qty per movement, every movement listed
+    summary = report.groupby('Movement', sort=False).agg(Lines=('Movement', 'size'), Qty=('Qty', 'sum'))
+    return summary.reindex(list(MOVEMENTS), fill_value=0)
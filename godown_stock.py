@@ -1,50 +1,14 @@
+from datetime import date
+
 import streamlit as st
 import pandas as pd
-from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.utils import get_column_letter
-
-
-def write_sheet(ws, data):
-    border_style = Border(
-        left=Side(border_style="thin"),
-        right=Side(border_style="thin"),
-        top=Side(border_style="thin"),
-        bottom=Side(border_style="thin")
-    )
-    for customer, group in data.groupby('Name'):
-        ws.append([])  # Blank row before customer header
-        ws.append([customer])
-        cell = ws.cell(row=ws.max_row, column=1)
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='left')
-        ws.merge_cells(start_row=ws.max_row, start_column=1, end_row=ws.max_row, end_column=11)
-        ws.append([])  # Blank row after customer header
-
-        ws.append(['Code', 'Name', 'Inv No', 'Inv Date', 'Item Code', 'Item Desc',
-                   'Qty', 'Amount', 'Days', 'GDN Receipt', 'ASN'])
-        header_row = ws.max_row
-        for col in range(1, 12):
-            ws.cell(row=header_row, column=col).border = border_style
-
-        for r in dataframe_to_rows(group, index=False, header=False):
-            ws.append(r)
-            for col in range(1, 12):
-                ws.cell(row=ws.max_row, column=col).border = border_style
-
-        ws.append([])  # Blank row after each group
-
-    # Auto-fit columns
-    for col_idx, col_cells in enumerate(ws.columns, 1):
-        max_length = 0
-        for cell in col_cells:
-            if not cell.value or cell.coordinate in ws.merged_cells:
-                continue
-            max_length = max(max_length, len(str(cell.value)))
-        adjusted_width = max_length + 2
-        ws.column_dimensions[get_column_letter(col_idx)].width = adjusted_width
+from excel_export import build_workbooks, write_aging_sheet, write_fg_sheet
+from export_cache import dataset_hash
+from godown_aging import (
+    aging_buckets, diff_snapshots, load_snapshot, movement_summary, save_snapshot,
+    snapshot_dates, snapshot_frame, snapshot_source, split_by_bucket,
+)
+from report_jobs import job_download_button
 
 
 # --- Streamlit App ---
@@ -59,32 +23,58 @@ if uploaded_file:
     df = df.drop('#', axis=1)
     df['Days'] = pd.to_numeric(df['Days'], errors='coerce')
 
-    df_30_45 = df[(df['Days'] >= 30) & (df['Days'] <= 45)]
-    df_46_60 = df[(df['Days'] >= 46) & (df['Days'] <= 60)]
-    df_61_more = df[df['Days'] >= 61]
-
-    st.header("30 - 45 Days Stock")
-    st.dataframe(df_30_45)
-    st.header("46 - 60 Days Stock")
-    st.dataframe(df_46_60)
-    st.header("61 & Above Days Stock")
-    st.dataframe(df_61_more)
+    # One pass over Days; each bucket is then a selection on its code
+    sheets = split_by_bucket(df, aging_buckets(df['Days']))
 
-    output = BytesIO()
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = '30 - 45 Days'
-    write_sheet(ws1, df_30_45)
-    ws2 = wb.create_sheet('46 - 60 Days')
-    write_sheet(ws2, df_46_60)
-    ws3 = wb.create_sheet('61 & Above Days')
-    write_sheet(ws3, df_61_more)
-    wb.save(output)
-    output.seek(0)
+    for label, bucket in sheets.items():
+        st.header(f"{label} Stock")
+        st.dataframe(bucket)
 
-    st.download_button(
+    upload_key = dataset_hash(uploaded_file)
+    # Workbook is rendered in the background once requested
+    job_download_button(
+        (upload_key, 'Pending_Godown_Stock.xlsx'),
+        lambda progress: build_workbooks({'Pending_Godown_Stock.xlsx': sheets}, write_aging_sheet, progress=progress)['Pending_Godown_Stock.xlsx'],
         label="📥 Download Pending Godown Stock Excel",
-        data=output,
         file_name='Pending_Godown_Stock.xlsx',
         mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
+
+    # --- Daily snapshots and day-over-day movement ---
+    st.header("Day-over-Day Movement")
+    snapshot_day = st.sidebar.date_input("Snapshot date of this upload", value=date.today())
+    stored = snapshot_source(snapshot_day)
+    if stored == upload_key:
+        st.caption(f"This upload is stored as the snapshot for {snapshot_day:%d-%m-%Y}.")
+    else:
+        if stored is not None:
+            st.warning(f"A different upload is stored as the snapshot for {snapshot_day:%d-%m-%Y}.")
+        action = "Replace" if stored is not None else "Save"
+        if st.button(f"{action} snapshot for {snapshot_day:%d-%m-%Y}"):
+            save_snapshot(df, snapshot_day, upload_key)
+            st.rerun()
+
+    earlier_days = [d for d in reversed(snapshot_dates()) if d < snapshot_day]
+    if not earlier_days:
+        st.info("No earlier snapshot to compare with yet.")
+    else:
+        compare_day = st.sidebar.selectbox(
+            "Compare with snapshot", earlier_days, format_func=lambda d: d.strftime('%d-%m-%Y')
+        )
+        report = diff_snapshots(load_snapshot(compare_day), snapshot_frame(df))
+
+        summary = movement_summary(report)
+        for column, (movement, row) in zip(st.columns(len(summary)), summary.iterrows()):
+            column.metric(movement, f"{int(row['Lines'])} lines", f"Qty {row['Qty']:g}", delta_color='off')
+
+        st.subheader(f"{compare_day:%d-%m-%Y} → {snapshot_day:%d-%m-%Y}")
+        st.dataframe(report)
+
+        file_name = f"Godown_Stock_Movement_{compare_day:%Y%m%d}_{snapshot_day:%Y%m%d}.xlsx"
+        job_download_button(
+            (upload_key, snapshot_source(compare_day), file_name),
+            lambda progress: build_workbooks({file_name: {'Movement': report}}, write_fg_sheet, progress=progress)[file_name],
+            label="📥 Download Movement Report",
+            file_name=file_name,
+            mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
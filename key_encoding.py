@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+# Integer keys for the schedule <-> dispatch <-> FG <-> kit joins.
+# Each dimension (customer, material, plant) gets one vocabulary shared by all
+# tables; a (customer, material) or (material, plant) pair becomes a single
+# int64, so the joins are integer lookups instead of string merges. The
+# original string columns stay on the frames for display only.
+# Fit every table into the vocabularies before building pair keys: refitting
+# a dimension changes its size and so the pair keys built from it.
+
+MISSING_KEY = -1
+
+
+def key_text(column):
+    # same normalisation the string merges used: compare as str(value)
+    # (newer pandas keeps missing values as NaN through astype(str))
+    return pd.Series(column).astype(str).fillna('nan')
+
+
+def clean_text(column):
+    # part / plant numbers as typed in the sheets: missing is '', padding
+    # stripped
+    return pd.Series(column).fillna('').astype(str).str.strip()
+
+
+class KeyEncoder:
+
+    def __init__(self):
+        self._vocab = {}
+
+    @staticmethod
+    def _normalize(column):
+        return key_text(column)
+
+    def fit(self, dimension, *columns):
+        values = pd.concat([self._normalize(c) for c in columns], ignore_index=True)
+        existing = self._vocab.get(dimension)
+        if existing is not None:
+            values = pd.concat([pd.Series(existing, dtype=object), values], ignore_index=True)
+        self._vocab[dimension] = pd.Index(pd.unique(values))
+        return self
+
+    def size(self, dimension):
+        return len(self._vocab[dimension])
+
+    def encode(self, dimension, column):
+        # unseen values get MISSING_KEY
+        return self._vocab[dimension].get_indexer(self._normalize(column)).astype(np.int64)
+
+    def decode(self, dimension, codes):
+        vocab = np.append(np.asarray(self._vocab[dimension], dtype=object), np.nan)
+        return vocab[np.asarray(codes)]
+
+    def pair_key(self, first_dim, first, second_dim, second):
+        a = self.encode(first_dim, first)
+        b = self.encode(second_dim, second)
+        key = a * self.size(second_dim) + b
+        key[(a == MISSING_KEY) | (b == MISSING_KEY)] = MISSING_KEY
+        return key
+
+
+def sum_by_key(keys, values):
+    totals = pd.Series(np.asarray(values)).groupby(np.asarray(keys)).sum()
+    return totals.drop(MISSING_KEY, errors='ignore')
+
+
+def lookup_by_key(keys, table, index=None, default=0):
+    # left join of `keys` against a key-indexed Series
+    return pd.Series(table.reindex(keys).fillna(default).to_numpy(), index=index)
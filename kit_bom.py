@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+from key_encoding import KeyEncoder, clean_text, lookup_by_key, sum_by_key
+
+# Kit BOM explosion: schedule demand on a kit (its Balance Dispatch) becomes
+# demand on the kit's components, which is then covered against FG at the
+# line's plant. The BOM comes from the Kit workbook (kit_catalog, BOM sheet);
+# kits nested in kits are flattened to leaf components first, one merge per
+# level. Everything is a merge or a keyed groupby, so it runs on every
+# reconciliation.
+
+MAX_BOM_DEPTH = 8  # deeper nesting is treated as a cycle in the BOM
+
+
+def flatten_bom(bom, max_depth=MAX_BOM_DEPTH):
+    # (Kit Part Number, Component, Qty) with every component a leaf part:
+    # a component that is itself a kit is replaced by its components, with
+    # quantities multiplied
+    flat = pd.DataFrame({
+        'Kit Part Number': clean_text(bom['Kit Part Number']),
+        'Component': clean_text(bom['Component']),
+        'Qty': pd.to_numeric(bom['Qty'], errors='coerce').fillna(1.0),
+    })
+    flat = flat[(flat['Kit Part Number'] != '') & (flat['Component'] != '')]
+    direct = flat.rename(columns={'Kit Part Number': 'Component', 'Component': 'Sub Component', 'Qty': 'Sub Qty'})
+    kits = pd.Index(flat['Kit Part Number'].unique())
+    for _ in range(max_depth):
+        nested = flat['Component'].isin(kits).to_numpy()
+        if not nested.any():
+            break
+        expanded = flat[nested].merge(direct, on='Component')
+        expanded = pd.DataFrame({
+            'Kit Part Number': expanded['Kit Part Number'],
+            'Component': expanded['Sub Component'],
+            'Qty': expanded['Qty'] * expanded['Sub Qty'],
+        })
+        flat = pd.concat([flat[~nested], expanded], ignore_index=True)
+    else:
+        if flat['Component'].isin(kits).any():
+            raise ValueError(f"Kit BOM nests deeper than {max_depth} levels (cycle?)")
+    # a component listed twice under one kit counts once with both quantities
+    return flat.groupby(['Kit Part Number', 'Component'], as_index=False, sort=False)['Qty'].sum()
+
+
+def explode_demand(lines, flat_bom):
+    # lines: Kit Part Number, Plant, Balance Dispatch (any unique index).
+    # One row per (line, component): the line's index as 'Line' plus
+    # Component, Plant and Component Demand.
+    demand = pd.DataFrame({
+        'Line': np.arange(len(lines)),
+        'Kit Part Number': clean_text(lines['Kit Part Number']).to_numpy(),
+        'Plant': clean_text(lines['Plant']).to_numpy(),
+        'Demand': pd.to_numeric(lines['Balance Dispatch'], errors='coerce').fillna(0).clip(lower=0).to_numpy(),
+    })
+    demand = demand[(demand['Kit Part Number'] != '') & (demand['Plant'] != '') & (demand['Demand'] > 0)]
+    exploded = demand.merge(flat_bom, on='Kit Part Number')
+    exploded['Component Demand'] = exploded['Demand'] * exploded['Qty']
+    exploded = exploded[exploded['Component Demand'] > 0]
+    return exploded[['Line', 'Kit Part Number', 'Component', 'Qty', 'Plant', 'Component Demand']]
+
+
+def component_coverage(exploded, fg):
+    # Per (Component, Plant): total demand from all kits, Unrestricted FG,
+    # Coverage (FG / demand, capped at 1) and Short
+    keys = KeyEncoder()
+    keys.fit('material', exploded['Component'], clean_text(fg['Material']))
+    keys.fit('plant', exploded['Plant'], clean_text(fg['Plant']))
+    fg_by_key = sum_by_key(
+        keys.pair_key('material', clean_text(fg['Material']), 'plant', clean_text(fg['Plant'])),
+        pd.to_numeric(fg['Unrestricted'], errors='coerce').fillna(0),
+    )
+    component_key = keys.pair_key('material', exploded['Component'], 'plant', exploded['Plant'])
+    demand = sum_by_key(component_key, exploded['Component Demand'])
+    coverage = pd.DataFrame({
+        'Component': keys.decode('material', demand.index.to_numpy() // keys.size('plant')),
+        'Plant': keys.decode('plant', demand.index.to_numpy() % keys.size('plant')),
+        'Component Demand': demand.to_numpy(),
+        'FG': lookup_by_key(demand.index.to_numpy(), fg_by_key).to_numpy(),
+        'Kits': exploded.groupby(component_key)['Kit Part Number'].nunique().reindex(demand.index).to_numpy(),
+    }, index=pd.Index(demand.index, name='Key'))
+    coverage['Coverage'] = np.minimum(coverage['FG'] / coverage['Component Demand'], 1.0)
+    coverage['Short'] = (coverage['Component Demand'] - coverage['FG']).clip(lower=0)
+    return coverage
+
+
+def kit_coverage(lines, bom, fg):
+    # (per line coverage, per component coverage). A line's coverage is that
+    # of its least covered component (NaN for lines without a kit BOM or
+    # without balance); components shared by several kits are covered
+    # against their combined demand.
+    flat = flatten_bom(bom)
+    exploded = explode_demand(lines, flat)
+    components = component_coverage(exploded, fg)
+    covered = exploded.merge(components[['Component', 'Plant', 'Coverage']], on=['Component', 'Plant'], how='left')
+    line_coverage = covered.groupby('Line')['Coverage'].min()
+    per_line = pd.Series(np.nan, index=lines.index, name='Kit Coverage')
+    per_line.iloc[line_coverage.index.to_numpy()] = line_coverage.to_numpy()
+    return per_line, components.reset_index(drop=True).sort_values(['Coverage', 'Short'], ascending=[True, False], kind='stable')
@@ -0,0 +1,257 @@
+import argparse
+import hashlib
+import os
+from bisect import bisect_left
+from collections.abc import Mapping
+from functools import cached_property
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from key_encoding import key_text
+from snapshot_io import read_mapped, write_atomic
+
+# Kit catalog: the three kit mappings from the Kit workbook, plus the kit
+# bill of materials when the workbook has one, compiled into one
+# Arrow (Feather v2, uncompressed) snapshot. A snapshot is named after the
+# SHA-1 of the source workbook, so it is rebuilt only when the workbook
+# changes, and it is memory-mapped on load: every server process reading the
+# same file shares its pages through the OS cache.
+#
+# Rebuild from the command line:
+#   python kit_catalog.py                 # download from Google Drive
+#   python kit_catalog.py --source kit.xlsx --force
+
+SNAPSHOT_FORMAT = '2'  # 2: BOM rows and the quantity column
+SNAPSHOT_DIR = os.environ.get('KIT_SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kit_snapshots'))
+CURRENT_FILE = 'CURRENT'
+KEEP_SNAPSHOTS = 3
+
+# lookup name -> (sheet, columns, column names); same ranges the page used to read
+KIT_TABLES = {
+    'power_stg': ('PSG', 'K:M', ['Part Number', 'Desc', 'Kit Part Number']),
+    'mech': ('PSG', 'S:T', ['Part Number', 'Kit Part Number']),
+    'power_vp': ('VP', 'B:D', ['Part Number', 'Desc', 'Kit Part Number']),
+}
+# kit -> component structure, one row per component of a kit (a component may
+# itself be a kit); optional: workbooks without this sheet have an empty BOM
+BOM_LOOKUP = 'bom'
+BOM_SHEET = 'BOM'
+BOM_COLUMNS = ['Kit Part Number', 'Component', 'Qty']
+
+
+def source_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def snapshot_path(digest, directory=SNAPSHOT_DIR):
+    # the format is part of the name, so a format change rebuilds the snapshot
+    return os.path.join(directory, f'kit_catalog-{digest[:16]}-v{SNAPSHOT_FORMAT}.feather')
+
+
+# ---------------- COMPILE ----------------
+
+def compile_catalog(data):
+    # data: raw bytes of the Kit workbook
+    workbook = pd.ExcelFile(BytesIO(data))
+    frames = []
+    for name, (sheet, usecols, columns) in KIT_TABLES.items():
+        kit = workbook.parse(sheet, usecols=usecols)
+        kit.columns = columns
+        # part numbers are compared as str(value); missing values stay 'nan' as before
+        part = key_text(kit['Part Number'])
+        kit_part = kit['Kit Part Number']
+        frame = pd.DataFrame({
+            'lookup': name,
+            'part_number': part,
+            'kit_part_number': kit_part.where(kit_part.isna(), kit_part.astype(str)).fillna(''),
+        })
+        # a part listed twice maps to its last row, as dict(zip(...)) did
+        frames.append(frame.drop_duplicates('part_number', keep='last'))
+
+    if BOM_SHEET in workbook.sheet_names:
+        bom = workbook.parse(BOM_SHEET, usecols=BOM_COLUMNS).dropna(subset=BOM_COLUMNS[:2])
+        # stored in the same table: part_number = kit, kit_part_number = component
+        frames.append(pd.DataFrame({
+            'lookup': BOM_LOOKUP,
+            'part_number': key_text(bom['Kit Part Number']),
+            'kit_part_number': key_text(bom['Component']),
+            'quantity': pd.to_numeric(bom['Qty'], errors='coerce').fillna(1.0),
+        }))
+
+    catalog = pd.concat(frames, ignore_index=True).sort_values(['lookup', 'part_number'], kind='stable')
+    if 'quantity' not in catalog.columns:
+        catalog['quantity'] = np.nan
+    table = pa.Table.from_pandas(catalog, preserve_index=False).cast(pa.schema([
+        ('lookup', pa.string()),
+        ('part_number', pa.string()),
+        ('kit_part_number', pa.string()),
+        ('quantity', pa.float64()),
+    ]))
+    return table.replace_schema_metadata({
+        'format': SNAPSHOT_FORMAT,
+        'source_sha1': source_hash(data),
+    })
+
+
+def _set_current(path, directory):
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            f.write(os.path.basename(path))
+    write_atomic(os.path.join(directory, CURRENT_FILE), write)
+
+
+def _prune(directory, keep):
+    snapshots = sorted(
+        (os.path.join(directory, f) for f in os.listdir(directory)
+         if f.startswith('kit_catalog-') and f.endswith('.feather')),
+        key=os.path.getmtime, reverse=True,
+    )
+    for path in snapshots[keep:]:
+        os.remove(path)
+
+
+def build_snapshot(data, directory=SNAPSHOT_DIR, force=False):
+    # Returns the snapshot path for this workbook, compiling it only if missing
+    os.makedirs(directory, exist_ok=True)
+    path = snapshot_path(source_hash(data), directory)
+    if force or not os.path.exists(path):
+        table = compile_catalog(data)
+        write_atomic(path, lambda tmp: feather.write_feather(table, tmp, compression='uncompressed', chunksize=max(len(table), 1)))
+    _set_current(path, directory)
+    _prune(directory, KEEP_SNAPSHOTS)
+    return path
+
+
+# ---------------- LOAD ----------------
+
+def _array(column):
+    # snapshots are written as one record batch, so this is the mapped array itself
+    return column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+
+
+class KitLookup(Mapping):
+    # Read-only part number -> kit part number mapping over one catalog
+    # slice. parts / kits are Arrow string arrays sliced from the mapped
+    # snapshot, so they stay on its pages instead of per-process copies;
+    # parts are unique and sorted (the snapshot is sorted by part number).
+
+    def __init__(self, parts, kits):
+        self._parts = parts
+        self._kits = kits
+
+    def _positions(self, parts):
+        return pc.index_in(pa.array(key_text(pd.Series(parts, dtype=object)), type=pa.string()), value_set=self._parts)
+
+    def _position(self, part):
+        # binary search on the sorted parts: O(log n) element reads, no
+        # hash table over the slice per call
+        key = key_text(pd.Series([part], dtype=object)).iloc[0]
+        position = bisect_left(self._parts, key, key=lambda value: value.as_py())
+        if position < len(self._parts) and self._parts[position].as_py() == key:
+            return position
+        return None
+
+    def __getitem__(self, part):
+        position = self._position(part)
+        if position is None:
+            raise KeyError(part)
+        return self._kits[position].as_py()
+
+    def __iter__(self):
+        return (part.as_py() for part in self._parts)
+
+    def __len__(self):
+        return len(self._parts)
+
+    def map(self, parts, default=''):
+        # vectorized get() for a column of part numbers
+        if len(self._kits) == 0:
+            # empty sheet: nothing to look up (and no position -1 to take)
+            return np.full(len(parts), default, dtype=object)
+        kits = pc.take(self._kits, self._positions(parts)).fill_null(default)
+        return kits.to_numpy(zero_copy_only=False).astype(object)
+
+
+class KitCatalog:
+
+    def __init__(self, table):
+        self.version = table.schema.metadata[b'source_sha1'].decode()
+        self._table = table
+        self._lookups = {}
+        for name in KIT_TABLES:
+            rows = self._rows(name)
+            self._lookups[name] = KitLookup(_array(rows.column('part_number')), _array(rows.column('kit_part_number')))
+
+    def _rows(self, lookup):
+        # rows are sorted by lookup, so each lookup is one contiguous
+        # (zero-copy) slice of the mapped table
+        matches = pc.indices_nonzero(pc.equal(self._table.column('lookup'), lookup))
+        if len(matches) == 0:
+            return self._table.slice(0, 0)
+        start = matches[0].as_py()
+        return self._table.slice(start, matches[-1].as_py() + 1 - start)
+
+    @cached_property
+    def bom(self):
+        # kit -> component rows as a DataFrame (built on first use: only the
+        # kit coverage step reads it)
+        rows = self._rows(BOM_LOOKUP)
+        return pd.DataFrame({
+            'Kit Part Number': rows.column('part_number').to_numpy(),
+            'Component': rows.column('kit_part_number').to_numpy(),
+            'Qty': rows.column('quantity').to_numpy(),
+        })
+
+    def lookup(self, name):
+        return self._lookups[name]
+
+
+def open_snapshot(path):
+    table = read_mapped(path)
+    if table.schema.metadata.get(b'format') != SNAPSHOT_FORMAT.encode():
+        raise ValueError(f"Unsupported kit catalog snapshot: {path}")
+    return KitCatalog(table)
+
+
+def open_current(directory=SNAPSHOT_DIR):
+    # last snapshot built on this machine, e.g. when Google Drive is unreachable
+    with open(os.path.join(directory, CURRENT_FILE)) as f:
+        return open_snapshot(os.path.join(directory, f.read().strip()))
+
+
+def load_catalog(data, directory=SNAPSHOT_DIR):
+    return open_snapshot(build_snapshot(data, directory))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the Kit catalog snapshot.")
+    parser.add_argument('--source', help="Kit workbook path (default: download from Google Drive)")
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help="snapshot directory")
+    parser.add_argument('--force', action='store_true', help="rebuild even if the workbook is unchanged")
+    args = parser.parse_args(argv)
+
+    if args.source:
+        with open(args.source, 'rb') as f:
+            data = f.read()
+    else:
+        from reference_cache import download, kit_part_url
+        data = download(kit_part_url).getvalue()
+
+    path = snapshot_path(source_hash(data), args.dir)
+    existed = os.path.exists(path)
+    path = build_snapshot(data, args.dir, force=args.force)
+    catalog = open_snapshot(path)
+    status = 'rebuilt' if args.force or not existed else 'unchanged'
+    print(f"{status}: {path}")
+    for name in KIT_TABLES:
+        print(f"  {name}: {len(catalog.lookup(name))} parts")
+    print(f"  {BOM_LOOKUP}: {catalog.bom['Kit Part Number'].nunique()} kits, {len(catalog.bom)} components")
+
+
+if __name__ == '__main__':
+    main()
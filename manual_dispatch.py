@@ -1,19 +1,26 @@
+import time
 import streamlit as st
 import pandas as pd
-import requests
 from io import BytesIO
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Border, Side
 from openpyxl.styles import Alignment
+from reference_cache import schedule_cache, kit_cache, prefetch, submit_load, read_schedule_sheets
+from dispatch_rules import dedup_dispatch, normalize_sold_to, power_kit_numbers, mech_kit_numbers
+from key_encoding import KeyEncoder, sum_by_key, lookup_by_key
+from export_cache import dataset_hash, filter_state
+from report_jobs import job_download_button
+from table_view import show_dataframe
+from dimension_catalog import session_catalog
+from fg_history import open_as_of
+from fg_allocation import allocate_per_part, dispatchable_values, session_allocation
+from kit_bom import kit_coverage
+from monthly_reconciliation import MARKETING_PREFIX, MONTHLY_MEASURES, marketing_months, dispatch_by_month, reconcile_by_month
 alignment_center = Alignment(horizontal='center', vertical='center')
 
 st.set_page_config(layout="wide")
 st.title("Schedule vs Dispatch Report")
 
-# --- Google Drive Links (still used for schedule & kit) ---
-schedule_url = "https://drive.google.com/uc?id=19FkajdpPaiQHqXqR5eH0WqximI5Sohs7"
-kit_part_url = "https://drive.google.com/uc?id=18YkiGvirKsrrwg8IZq2H3Aje5HAw-Djp"
-
 # =========================
 #  MAIN INPUT AREA (CENTER)
 # =========================
@@ -46,12 +53,28 @@ with col1:
         )
 
 with col2:
-    fg_file = st.file_uploader(
-        "Upload FG Stock File (optional)",
-        type=["xlsx", "xls"],
-        key="fg_file"
+    fg_source = st.radio(
+        "FG Stock Source",
+        ["Upload FG file", "FG history (as of a date)"],
+        index=0
     )
 
+    fg_file = None
+    fg_snapshot = None
+    if fg_source == "Upload FG file":
+        fg_file = st.file_uploader(
+            "Upload FG Stock File (optional)",
+            type=["xlsx", "xls"],
+            key="fg_file"
+        )
+    else:
+        fg_as_of = st.date_input("FG stock as of", key="fg_as_of")
+        fg_snapshot = open_as_of(fg_as_of)
+        if fg_snapshot is None:
+            st.info("No FG history on or before this date; continuing without FG.")
+        elif fg_snapshot.day != fg_as_of:
+            st.caption(f"Using the FG snapshot of {fg_snapshot.day:%d-%m-%Y}.")
+
 # ==============
 # SIDEBAR CONTROLS
 # ==============
@@ -63,34 +86,50 @@ fg_filter_option = st.sidebar.selectbox(
     index=0
 )
 
+# Dispatchable FG rule: the per-part rule within each sheet (default, as
+# before), or one priority-ordered pass over both sheets with shared
+# part/kit FG pools
+fg_allocation_option = st.sidebar.radio(
+    "FG Allocation",
+    ["Global (priority, shared part/kit FG)", "Per part within sheet"],
+    index=1
+)
+allocation_variant = 'global' if fg_allocation_option.startswith("Global") else 'per_part'
+
 # View selector
 view_option = st.sidebar.radio("Select View", ["All", "Power Schedule", "Mech Schedule"])
 
+# Month-wise mode: each Marketing Requirement month against that month's billing
+monthly_mode = st.sidebar.checkbox("Month-wise reconciliation", value=False)
+
+# --- Start Google Drive fetch + parse in the background as soon as the page loads ---
+# (overlaps with the user uploading and with parsing the register below)
+kit_future = prefetch(kit_cache)
+schedule_future = prefetch(schedule_cache) if schedule_source == "Use Google Drive file" else None
+
 # --- Block execution until mandatory files are provided ---
 
 if dispatch_file is None:
     st.warning("Please upload the Sales Register (Dispatch) Excel file to continue.")
     st.stop()
 
-# Determine schedule file object
+# Determine schedule source (Google Drive copy is shared across sessions)
 if schedule_source == "Use Google Drive file":
-    try:
-        schedule_file = BytesIO(requests.get(schedule_url).content)
-    except Exception as e:
-        st.error(f"Error loading schedule from Google Drive: {e}")
-        st.stop()
+    schedule_file = None
 else:
     if uploaded_schedule_file is None:
         st.warning("Please upload the Schedule Excel file to continue.")
         st.stop()
     schedule_file = uploaded_schedule_file
+    # manual schedule is parsed in the background too
+    schedule_future = submit_load(read_schedule_sheets, schedule_file)
 
 # FG availability flag + reading + Storage Location filter
-fg_available = fg_file is not None
+fg_available = fg_file is not None or fg_snapshot is not None
 if fg_available:
     try:
-        # Read uploaded FG file
-        fg_raw = pd.read_excel(fg_file)
+        # Read uploaded FG file, or the stored snapshot in effect on the chosen date
+        fg_raw = pd.read_excel(fg_file) if fg_file is not None else fg_snapshot.frame.copy()
 
         # Drop first unintended index column if present
         if 'Unnamed: 0' in fg_raw.columns:
@@ -121,28 +160,31 @@ else:
 # Sales register (dispatch) from manual upload
 dispatch_df = pd.read_excel(dispatch_file)
 
-# Schedule sheets from selected source
-schedule_power = pd.read_excel(schedule_file, sheet_name="POWER", header=3)
-schedule_mech = pd.read_excel(schedule_file, sheet_name="MECH", header=3)
-
-# Kit file always from Google Drive
-kit_file = BytesIO(requests.get(kit_part_url).content)
-
-# --- Prepare kit lookups ---
-kit_psg = pd.read_excel(kit_file, sheet_name="PSG", usecols="K:M")
-kit_psg.columns = ["Part Number", "Desc", "Kit Part Number"]
-kit_psg["Part Number"] = kit_psg["Part Number"].astype(str)
-lookup_power_stg = dict(zip(kit_psg["Part Number"], kit_psg["Kit Part Number"]))
-
-kit_psg_mech = pd.read_excel(kit_file, sheet_name="PSG", usecols="S:T")
-kit_psg_mech.columns = ["Part Number", "Kit Part Number"]
-kit_psg_mech["Part Number"] = kit_psg_mech["Part Number"].astype(str)
-lookup_mech = dict(zip(kit_psg_mech["Part Number"], kit_psg_mech["Kit Part Number"]))
-
-kit_vp = pd.read_excel(kit_file, sheet_name="VP", usecols="B:D")
-kit_vp.columns = ["Part Number", "Desc", "Kit Part Number"]
-kit_vp["Part Number"] = kit_vp["Part Number"].astype(str)
-lookup_power_vp = dict(zip(kit_vp["Part Number"], kit_vp["Kit Part Number"]))
+# --- Join the background loads before reconciliation ---
+# Schedule sheets from selected source (shared frames are copied before mutation)
+try:
+    schedule_power, schedule_mech = schedule_future.result()
+except Exception as e:
+    source = "Google Drive" if schedule_file is None else "the uploaded file"
+    st.error(f"Error loading schedule from {source}: {e}")
+    st.stop()
+if schedule_file is None:
+    schedule_power = schedule_power.copy()
+    schedule_mech = schedule_mech.copy()
+
+# --- Kit lookups: always from Google Drive, one shared copy per process ---
+kit_catalog = kit_future.result()
+lookup_power_stg = kit_catalog.lookup('power_stg')
+lookup_mech = kit_catalog.lookup('mech')
+lookup_power_vp = kit_catalog.lookup('power_vp')
+
+# Identifies the data behind every table and export on this run
+data_version = (
+    'manual_dispatch', dataset_hash(dispatch_file, uploaded_schedule_file, fg_file),
+    fg_snapshot.path if fg_snapshot is not None else None,
+    schedule_cache.version if schedule_file is None else None, kit_catalog.version,
+    fg_filter_option, monthly_mode, allocation_variant
+)
 
 # --- Ensure Sold-to Party is string for safe comparisons ---
 dispatch_df['Sold-to Party'] = dispatch_df['Sold-to Party'].astype(str)
@@ -207,17 +249,7 @@ if billing_type_col is not None:
 dispatch_df.loc[dispatch_df['Sold-to Party'] == 'Q0001', 'Customer Group'] = 10
 
 # --- Updated Customer Code Logic: Add "." only if Plant = 2000 AND Sold-to Party starts with A or F ---
-def normalize_sold_to(row):
-    sold = str(row.get('Sold-to Party', '')) if pd.notna(row.get('Sold-to Party', '')) else ''
-    plant = str(row.get('Plant', '')).strip()
-
-    # Only apply when Plant = 2000 AND Sold-to Party starts with A or F (case-insensitive)
-    if plant.startswith("2000") and sold.upper().startswith(('A', 'F')):
-        if not sold.endswith('.'):
-            return sold + '.'
-    return sold
-
-dispatch_df['Sold-to Party'] = dispatch_df.apply(normalize_sold_to, axis=1)
+dispatch_df['Sold-to Party'] = normalize_sold_to(dispatch_df)
 
 # --- Filter out C* materials and replace zero Inv Qty with Kit Qty ---
 dispatch_df = dispatch_df[~dispatch_df['Material'].astype(str).str.startswith('C')]
@@ -229,106 +261,70 @@ dispatch_df = dispatch_df[dispatch_df['Material'] != 8043975905]
 dispatch_df = dispatch_df[dispatch_df['Customer Group'] == 10]
 
 # --- Select sales orders starting with 10 and handle duplicates logic ---
-keep_sales_order_10 = dispatch_df[dispatch_df['Sales Order No'].astype(str).str.startswith('10')]
-remaining = dispatch_df[~dispatch_df['Sales Order No'].astype(str).str.startswith('10')]
-
 # Defensive duplicate detection: support common column name variants
 billing_col_candidates = ['Billing Doc No.', 'Billing Doc No', 'Billing Doc.', 'Billing Doc', 'BillingDocNo']
-billing_col = next((c for c in billing_col_candidates if c in remaining.columns), None)
-
-if billing_col:
-    duplicates = remaining[billing_col].value_counts()[lambda x: x > 1].index.tolist()
-    duplicates_df = remaining[remaining[billing_col].isin(duplicates)]
-    unique_df = remaining[~remaining[billing_col].isin(duplicates)]
-else:
-    # if billing doc col not found, assume no duplicates
-    duplicates_df = pd.DataFrame(columns=remaining.columns)
-    unique_df = remaining.copy()
-
-# Keep only rows with Item == 10 in duplicates (if Item exists)
-if 'Item' in duplicates_df.columns:
-    duplicates_df = duplicates_df[duplicates_df['Item'] == 10]
+billing_col = next((c for c in billing_col_candidates if c in dispatch_df.columns), None)
 
-dispatch_df = pd.concat([keep_sales_order_10, unique_df, duplicates_df], ignore_index=True)
+# If billing doc col not found, no duplicates are assumed; without Item, duplicates are kept
+dispatch_df = dedup_dispatch(dispatch_df, variant='register', billing_col=billing_col)
 
-# --- Dispatch summary (Sold-to Party, Material) aggregated ---
-dispatch_summary = dispatch_df.groupby(['Sold-to Party', 'Material'], as_index=False)['Inv Qty'].sum()
-dispatch_summary.rename(columns={'Inv Qty': 'Dispatch Qty'}, inplace=True)
-
-# --- Ensure schedule types are strings for merges ---
+# --- Ensure schedule types are strings for display ---
 for df in [schedule_power, schedule_mech]:
     if 'Code' in df.columns:
         df['Code'] = df['Code'].astype(str)
     if 'Part Number' in df.columns:
         df['Part Number'] = df['Part Number'].astype(str)
 
-# --- Merge dispatch summary into schedules ---
-schedule_power = pd.merge(
-    schedule_power,
-    dispatch_summary,
-    left_on=['Code', 'Part Number'],
-    right_on=['Sold-to Party', 'Material'],
-    how='left'
-)
-schedule_mech = pd.merge(
-    schedule_mech,
-    dispatch_summary,
-    left_on=['Code', 'Part Number'],
-    right_on=['Sold-to Party', 'Material'],
-    how='left'
-)
+# --- Integer keys shared by schedule, dispatch, FG and kit tables ---
+keys = KeyEncoder()
+keys.fit('customer', schedule_power['Code'], schedule_mech['Code'], dispatch_df['Sold-to Party'])
+keys.fit('material', schedule_power['Part Number'], schedule_mech['Part Number'], dispatch_df['Material'])
+if fg_available:
+    keys.fit('material', fg_df['Material'])
+    keys.fit('plant', fg_df['Plant'])
 
-schedule_power['Dispatch Qty'] = schedule_power['Dispatch Qty'].fillna(0)
-schedule_mech['Dispatch Qty'] = schedule_mech['Dispatch Qty'].fillna(0)
+# --- Dispatch summary (Sold-to Party, Material) aggregated, joined on integer keys ---
+dispatch_key = keys.pair_key('customer', dispatch_df['Sold-to Party'], 'material', dispatch_df['Material'])
+dispatch_summary = sum_by_key(dispatch_key, dispatch_df['Inv Qty'])
+for df in [schedule_power, schedule_mech]:
+    schedule_key = keys.pair_key('customer', df['Code'], 'material', df['Part Number'])
+    df['Dispatch Qty'] = lookup_by_key(schedule_key, dispatch_summary, index=df.index)
 
 # --- Kit part number logic ---
-def get_power_kit(row):
-    desc = str(row.get('Description', '')).strip()
-    part = str(row.get('Part Number', ''))
-    if desc in ['STG GEAR KIT', 'STG GEAR KIT H-Pas']:
-        return lookup_power_stg.get(part, '')
-    if 'VANE PUMP KIT' in desc:
-        return lookup_power_vp.get(part, '')
-    return ''
-
 schedule_power.insert(
     schedule_power.columns.get_loc('Part Number') + 1,
     'Kit Part Number',
-    schedule_power.apply(get_power_kit, axis=1)
+    power_kit_numbers(schedule_power, lookup_power_stg, lookup_power_vp)
 )
 schedule_mech.insert(
     schedule_mech.columns.get_loc('Part Number') + 1,
     'Kit Part Number',
-    schedule_mech.apply(
-        lambda row: lookup_mech.get(str(row.get('Part Number', '')), '')
-        if str(row.get('Part Number', '')).startswith(('7820975', '734097')) else '',
-        axis=1
-    )
+    mech_kit_numbers(schedule_mech, lookup_mech)
 )
 
 # --- FG preparation (ONLY if FG file uploaded) ---
+def whole_quantities(values):
+    # the key lookups return floats; whole stock quantities go back to
+    # integers so the table and the Excel export show 12, not 12.0
+    values = pd.to_numeric(values, errors='coerce')
+    return values.astype('Int64') if (values.dropna() % 1 == 0).all() else values
+
 if fg_available:
     fg_df['Material'] = fg_df['Material'].astype(str)
     fg_df['Plant'] = fg_df['Plant'].astype(str)
 
+    # Unrestricted stock per (Material, Plant) key; kit parts share the material vocabulary
+    fg_by_key = sum_by_key(keys.pair_key('material', fg_df['Material'], 'plant', fg_df['Plant']), fg_df['Unrestricted'])
+
     def fg_sum(df, part_col, plant_col):
-        def get_plant_value(row, plant_key):
-            if plant_key in row:
-                return row[plant_key]
-            for alt in ['BILLING PLANT', 'Billing Plant', 'Billing_Plant']:
-                if alt in row:
-                    return row[alt]
-            return ''
-        def row_sum(row):
-            part = str(row.get(part_col, '')).strip()
-            plant = str(get_plant_value(row, plant_key=plant_col)).strip()
-            if part == '' or plant == '':
-                return 0
-            return fg_df.loc[(fg_df['Material'] == part) & (fg_df['Plant'] == plant), 'Unrestricted'].sum()
-        return df.apply(lambda r: row_sum(r), axis=1)
-
-    schedule_power['FG'] = fg_sum(schedule_power, 'Part Number', 'BILLING PLANT') + fg_sum(schedule_power, 'Kit Part Number', 'BILLING PLANT')
-    schedule_mech['FG'] = fg_sum(schedule_mech, 'Part Number', 'Billing Plant') + fg_sum(schedule_mech, 'Kit Part Number', 'Billing Plant')
+        plant_key = next((c for c in [plant_col, 'BILLING PLANT', 'Billing Plant', 'Billing_Plant'] if c in df.columns), None)
+        part = df[part_col].astype(str).str.strip() if part_col in df.columns else pd.Series('', index=df.index)
+        plant = df[plant_key].astype(str).str.strip() if plant_key else pd.Series('', index=df.index)
+        fg = lookup_by_key(keys.pair_key('material', part, 'plant', plant), fg_by_key, index=df.index)
+        return fg.where((part != '') & (plant != ''), 0)
+
+    schedule_power['FG'] = whole_quantities(fg_sum(schedule_power, 'Part Number', 'BILLING PLANT') + fg_sum(schedule_power, 'Kit Part Number', 'BILLING PLANT'))
+    schedule_mech['FG'] = whole_quantities(fg_sum(schedule_mech, 'Part Number', 'Billing Plant') + fg_sum(schedule_mech, 'Kit Part Number', 'Billing Plant'))
 
 # --- Marketing columns detection ---
 marketing_columns_power = [col for col in schedule_power.columns if str(col).startswith('Marketing Requirement')]
@@ -344,51 +340,111 @@ schedule_mech['Balance Dispatch'] = (marketing_sum_mech - schedule_mech['Dispatc
 schedule_power['Excess Dispatch'] = (schedule_power['Dispatch Qty'] - marketing_sum_power).clip(lower=0)
 schedule_mech['Excess Dispatch'] = (schedule_mech['Dispatch Qty'] - marketing_sum_mech).clip(lower=0)
 
-# --- Dispatchable FG: allocate ONLY if FG is available ---
-def allocate_dispatchable_fg(df, part_col='Part Number', fg_col='FG', balance_col='Balance Dispatch', out_col='Dispatchable FG'):
-    grouped = df.groupby(part_col).groups
-    for part, idxs in grouped.items():
-        idxs_list = list(idxs)
-        idxs_list.sort(
-            key=lambda i: float(df.at[i, balance_col]) if pd.notna(df.at[i, balance_col]) else 0.0,
-            reverse=True
+# --- Month-wise Dispatch/Balance/Excess: one (Sold-to, Material, Month) groupby for both sheets ---
+monthly_columns_power, monthly_columns_mech = [], []
+if monthly_mode:
+    date_col = next((c for c in ['Billing Date', 'Billing Doc Date'] if c in dispatch_df.columns), None)
+    months_power = marketing_months(marketing_columns_power)
+    months_mech = marketing_months(marketing_columns_mech)
+    months = sorted(set(months_power.values()) | set(months_mech.values()))
+    if date_col is None or not months:
+        st.warning("Month-wise reconciliation needs a Billing Date column in the Sales Register "
+                   "and 'Marketing Requirement <Month-Year>' columns in the schedule.")
+    else:
+        monthly_summary = dispatch_by_month(dispatch_key, dispatch_df[date_col], dispatch_df['Inv Qty'], months)
+        monthly_power = reconcile_by_month(
+            schedule_power, keys.pair_key('customer', schedule_power['Code'], 'material', schedule_power['Part Number']),
+            monthly_summary, months, months_power
         )
-        # Use single FG value (max) per part
-        fg_series = df.loc[idxs_list, fg_col].fillna(0).astype(float)
-        total_fg = float(fg_series.max()) if not fg_series.empty else 0.0
-        remaining = float(total_fg)
-        if remaining <= 0:
-            continue
-        for i in idxs_list:
-            bal = float(df.at[i, balance_col]) if pd.notna(df.at[i, balance_col]) else 0.0
-            if bal <= 0 or remaining <= 0:
-                continue
-            alloc = bal if remaining >= bal else remaining
-            if alloc > 0:
-                if float(alloc).is_integer():
-                    df.at[i, out_col] = int(alloc)
-                else:
-                    df.at[i, out_col] = alloc
-                remaining -= alloc
-    return df
+        monthly_mech = reconcile_by_month(
+            schedule_mech, keys.pair_key('customer', schedule_mech['Code'], 'material', schedule_mech['Part Number']),
+            monthly_summary, months, months_mech
+        )
+        schedule_power = pd.concat([schedule_power, monthly_power], axis=1)
+        schedule_mech = pd.concat([schedule_mech, monthly_mech], axis=1)
+        monthly_columns_power = list(monthly_power.columns)
+        monthly_columns_mech = list(monthly_mech.columns)
+
+# --- Dispatchable FG: allocate ONLY if FG is available ---
+def allocation_lines(df, plant_col):
+    # schedule lines in the shape allocate_fg expects (plant column as fg_sum finds it)
+    plant_key = next((c for c in [plant_col, 'BILLING PLANT', 'Billing Plant', 'Billing_Plant'] if c in df.columns), None)
+    return pd.DataFrame({
+        'Customer': df['Customer'] if 'Customer' in df.columns else '',
+        'Part Number': df['Part Number'],
+        'Kit Part Number': df['Kit Part Number'],
+        'Plant': df[plant_key] if plant_key else '',
+        'Balance Dispatch': df['Balance Dispatch'],
+    }, index=df.index)
+
+def sheet_values(values, sheet, index):
+    # one sheet's part of a per-line result indexed (Sheet, Row); an empty
+    # sheet has no rows in `lines`, so its key is missing
+    if sheet in values.index.get_level_values('Sheet'):
+        return values.xs(sheet, level='Sheet').reindex(index)
+    return pd.Series(index=index, dtype=float)
 
 if fg_available:
+    lines = pd.concat({
+        'Power': allocation_lines(schedule_power, 'BILLING PLANT'),
+        'Mech': allocation_lines(schedule_mech, 'Billing Plant'),
+    }, names=['Sheet', 'Row'])
+    lines['Customer'] = lines['Customer'].astype(str)
+
+fg_allocation = None
+if fg_available and allocation_variant == 'global':
+    customers = pd.concat([
+        df['Customer'] for df in [schedule_power, schedule_mech] if 'Customer' in df.columns
+    ] or [pd.Series(dtype=object)]).dropna().astype(str)
+    priority_customers = st.sidebar.multiselect(
+        "Customer priority for FG (first = highest)", list(pd.unique(customers))
+    )
+    st.sidebar.caption("Plants sharing FG (a billing plant may draw on the source plant's FG after its own)")
+    shared_plants = st.sidebar.data_editor(
+        pd.DataFrame({'Billing Plant': pd.Series(dtype=object), 'Source Plant': pd.Series(dtype=object)}),
+        num_rows='dynamic', key='fg_plant_sources', width='stretch'
+    )
+    plant_sources = {}
+    for billing_plant, source_plant in shared_plants.dropna().itertuples(index=False):
+        plant_sources.setdefault(str(billing_plant).strip(), []).append(str(source_plant).strip())
+    data_version += (tuple(priority_customers), tuple((plant, tuple(sources)) for plant, sources in plant_sources.items()))
+
+    # kept in session state: reruns and what-if scenarios start from it
+    fg_allocation = session_allocation(
+        data_version + ('FG allocation',), lines, fg_df, priority_customers, plant_sources
+    )
+    allocated = fg_allocation.allocated
+    schedule_power['Dispatchable FG'] = dispatchable_values(sheet_values(allocated, 'Power', schedule_power.index))
+    schedule_mech['Dispatchable FG'] = dispatchable_values(sheet_values(allocated, 'Mech', schedule_mech.index))
+elif fg_available:
     schedule_power['Dispatchable FG'] = 0
     schedule_mech['Dispatchable FG'] = 0
-    schedule_power = allocate_dispatchable_fg(
+    schedule_power = allocate_per_part(
         schedule_power,
         part_col='Part Number',
         fg_col='FG',
         balance_col='Balance Dispatch',
         out_col='Dispatchable FG'
     )
-    schedule_mech = allocate_dispatchable_fg(
+    schedule_mech = allocate_per_part(
         schedule_mech,
         part_col='Part Number',
         fg_col='FG',
         balance_col='Balance Dispatch',
         out_col='Dispatchable FG'
     )
+if fg_available:
+    schedule_power['Dispatchable FG'] = whole_quantities(schedule_power['Dispatchable FG'])
+    schedule_mech['Dispatchable FG'] = whole_quantities(schedule_mech['Dispatchable FG'])
+
+# --- Kit component coverage: kit demand exploded over the Kit workbook BOM ---
+kit_components = None
+if fg_available and not kit_catalog.bom.empty:
+    line_coverage, kit_components = kit_coverage(lines, kit_catalog.bom, fg_df)
+    # share of the kit's components in FG at the line's plant (least covered component)
+    line_coverage = (line_coverage * 100).round(1)
+    schedule_power['Kit Coverage %'] = sheet_values(line_coverage, 'Power', schedule_power.index)
+    schedule_mech['Kit Coverage %'] = sheet_values(line_coverage, 'Mech', schedule_mech.index)
 
 # --- Final column selection & ordering ---
 # Power
@@ -405,6 +461,9 @@ if fg_available:
         power_cols.insert(power_cols.index('Excess Dispatch'), 'FG')
     if 'Dispatchable FG' in schedule_power.columns:
         power_cols.insert(power_cols.index('Excess Dispatch'), 'Dispatchable FG')
+    if 'Kit Coverage %' in schedule_power.columns:
+        power_cols.insert(power_cols.index('Excess Dispatch'), 'Kit Coverage %')
+power_cols += monthly_columns_power
 # ZFI SCOPE if present
 if 'ZFI SCOPE' in schedule_power.columns:
     power_cols.append('ZFI SCOPE')
@@ -424,6 +483,9 @@ if fg_available:
         mech_cols.insert(mech_cols.index('Excess Dispatch'), 'FG')
     if 'Dispatchable FG' in schedule_mech.columns:
         mech_cols.insert(mech_cols.index('Excess Dispatch'), 'Dispatchable FG')
+    if 'Kit Coverage %' in schedule_mech.columns:
+        mech_cols.insert(mech_cols.index('Excess Dispatch'), 'Kit Coverage %')
+mech_cols += monthly_columns_mech
 
 schedule_mech = schedule_mech[mech_cols]
 
@@ -474,89 +536,51 @@ def display_subtotals(df):
         unsafe_allow_html=True
     )
 
-# --- Views and filters ---
-if view_option == "Power Schedule":
-    code = st.sidebar.multiselect('Code', schedule_power['Code'].unique())
-    customer = st.sidebar.multiselect('Customer', schedule_power['Customer'].unique())
-    billing_plant = st.sidebar.multiselect(
-        'Billing Plant',
-        schedule_power['BILLING PLANT'].unique() if 'BILLING PLANT' in schedule_power.columns else []
-    )
-    model = st.sidebar.multiselect(
-        'Model',
-        schedule_power['MODEL'].unique() if 'MODEL' in schedule_power.columns else []
-    )
-    part_number_search = st.sidebar.text_input('Part Number (Type & Press Enter)')
-    filtered_power = apply_filters(schedule_power, code, customer, billing_plant, model, part_number_search, 'Power')
+# --- Excel export (SUBTOTAL row, freeze panes, filters, borders, widths, center alignment) ---
+def build_schedule_export(power_df, mech_df, progress=None):
+    # progress(step, total): called after each sheet is written and formatted, and after saving
+    sheet_count = int(not power_df.empty) + int(not mech_df.empty)
 
-    display_subtotals(filtered_power)
-    st.dataframe(filtered_power, use_container_width=True)
-    power_to_download = filtered_power
-    mech_to_download = pd.DataFrame()
+    def report(step):
+        if progress:
+            progress(step, 2 * sheet_count + 1)
 
-elif view_option == "Mech Schedule":
-    code = st.sidebar.multiselect('Code', schedule_mech['Code'].unique())
-    customer = st.sidebar.multiselect('Customer', schedule_mech['Customer'].unique())
-    billing_plant = st.sidebar.multiselect(
-        'Billing Plant',
-        schedule_mech['Billing Plant'].unique() if 'Billing Plant' in schedule_mech.columns else []
-    )
-    model = st.sidebar.multiselect(
-        'Model',
-        schedule_mech['Model'].unique() if 'Model' in schedule_mech.columns else []
-    )
-    part_number_search = st.sidebar.text_input('Part Number (Type & Press Enter)')
-    filtered_mech = apply_filters(schedule_mech, code, customer, billing_plant, model, part_number_search, 'Mech')
-
-    display_subtotals(filtered_mech)
-    st.dataframe(filtered_mech, use_container_width=True)
-    power_to_download = pd.DataFrame()
-    mech_to_download = filtered_mech
-
-else:
-    power_to_download = schedule_power.copy()
-    mech_to_download = schedule_mech.copy()
-    st.write("### Power Schedule")
-    st.dataframe(schedule_power, use_container_width=True)
-    st.write("### Mech Schedule")
-    st.dataframe(schedule_mech, use_container_width=True)
-
-# --- Download logic (Excel with SUBTOTAL row, freeze panes, filters, borders, widths, center alignment) ---
-if not power_to_download.empty or not mech_to_download.empty:
     output = BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
 
-        # Columns for which SUBTOTAL formulas will be applied
+        # Columns for which SUBTOTAL formulas will be applied (plus every
+        # Marketing Requirement month and the month-wise columns)
         subtotal_cols = [
             "Initial Schedule",
             "REV-1",
             "REV-2",
-            "Marketing Requirement November-2025",
             "Dispatch Qty",
             "Balance Dispatch",
             "FG",
             "Dispatchable FG",
             "Excess Dispatch"
         ]
+        subtotal_prefixes = (MARKETING_PREFIX,) + tuple(f"{measure} " for measure in MONTHLY_MEASURES)
 
         def write_with_subtotals(df, sheet_name):
             df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=2)
+            report(f"{sheet_name} written")
             ws = writer.book[sheet_name]
 
             data_start = 4
             data_end = df.shape[0] + 3
 
             for col_idx, col_name in enumerate(df.columns, start=1):
-                if col_name in subtotal_cols:
+                if col_name in subtotal_cols or str(col_name).startswith(subtotal_prefixes):
                     col_letter = get_column_letter(col_idx)
                     formula = f"=SUBTOTAL(9,{col_letter}{data_start}:{col_letter}{data_end})"
                     ws[f"{col_letter}2"] = formula
 
         # Write Sheets
-        if not power_to_download.empty:
-            write_with_subtotals(power_to_download, "Power")
-        if not mech_to_download.empty:
-            write_with_subtotals(mech_to_download, "Mech")
+        if not power_df.empty:
+            write_with_subtotals(power_df, "Power")
+        if not mech_df.empty:
+            write_with_subtotals(mech_df, "Mech")
 
         workbook = writer.book
         thin_border = Border(
@@ -591,12 +615,117 @@ if not power_to_download.empty or not mech_to_download.empty:
                 for cell in row:
                     cell.border = thin_border
                     cell.alignment = alignment_center
+            report(f"{sheet_name} formatted")
 
+    report("saved")
     output.seek(0)
-    st.download_button(
-        "Download Excel",
-        output,
-        "Schedule_with_Dispatch.xlsx",
+    return output
+
+# --- Views and filters ---
+if view_option == "Power Schedule":
+    # option lists in sheet order; a column missing from the sheet has none
+    dimensions = session_catalog(
+        data_version + ('Power',), schedule_power,
+        columns=['Code', 'Customer', 'BILLING PLANT', 'MODEL'], sort=False
+    )
+    code = st.sidebar.multiselect('Code', dimensions.values('Code'))
+    customer = st.sidebar.multiselect('Customer', dimensions.values('Customer'))
+    billing_plant = st.sidebar.multiselect('Billing Plant', dimensions.values('BILLING PLANT'))
+    model = st.sidebar.multiselect('Model', dimensions.values('MODEL'))
+    part_number_search = st.sidebar.text_input('Part Number (Type & Press Enter)')
+    filtered_power = apply_filters(schedule_power, code, customer, billing_plant, model, part_number_search, 'Power')
+    export_filters = filter_state(code=code, customer=customer, billing_plant=billing_plant,
+                                  model=model, part_number_search=part_number_search)
+
+    display_subtotals(filtered_power)
+    show_dataframe(filtered_power, cache_key=data_version + ('Power', export_filters), width='stretch')
+    power_to_download = filtered_power
+    mech_to_download = pd.DataFrame()
+
+elif view_option == "Mech Schedule":
+    # option lists in sheet order; a column missing from the sheet has none
+    dimensions = session_catalog(
+        data_version + ('Mech',), schedule_mech,
+        columns=['Code', 'Customer', 'Billing Plant', 'Model'], sort=False
+    )
+    code = st.sidebar.multiselect('Code', dimensions.values('Code'))
+    customer = st.sidebar.multiselect('Customer', dimensions.values('Customer'))
+    billing_plant = st.sidebar.multiselect('Billing Plant', dimensions.values('Billing Plant'))
+    model = st.sidebar.multiselect('Model', dimensions.values('Model'))
+    part_number_search = st.sidebar.text_input('Part Number (Type & Press Enter)')
+    filtered_mech = apply_filters(schedule_mech, code, customer, billing_plant, model, part_number_search, 'Mech')
+    export_filters = filter_state(code=code, customer=customer, billing_plant=billing_plant,
+                                  model=model, part_number_search=part_number_search)
+
+    display_subtotals(filtered_mech)
+    show_dataframe(filtered_mech, cache_key=data_version + ('Mech', export_filters), width='stretch')
+    power_to_download = pd.DataFrame()
+    mech_to_download = filtered_mech
+
+else:
+    power_to_download = schedule_power.copy()
+    mech_to_download = schedule_mech.copy()
+    export_filters = filter_state()
+    st.write("### Power Schedule")
+    show_dataframe(schedule_power, cache_key=data_version + ('Power', export_filters), width='stretch')
+    st.write("### Mech Schedule")
+    show_dataframe(schedule_mech, cache_key=data_version + ('Mech', export_filters), width='stretch')
+
+# --- Component demand vs FG per plant for the scheduled kits ---
+if kit_components is not None:
+    with st.expander("Kit component coverage"):
+        st.caption("Balance Dispatch of kit lines exploded into components (Kit workbook BOM), against FG per plant; least covered first.")
+        show_dataframe(kit_components, cache_key=data_version + ('Kit components',), width='stretch')
+
+# --- Why each line got its Dispatchable FG (global allocation only) ---
+if fg_allocation is not None:
+    with st.expander("FG allocation report"):
+        st.caption("Lines in allocation order: customer priority, then largest Balance Dispatch.")
+        show_dataframe(fg_allocation.report().reset_index(), cache_key=data_version + ('Allocation',), width='stretch')
+
+    # What-if runs as a fragment: editing a scenario reruns only this panel,
+    # against the allocation kept in session state
+    @st.fragment
+    def what_if_panel(allocation, customers):
+        st.caption("FG changes (e.g. stock clearing QC) per Material and Plant; negative quantities remove stock.")
+        changes = st.data_editor(
+            pd.DataFrame({'Material': pd.Series(dtype=object), 'Plant': pd.Series(dtype=object), 'Qty Change': pd.Series(dtype=float)}),
+            num_rows='dynamic', key='what_if_fg', width='stretch'
+        )
+        ranking = st.multiselect(
+            "Scenario customer priority (first = highest)", customers,
+            default=list(allocation.priority_ranking), key='what_if_priority'
+        )
+        stock_changes = {}
+        for material, plant, quantity in changes.dropna().itertuples(index=False):
+            key = (str(material).strip(), str(plant).strip())
+            stock_changes[key] = stock_changes.get(key, 0.0) + float(quantity)
+        if not stock_changes and tuple(ranking) == allocation.priority_ranking:
+            st.info("Add FG changes or change the customer priority to compare a scenario with the baseline.")
+            return
+
+        started = time.perf_counter()
+        changed = allocation.what_if(stock_changes, ranking)
+        elapsed = time.perf_counter() - started
+        baseline_total = float(allocation.allocated.sum())
+        col_base, col_scenario, col_lines = st.columns(3)
+        col_base.metric("Baseline Dispatchable FG", f"{baseline_total:,.0f}")
+        col_scenario.metric("Scenario Dispatchable FG", f"{baseline_total + changed['Change'].sum():,.0f}", f"{changed['Change'].sum():+,.0f}")
+        col_lines.metric("Lines changed", len(changed))
+        st.caption(f"Recomputed in {elapsed * 1000:.0f} ms.")
+        st.dataframe(changed.reset_index(), width='stretch')
+
+    with st.expander("What-if scenario"):
+        what_if_panel(fg_allocation, list(pd.unique(customers)))
+
+# --- Download logic: workbook is built in the background once requested ---
+if not power_to_download.empty or not mech_to_download.empty:
+    export_key = data_version + (view_option, export_filters)
+    job_download_button(
+        export_key,
+        lambda progress: build_schedule_export(power_to_download, mech_to_download, progress),
+        label="Download Excel",
+        file_name="Schedule_with_Dispatch.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from key_encoding import MISSING_KEY, sum_by_key
+
+# Month-wise Schedule vs Dispatch: each 'Marketing Requirement <Month-Year>'
+# column of the schedule is reconciled against the dispatches billed in that
+# month only. The register is summed by (Sold-to Party, Material, Month) in
+# one groupby on a single integer key, and Balance/Excess for every month
+# come out of one matrix operation (schedule rows x months).
+
+MARKETING_PREFIX = 'Marketing Requirement'
+MONTH_FORMAT = '%B-%Y'  # 'November-2025'
+MONTHLY_MEASURES = ('Dispatch Qty', 'Balance Dispatch', 'Excess Dispatch')
+
+
+def marketing_months(columns):
+    # {marketing column: month Period} for columns whose suffix is a month
+    months = {}
+    for col in columns:
+        if not str(col).startswith(MARKETING_PREFIX):
+            continue
+        label = str(col)[len(MARKETING_PREFIX):].strip()
+        date = pd.to_datetime(label, format=MONTH_FORMAT, errors='coerce')
+        if not pd.isna(date):
+            months[col] = date.to_period('M')
+    return months
+
+
+def monthly_column(measure, month):
+    return f"{measure} {month.strftime(MONTH_FORMAT)}"
+
+
+def month_positions(dates, months):
+    # position of each date's month in `months`; -1 outside them or undated
+    periods = pd.to_datetime(dates, dayfirst=True, errors='coerce').dt.to_period('M')
+    return pd.PeriodIndex(months, freq='M').get_indexer(periods)
+
+
+def dispatch_by_month(pair_keys, dates, qty, months):
+    # Inv Qty summed per (pair key, month), keyed pair_key * len(months) + month
+    positions = month_positions(pd.Series(dates), months)
+    keys = np.where((pair_keys == MISSING_KEY) | (positions < 0), MISSING_KEY, pair_keys * len(months) + positions)
+    return sum_by_key(keys, qty)
+
+
+def reconcile_by_month(schedule, schedule_keys, summary, months, months_by_column):
+    # Dispatch/Balance/Excess per month for every schedule row, in month order;
+    # months: the month list `summary` was built with (may cover both sheets)
+    columns = sorted(months_by_column, key=months_by_column.get)
+    positions = np.array([months.index(months_by_column[col]) for col in columns], dtype=np.int64)
+    schedule_keys = np.asarray(schedule_keys)
+    keys = schedule_keys[:, None] * len(months) + positions
+    keys[schedule_keys == MISSING_KEY] = MISSING_KEY
+    dispatched = summary.reindex(keys.ravel()).fillna(0).to_numpy(dtype=float).reshape(len(schedule), len(columns))
+    required = schedule[columns].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype=float)
+
+    measures = {
+        'Dispatch Qty': dispatched,
+        'Balance Dispatch': np.clip(required - dispatched, 0, None),
+        'Excess Dispatch': np.clip(dispatched - required, 0, None),
+    }
+    result = {}
+    for i, col in enumerate(columns):
+        for measure in MONTHLY_MEASURES:
+            result[monthly_column(measure, months_by_column[col])] = measures[measure][:, i]
+    return pd.DataFrame(result, index=schedule.index)
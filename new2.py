@@ -1,3 +1,4 @@
+import hashlib
 import streamlit as st
 import pandas as pd
 import numpy as np
@@ -5,9 +6,48 @@ from io import BytesIO
 import plotly.express as px
 import seaborn as sns
 import matplotlib.pyplot as plt
+from dispatch_rules import dedup_dispatch, update_customer_names
+from table_view import paginated_table, show_dataframe
+from export_cache import dataset_hash
+from dimension_catalog import session_catalog
+from drill_rollup import session_rollup
+from date_index import DateIndex, date_order, financial_year_labels, month_bounds, intersect
+
+# Pages derive column-level views of dispatch_data instead of copying it:
+# with copy-on-write a filtered or column-subset frame shares memory with
+# the base frame until a column is assigned, and only that column is copied.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)  # always on from pandas 3
+
+# Sidebar selections compared as text
+TEXT_FILTER_COLUMNS = ('Plant', 'Billing Doc No.')
 
 def to_cr(value):
     return value / 1e7
+
+def selection_mask(df, selections):
+    # One row mask for all sidebar selections ('All' = no filter), so a page
+    # takes a single row subset of the base frame instead of one per filter
+    mask = np.ones(len(df), dtype=bool)
+    for column, value in selections.items():
+        if value != 'All':
+            values = df[column].astype(str) if column in TEXT_FILTER_COLUMNS else df[column]
+            mask &= (values == value).to_numpy(dtype=bool)
+    return mask
+
+def date_slice(index, month='All', fy='All', date_range=None):
+    # Month-Year, FY and date-range selections as one contiguous row slice
+    bounds = [index.all]
+    if month != 'All':
+        bounds.append(index.month(month))
+    if fy != 'All':
+        bounds.append(index.financial_year(fy))
+    if date_range is not None:
+        bounds.append(index.between(*date_range))
+    return intersect(*bounds)
+
+def contains_mask(column, text, case=True):
+    return column.astype(str).str.contains(text, case=case, regex=False, na=False).to_numpy(dtype=bool)
     
 st.set_page_config(layout="wide")
 st.title('Dispatch Data Dashboard 📊')
@@ -16,7 +56,7 @@ page = st.sidebar.radio("Select Page", ['Overview', 'SPD', 'OEM', 'Daywise Dispa
 
 uploaded_file = st.file_uploader("Upload your Dispatch Data Excel file", type=['xlsx', 'csv'])
 
-if uploaded_file is not None:
+def enrich_dispatch(uploaded_file):
     if uploaded_file.name.lower().endswith('.xlsx'):
         dispatch_data = pd.read_excel(uploaded_file)
     else:
@@ -27,29 +67,7 @@ if uploaded_file is not None:
     dispatch_data.insert(
         dispatch_data.columns.get_loc('Customer Name') + 1,
         'Updated Customer Name',
-        np.select(
-            [
-                dispatch_data['Customer Name'].str.lower().str.startswith('ashok', na=False),
-                dispatch_data['Customer Name'].str.lower().str.startswith('tata', na=False) & ~dispatch_data['Customer Name'].str.lower().str.startswith('tata advanced', na=False),
-                dispatch_data['Customer Name'].str.lower().str.startswith('blue energy', na=False),
-                dispatch_data['Customer Name'].str.lower().str.startswith('force motors', na=False),
-                dispatch_data['Customer Name'].str.lower().str.startswith('cnh', na=False),
-                dispatch_data['Customer Name'].str.lower().str.startswith('bajaj auto', na=False),
-                dispatch_data['Sold-to Party'].str.upper().isin(['M0163', 'M0164', 'M0231']),
-                dispatch_data['Sold-to Party'].str.upper().isin(['M0009', 'M0010', 'M0221']),
-            ],
-            [
-                'Ashok Leyland',
-                'Tata Motors',
-                'Blue Energy',
-                'Force Motors',
-                'CNH',
-                'Bajaj Auto',
-                'Mahindra Swaraj',
-                'M&M'
-            ],
-            default=dispatch_data['Customer Name']
-        )
+        update_customer_names(dispatch_data)
     )
     def categorize_material(material):
         material_str = str(material)
@@ -79,6 +97,14 @@ if uploaded_file is not None:
     dispatch_data['Billing Date'] = pd.to_datetime(dispatch_data['Billing Date'], dayfirst=True, errors='coerce')
     dispatch_data['Cust PO Date'] = pd.to_datetime(dispatch_data['Cust PO Date'], dayfirst=True, errors='coerce')
 
+    # Rows are kept in Billing Date order so that date, month and FY
+    # selections are row slices of the frame; file_rows is each row's
+    # position in the uploaded file
+    file_rows = date_order(dispatch_data, 'Billing Date')
+    dispatch_data = dispatch_data.iloc[file_rows].reset_index(drop=True)
+    billing_index = DateIndex(dispatch_data['Billing Date'])
+    financial_years = financial_year_labels(dispatch_data['Billing Date'])
+
     dispatch_data.insert(
         dispatch_data.columns.get_loc('Billing Date') + 1,
         'Month-Year',
@@ -125,31 +151,83 @@ if uploaded_file is not None:
         )
     )
 
-    def assign_financial_year(date_str):
-        try:
-            date = pd.to_datetime(date_str, dayfirst=True)
-            if date.month >= 4:
-                fy_start = date.year
-                fy_end = date.year + 1
-            else:
-                fy_start = date.year - 1
-                fy_end = date.year
-            return f"FY {fy_start}-{str(fy_end)[-2:]}"
-        except:
-            return None
+    dispatch_data['Financial Year'] = financial_years
+
+    # Quantities derived for the pages, kept beside the frame rather than as
+    # columns so that the page tables are unchanged
+    inv_qty = pd.to_numeric(dispatch_data['Inv Qty'], errors='coerce').fillna(0)
+    kit_qty = pd.to_numeric(dispatch_data['Kit Qty'], errors='coerce').fillna(0)
+    derived = pd.DataFrame({
+        'Inv Qty': inv_qty,
+        'Kit Qty': kit_qty,
+        'Total Dispatch': inv_qty + kit_qty,
+        'Effective Qty': inv_qty.where((dispatch_data['Customer Category'] == 'OEM') | (inv_qty > 0), kit_qty),
+    })
+    return dispatch_data, billing_index, derived, file_rows
+
+def appended_to(memo, uploaded_file):
+    # Row count of the previous upload when this CSV is that file with rows
+    # appended (its bytes start with the previous file's bytes), else None
+    previous = memo.get('appendable')
+    if previous is None or not uploaded_file.name.lower().endswith('.csv'):
+        return None
+    data = uploaded_file.getvalue()
+    size, rows = previous
+    if len(data) <= size or hashlib.sha1(data[:size]).hexdigest() != memo['key']:
+        return None
+    return rows
+
+def session_dispatch(uploaded_file):
+    # Enriched register kept in session state for the current upload, so
+    # page switches and other reruns skip reading and enrichment; a new
+    # upload (different hash) replaces it. When the new upload is the
+    # previous CSV with rows appended, 'grown' records the previous key and
+    # the new rows, so per-dataset catalogs are extended instead of rebuilt.
+    dataset_key = dataset_hash(uploaded_file)
+    memo = st.session_state.get('_enriched_dispatch')
+    if memo is None or memo['key'] != dataset_key:
+        grown = None
+        if memo is not None:
+            previous_rows = appended_to(memo, uploaded_file)
+            if previous_rows is not None:
+                grown = memo['key'], previous_rows
+        # drop the previous upload's frames before building the new ones
+        memo = None
+        st.session_state.pop('_enriched_dispatch', None)
+        dispatch_data, billing_index, derived, file_rows = enrich_dispatch(uploaded_file)
+        data = uploaded_file.getvalue()
+        # a CSV ending in a newline can be extended by appending rows
+        appendable = uploaded_file.name.lower().endswith('.csv') and data.endswith(b'\n')
+        memo = st.session_state['_enriched_dispatch'] = {
+            'key': dataset_key, 'data': dispatch_data, 'index': billing_index, 'derived': derived,
+            'appendable': (len(data), len(dispatch_data)) if appendable else None,
+            'grown': None if grown is None else (grown[0], file_rows >= grown[1]),
+        }
+    return memo
+
+if uploaded_file is not None:
+    enriched = session_dispatch(uploaded_file)
+    dataset_key = enriched['key']
+    dispatch_data, billing_index, derived = enriched['data'], enriched['index'], enriched['derived']
+
+    # Sidebar option lists, built once per uploaded file (extended with the
+    # new rows when the file grew)
+    grown = enriched['grown']
+    dimensions = session_catalog(
+        (dataset_key, 'dispatch'), dispatch_data,
+        extends=grown and ((grown[0], 'dispatch'), grown[1]),
+        columns=['Month-Year', 'Financial Year', 'Updated Customer Name', 'Customer Name', 'Material Category', 'Model New'],
+        text_columns=['Plant', 'Material', 'Billing Doc No.'],
+        hierarchies=[('Updated Customer Name', 'Customer Name')],
+    )
 
-    dispatch_data['Financial Year'] = dispatch_data['Billing Date'].apply(assign_financial_year)
     if page == 'Overview':
         st.header('Overview Page')
-        month_list = sorted(dispatch_data['Month-Year'].dropna().unique().tolist())
-        month_list.insert(0, 'All')
+        month_list = dimensions.options('Month-Year')
         selected_month = st.sidebar.selectbox('Select Month-Year (Overview)', month_list)
         
-        overview_data = dispatch_data.copy()
-        if selected_month != 'All':
-            overview_data = overview_data[overview_data['Month-Year'] == selected_month]
-
-        overview_data = overview_data.sort_values('Month Start Date')
+        # groupby sorts by its keys, so the rows need no sorting first
+        overview_data = dispatch_data.iloc[date_slice(billing_index, month=selected_month)]
             
         monthly_sales = overview_data.groupby(['Month-Year', 'Month Start Date'])['Basic Amt.LocCur'].sum().reset_index()
         monthly_sales = monthly_sales.sort_values('Month Start Date')
@@ -253,25 +331,13 @@ if uploaded_file is not None:
         categories_to_include = ['OEM', 'SPD']
         material_categories_to_include = ['Power STG', 'Mechanical Stg', 'Power STG H-Pas']
         
-        overview_data = dispatch_data.copy()
-        
-        overview_data['Inv Qty'] = pd.to_numeric(overview_data['Inv Qty'], errors='coerce').fillna(0)
-        overview_data['Kit Qty'] = pd.to_numeric(overview_data['Kit Qty'], errors='coerce').fillna(0)
-        
-        if selected_month != 'All':
-            overview_data = overview_data[overview_data['Month-Year'] == selected_month]
-            
-        overview_data = overview_data[
-            (overview_data['Customer Category'].isin(['OEM', 'SPD'])) &
-            (overview_data['Material Category'].isin(['Power STG', 'Mechanical Stg', 'Power STG H-Pas']))
-        ]
-        
-        overview_data['Effective Qty'] = overview_data.apply(
-            lambda row: row['Inv Qty']
-            if (row['Customer Category'] == 'OEM' or row['Inv Qty'] > 0)
-            else row['Kit Qty'],
-            axis=1
+        month_data = dispatch_data.iloc[date_slice(billing_index, month=selected_month)]
+        qty_mask = (
+            month_data['Customer Category'].isin(categories_to_include) &
+            month_data['Material Category'].isin(material_categories_to_include)
         )
+        overview_data = month_data.loc[qty_mask, ['Customer Category', 'Material Category']]
+        overview_data['Effective Qty'] = derived['Effective Qty']
         
         grouped = overview_data.groupby(['Material Category', 'Customer Category'])['Effective Qty'].sum().reset_index()
         
@@ -298,48 +364,48 @@ if uploaded_file is not None:
 
         fig.update_traces(texttemplate='%{text:.0f}', textposition='outside', cliponaxis=False)
 
-        st.plotly_chart(fig_total_sales, use_container_width=True)
-        st.plotly_chart(fig_oem_spd, use_container_width=True)
-        st.plotly_chart(fig_plant_sales, use_container_width=True)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig_total_sales, width='stretch')
+        st.plotly_chart(fig_oem_spd, width='stretch')
+        st.plotly_chart(fig_plant_sales, width='stretch')
+        st.plotly_chart(fig, width='stretch')
 
     elif page == 'SPD':
         st.header('SPD Page')
         spd_data = dispatch_data[dispatch_data['Customer Category'] == 'SPD']
-        st.dataframe(spd_data)
+        paginated_table(spd_data, key='spd', sum_cols=['Inv Qty', 'Kit Qty', 'Basic Amt.LocCur'])
 
     elif page == 'OEM':
         st.header('OEM Dashboard')
         
         oem_df = dispatch_data[dispatch_data['Customer Category'] == 'OEM']
         oem_df['Material Category'] = oem_df['Material Category'].replace('Power STG H-Pas', 'Power STG')
-        oem_months = sorted(oem_df['Month-Year'].dropna().unique())
-        oem_months_with_all = ['All'] + list(oem_months)
+        oem_dimensions = session_catalog(
+            (dataset_key, 'oem'), oem_df,
+            extends=grown and ((grown[0], 'oem'), grown[1][(dispatch_data['Customer Category'] == 'OEM').to_numpy()]),
+            columns=['Month-Year', 'Updated Customer Name'],
+            hierarchies=[('Month-Year', 'Updated Customer Name')],
+        )
+        # Every chart below is a lookup into totals built once per upload
+        oem_rollup = session_rollup((dataset_key, 'oem'), oem_df)
+        oem_months_with_all = oem_dimensions.options('Month-Year')
 
         selected_month = st.sidebar.selectbox('Select Month (OEM):', oem_months_with_all)
 
-        filtered_df = oem_df.copy()
-        
-        if selected_month != 'All':
-            filtered_df = filtered_df[filtered_df['Month-Year'] == selected_month]
-            
-        updated_customers = sorted(filtered_df['Updated Customer Name'].dropna().unique())
-        updated_customers.insert(0, 'All')
+        updated_customers = oem_dimensions.child_options('Month-Year', 'Updated Customer Name', selected_month)
         selected_updated_customer = st.sidebar.selectbox("Select Updated Customer Name (OEM):", updated_customers)
         
-        if selected_updated_customer != 'All':
-            filtered_df = filtered_df[filtered_df['Updated Customer Name'] == selected_updated_customer]
-        
-        customer_names = sorted(filtered_df['Customer Name'].dropna().unique())
+        drill = {'Updated Customer Name': selected_updated_customer}
+        customer_names = oem_rollup.totals(['Customer Name'], drill, selected_month).index.tolist()
         customer_names.insert(0, 'All')
         selected_customer_name = st.sidebar.selectbox("Select Customer Name (OEM):", customer_names)
         
-        if selected_customer_name != 'All':
-            filtered_df = filtered_df[filtered_df['Customer Name'] == selected_customer_name]
-            
+        drill['Customer Name'] = selected_customer_name
+
+        def oem_totals(breakdown, category='All'):
+            return oem_rollup.totals(breakdown, drill, selected_month, category)
+
         st.subheader('OEM - Power STG - Customer-wise Quantity')
-        oem_power_stg = filtered_df[filtered_df['Material Category'] == 'Power STG']
-        oem_power_cust_qty = oem_power_stg.groupby('Updated Customer Name')['Inv Qty'].sum().sort_values(ascending=False)
+        oem_power_cust_qty = oem_totals(['Updated Customer Name'], 'Power STG')['Inv Qty'].sort_values(ascending=False)
         fig, ax = plt.subplots(figsize=(10, 5))
         sns.barplot(y=oem_power_cust_qty.index, x=oem_power_cust_qty.values, palette='Blues_r', ax=ax)
         for i, (name, value) in enumerate(zip(oem_power_cust_qty.index, oem_power_cust_qty.values)):
@@ -347,8 +413,7 @@ if uploaded_file is not None:
         st.pyplot(fig)
         
         st.subheader('OEM - Mechanical Stg - Customer-wise Quantity')
-        oem_mech_stg = filtered_df[filtered_df['Material Category'] == 'Mechanical Stg']
-        oem_mech_cust_qty = oem_mech_stg.groupby('Updated Customer Name')['Inv Qty'].sum().sort_values(ascending=False)
+        oem_mech_cust_qty = oem_totals(['Updated Customer Name'], 'Mechanical Stg')['Inv Qty'].sort_values(ascending=False)
         fig, ax = plt.subplots(figsize=(10, 5))
         sns.barplot(y=oem_mech_cust_qty.index, x=oem_mech_cust_qty.values, palette='Greens_r', ax=ax)
         for i, (name, value) in enumerate(zip(oem_mech_cust_qty.index, oem_mech_cust_qty.values)):
@@ -356,7 +421,7 @@ if uploaded_file is not None:
         st.pyplot(fig)
         
         st.subheader('OEM - Customer-wise Total Value (₹)')
-        oem_cust_value = filtered_df.groupby('Updated Customer Name')['Basic Amt.LocCur'].sum().sort_values(ascending=False)
+        oem_cust_value = oem_totals(['Updated Customer Name'])['Basic Amt.LocCur'].sort_values(ascending=False)
         fig, ax = plt.subplots(figsize=(10, 5))
         sns.barplot(y=oem_cust_value.index, x=oem_cust_value.values, palette='Oranges_r', ax=ax)
         for i, (name, value) in enumerate(zip(oem_cust_value.index, oem_cust_value.values)):
@@ -364,7 +429,7 @@ if uploaded_file is not None:
         st.pyplot(fig)
         
         st.subheader('OEM - Model-wise Quantity - Power STG')
-        oem_power_model_qty = oem_power_stg.groupby('Model New')['Inv Qty'].sum().sort_values(ascending=False)
+        oem_power_model_qty = oem_totals(['Model New'], 'Power STG')['Inv Qty'].sort_values(ascending=False)
         fig, ax = plt.subplots(figsize=(10, 5))
         sns.barplot(y=oem_power_model_qty.index, x=oem_power_model_qty.values, palette='Blues', ax=ax)
         for i, (name, value) in enumerate(zip(oem_power_model_qty.index, oem_power_model_qty.values)):
@@ -372,8 +437,7 @@ if uploaded_file is not None:
         st.pyplot(fig)
         
         st.subheader('OEM - Model-wise Quantity - Vane Pump')
-        oem_vane_pump = filtered_df[filtered_df['Material Category'] == 'Vane Pump']
-        oem_vane_model_qty = oem_vane_pump.groupby('Model New')['Inv Qty'].sum().sort_values(ascending=False)
+        oem_vane_model_qty = oem_totals(['Model New'], 'Vane Pump')['Inv Qty'].sort_values(ascending=False)
         fig, ax = plt.subplots(figsize=(10, 5))
         sns.barplot(y=oem_vane_model_qty.index, x=oem_vane_model_qty.values, palette='Purples', ax=ax)
         for i, (name, value) in enumerate(zip(oem_vane_model_qty.index, oem_vane_model_qty.values)):
@@ -381,7 +445,7 @@ if uploaded_file is not None:
         st.pyplot(fig)
             
         st.subheader('OEM - Model-wise Quantity - Mechanical Stg')
-        oem_mech_model_qty = oem_mech_stg.groupby('Model New')['Inv Qty'].sum().sort_values(ascending=False)
+        oem_mech_model_qty = oem_totals(['Model New'], 'Mechanical Stg')['Inv Qty'].sort_values(ascending=False)
         fig, ax = plt.subplots(figsize=(10, 5))
         sns.barplot(y=oem_mech_model_qty.index, x=oem_mech_model_qty.values, palette='Greens', ax=ax)
         for i, (name, value) in enumerate(zip(oem_mech_model_qty.index, oem_mech_model_qty.values)):
@@ -391,8 +455,7 @@ if uploaded_file is not None:
         st.subheader('OEM - Top 20 Material + Customer combinations by Basic Amount (₹) with Quantity')
         
         top_mat_cust = (
-            filtered_df.groupby(['Material', 'Updated Customer Name'])[['Basic Amt.LocCur', 'Inv Qty']]
-            .sum()
+            oem_totals(['Material', 'Updated Customer Name'])[['Basic Amt.LocCur', 'Inv Qty']]
             .sort_values(by='Basic Amt.LocCur', ascending=False)
             .head(20)
             .reset_index()
@@ -414,18 +477,10 @@ if uploaded_file is not None:
             
         st.pyplot(fig)
         
-        filtered_df = filtered_df.sort_values('Month Start Date')
-        
         st.subheader("OEM – Month-wise Revenue Trend (₹ Cr)")
         
-        filtered_df = filtered_df.sort_values('Month Start Date')
-        
         revenue_monthly = (
-            filtered_df
-            .groupby(
-                ['Month-Year', 'Month Start Date', 'Updated Customer Name']
-            )['Basic Amt.LocCur']
-            .sum()
+            oem_totals(['Month-Year', 'Month Start Date', 'Updated Customer Name'])['Basic Amt.LocCur']
             .reset_index()
             .sort_values('Month Start Date')
         )
@@ -483,14 +538,11 @@ if uploaded_file is not None:
                 revenue_monthly['Revenue (Cr)'].max() * 1.25
             ])
             
-        st.plotly_chart(fig_revenue, use_container_width=True)
+        st.plotly_chart(fig_revenue, width='stretch')
         
         st.subheader("OEM – Power STG Quantity Trend")
-        filtered_df = filtered_df.sort_values('Month Start Date')
         power_qty_monthly = (
-            filtered_df[filtered_df['Material Category'] == 'Power STG']
-            .groupby(['Month-Year', 'Month Start Date', 'Updated Customer Name'])['Inv Qty']
-            .sum()
+            oem_totals(['Month-Year', 'Month Start Date', 'Updated Customer Name'], 'Power STG')['Inv Qty']
             .reset_index()
             .sort_values('Month Start Date')
         
@@ -548,7 +600,7 @@ if uploaded_file is not None:
                 separatethousands=True      # Explicitly prevent K/M
             )
             
-        st.plotly_chart(fig_power, use_container_width=True)
+        st.plotly_chart(fig_power, width='stretch')
 
     elif page == 'Invoice Value':
         st.header('Invoice Value Page')
@@ -556,215 +608,164 @@ if uploaded_file is not None:
         category_options = ['All', 'OEM', 'SPD', 'OEM + SPD']
         selected_category = st.sidebar.radio('Select Customer Category', category_options)
 
-        filtered_for_customer_list = dispatch_data.copy()
-        if selected_category == 'OEM + SPD':
-            filtered_data = filtered_for_customer_list[filtered_for_customer_list['Customer Category'].isin(['OEM', 'SPD'])]
-        elif selected_category != 'All':
-            filtered_data = filtered_for_customer_list[filtered_for_customer_list['Customer Category'] == selected_category]
             
-        month_list = sorted(dispatch_data['Month-Year'].dropna().unique().tolist())
-        month_list.insert(0, 'All')
+        month_list = dimensions.options('Month-Year')
         selected_month = st.sidebar.selectbox('Select Month-Year', month_list)
             
-        fy_list = sorted(dispatch_data['Financial Year'].dropna().unique().tolist())
-        fy_list.insert(0, 'All')
+        fy_list = dimensions.options('Financial Year')
         selected_fy = st.sidebar.selectbox('Select Financial Year', fy_list)
             
-        updated_customer_list = sorted(filtered_for_customer_list['Updated Customer Name'].dropna().unique().tolist())
-        updated_customer_list.insert(0, 'All')
+        updated_customer_list = dimensions.options('Updated Customer Name')
         selected_updated_customer = st.sidebar.selectbox('Select Updated Customer Name', updated_customer_list)
 
-        model_list = sorted(dispatch_data['Model New'].dropna().unique().tolist())
-        model_list.insert(0, 'All')
+        model_list = dimensions.options('Model New')
         selected_model = st.sidebar.selectbox('Select Model New', model_list)
 
-        filtered_for_original = filtered_for_customer_list.copy()
-        if selected_updated_customer != 'All':
-            filtered_for_original = filtered_for_original[filtered_for_original['Updated Customer Name'] == selected_updated_customer]
-                
-        customer_list = sorted(filtered_for_original['Customer Name'].dropna().unique().tolist())
-        customer_list.insert(0, 'All')
+        customer_list = dimensions.child_options('Updated Customer Name', 'Customer Name', selected_updated_customer)
         selected_customer = st.sidebar.selectbox('Select Customer Name', customer_list)
         
-        plant_list = sorted(dispatch_data['Plant'].dropna().unique().astype(str).tolist())
-        plant_list.insert(0, 'All')
+        plant_list = dimensions.options('Plant')
         selected_plant = st.sidebar.selectbox('Select Plant', plant_list)
 
-        material_category_list = sorted(dispatch_data['Material Category'].dropna().unique().tolist())
-        material_category_list.insert(0, 'All')
+        material_category_list = dimensions.options('Material Category')
         selected_material_category = st.sidebar.selectbox('Select Material Category', material_category_list)
 
 
-        st.sidebar.markdown('---')
-        st.sidebar.subheader('Invoice No. Filter (Type to Search)')
+        # Search boxes, date range and table rerun on their own (a fragment):
+        # typing into a search box does not re-run the rest of the page
+        @st.fragment
+        def invoice_value_table(selected_month, selected_fy, selections):
+            st.sidebar.markdown('---')
+            st.sidebar.subheader('Invoice No. Filter (Type to Search)')
         
-        invoice_numbers = sorted(dispatch_data['Billing Doc No.'].dropna().unique().astype(str).tolist())
-        typed_invoice = st.sidebar.text_input('Type Invoice No.')
-        suggested_invoices = [inv for inv in invoice_numbers if typed_invoice in inv] if typed_invoice else []
-
-        selected_invoice = st.sidebar.selectbox(
-            'Select from Suggestions', 
-            ['All'] + suggested_invoices, 
-            index=0, 
-            key='invoice_value_invoice_filter'
-        )
+            invoice_numbers = dimensions.values('Billing Doc No.')
+            typed_invoice = st.sidebar.text_input('Type Invoice No.')
+            suggested_invoices = [inv for inv in invoice_numbers if typed_invoice in inv] if typed_invoice else []
 
-        clear_invoice_filter = st.sidebar.button("Clear Invoice Filter")
+            selected_invoice = st.sidebar.selectbox(
+                'Select from Suggestions', 
+                ['All'] + suggested_invoices, 
+                index=0, 
+                key='invoice_value_invoice_filter'
+            )
 
-        billing_dates = pd.to_datetime(dispatch_data['Billing Date'], dayfirst=True, errors='coerce')
+            clear_invoice_filter = st.sidebar.button("Clear Invoice Filter")
 
-        if selected_month != 'All':
-            month_year_date = pd.to_datetime('01 ' + selected_month, format='%d %B-%y', errors='coerce')
-            min_date = month_year_date
-            max_date = month_year_date + pd.offsets.MonthEnd(0)
-        else:
-            min_date = billing_dates.min()
-            max_date = billing_dates.max()
+            if selected_month != 'All':
+                min_date, max_date = month_bounds(selected_month)
+            else:
+                min_date, max_date = billing_index.min, billing_index.max
             
-        st.sidebar.markdown('---')
-        st.sidebar.subheader('Select Date Range (Billing Date)')
-        
-        date_range = st.sidebar.date_input(
-            "Billing Date Range:",
-            [min_date, max_date],
-            min_value=min_date,
-            max_value=max_date
-        )
+            st.sidebar.markdown('---')
+            st.sidebar.subheader('Select Date Range (Billing Date)')
+        
+            date_range = st.sidebar.date_input(
+                "Billing Date Range:",
+                [min_date, max_date],
+                min_value=min_date,
+                max_value=max_date
+            )
         
-        clear_date_filter = st.sidebar.button("Clear Date Filter")
+            clear_date_filter = st.sidebar.button("Clear Date Filter")
         
-        st.sidebar.markdown('---')
-        st.sidebar.subheader('Material Filter (Type to Search)')
-        material_numbers = sorted(dispatch_data['Material'].dropna().unique().astype(str).tolist())
-        typed_material = st.sidebar.text_input('Type Material')
-
-        suggested_materials = [p for p in material_numbers if typed_material.lower() in p.lower()] if typed_material else []
-
-        selected_material = st.sidebar.selectbox(
-            'Select from Suggestions', 
-            ['All'] + suggested_materials, 
-            index=0, 
-            key='invoice_value_material_filter'
-        )
+            st.sidebar.markdown('---')
+            st.sidebar.subheader('Material Filter (Type to Search)')
+            material_numbers = dimensions.values('Material')
+            typed_material = st.sidebar.text_input('Type Material')
 
-        clear_material_filter = st.sidebar.button("Clear Material Filter")
-        
-        filtered_data = dispatch_data.copy()
-        
-        if selected_category != 'All':
-            filtered_data = filtered_data[filtered_data['Customer Category'] == selected_category]
-            
-        if selected_month != 'All':
-            filtered_data = filtered_data[filtered_data['Month-Year'] == selected_month]
-            
-        if selected_fy != 'All':
-            filtered_data = filtered_data[filtered_data['Financial Year'] == selected_fy]
-            
-        if selected_updated_customer != 'All':
-            filtered_data = filtered_data[filtered_data['Updated Customer Name'] == selected_updated_customer]
-            
-        if selected_customer != 'All':
-            filtered_data = filtered_data[filtered_data['Customer Name'] == selected_customer]
+            suggested_materials = [p for p in material_numbers if typed_material.lower() in p.lower()] if typed_material else []
 
-        if selected_invoice != 'All':
-            filtered_data = filtered_data[filtered_data['Billing Doc No.'].astype(str) == selected_invoice]
-            
-        if not clear_invoice_filter:
-            if typed_invoice:
-                filtered_data = filtered_data[filtered_data['Billing Doc No.'].astype(str).str.contains(typed_invoice, na=False)] 
-
-        if selected_plant != 'All':
-            filtered_data = filtered_data[filtered_data['Plant'].astype(str) == selected_plant]
+            selected_material = st.sidebar.selectbox(
+                'Select from Suggestions', 
+                ['All'] + suggested_materials, 
+                index=0, 
+                key='invoice_value_material_filter'
+            )
 
-        if selected_material_category != 'All':
-            filtered_data = filtered_data[filtered_data['Material Category'] == selected_material_category]
+            clear_material_filter = st.sidebar.button("Clear Material Filter")
         
-        if selected_model != 'All':
-            filtered_data = filtered_data[filtered_data['Model New'] == selected_model]
+            # date selections are one slice of the date-ordered rows (a view)
+            rows = date_slice(billing_index, selected_month, selected_fy, None if clear_date_filter else date_range)
+            view = dispatch_data.iloc[rows]
 
+            mask = selection_mask(view, dict(selections, **{'Billing Doc No.': selected_invoice}))
 
-        filtered_data['Billing Date'] = pd.to_datetime(filtered_data['Billing Date'], dayfirst=True, errors='coerce')
-        
-        if not clear_date_filter:
-            start_date, end_date = date_range
-            filtered_data = filtered_data[
-                (filtered_data['Billing Date'] >= pd.to_datetime(start_date)) &
-                (filtered_data['Billing Date'] <= pd.to_datetime(end_date))
-            ]
-            
-        if not clear_material_filter:
-            if typed_material:
-                filtered_data = filtered_data[filtered_data['Material'].astype(str).str.lower().str.contains(typed_material.lower(), na=False)]
-            elif selected_material != 'All':
-                filtered_data = filtered_data[filtered_data['Material'].astype(str) == selected_material]
-                
-        filtered_data['Billing Date'] = filtered_data['Billing Date'].dt.strftime('%d-%m-%Y')
-        
-        filtered_data['Qty'] = filtered_data['Inv Qty'] + filtered_data['Kit Qty']
-        
-        filtered_data['Basic Value Per Item'] = np.where(
-            filtered_data['Qty'] > 0,
-            filtered_data['Basic Amt.LocCur'] / filtered_data['Qty'],
-            0
-        )
+            if not clear_invoice_filter and typed_invoice:
+                mask &= contains_mask(view['Billing Doc No.'], typed_invoice)
 
-        # Deduplicate Logic:
-        filtered_data['Basic Amt.LocCur'] = pd.to_numeric(filtered_data['Basic Amt.LocCur'], errors='coerce').fillna(0)
-        filtered_data['Tax Amount'] = pd.to_numeric(filtered_data['Tax Amount'], errors='coerce').fillna(0)
-        filtered_data['Amt.Locl Currency'] = pd.to_numeric(filtered_data['Amt.Locl Currency'], errors='coerce').fillna(0)
-        filtered_data['Inv Qty'] = pd.to_numeric(filtered_data['Inv Qty'], errors='coerce').fillna(0)
-        filtered_data['Kit Qty'] = pd.to_numeric(filtered_data['Kit Qty'], errors='coerce').fillna(0)
-
-        def invoice_filter(group):
-            if (group['Billing Doc No.'].nunique() > 1) or group['Sales Order No'].astype(str).str.startswith('10').any():
-                return group
-            return group[group['Item'] == 10]
-        
-        invoice_totals = (
-            filtered_data.groupby('Billing Doc No.')[['Basic Amt.LocCur', 'Tax Amount', 'Amt.Locl Currency']]
-            .sum()
-            .reset_index()
-        )
-        
-        filtered_data = filtered_data.merge(invoice_totals, on='Billing Doc No.', suffixes=('', '_Total'))
+            if not clear_material_filter:
+                if typed_material:
+                    mask &= contains_mask(view['Material'], typed_material, case=False)
+                elif selected_material != 'All':
+                    mask &= (view['Material'].astype(str) == selected_material).to_numpy(dtype=bool)
+
+            # single row subset; the columns assigned below are the only ones copied
+            filtered_data = view[mask]
         
-        mask_item_10 = filtered_data['Item'] == 10
-        filtered_data.loc[mask_item_10, 'Basic Amt.LocCur'] = filtered_data.loc[mask_item_10, 'Basic Amt.LocCur_Total']
-        filtered_data.loc[mask_item_10, 'Tax Amount'] = filtered_data.loc[mask_item_10, 'Tax Amount_Total']
-        filtered_data.loc[mask_item_10, 'Amt.Locl Currency'] = filtered_data.loc[mask_item_10, 'Amt.Locl Currency_Total']
+            filtered_data['Qty'] = filtered_data['Inv Qty'] + filtered_data['Kit Qty']
         
-        filtered_data = filtered_data.drop(columns=['Basic Amt.LocCur_Total', 'Tax Amount_Total', 'Amt.Locl Currency_Total'])
-
-        filtered_data = filtered_data.groupby('Billing Doc No.').apply(invoice_filter).reset_index(drop=True)
+            filtered_data['Basic Value Per Item'] = np.where(
+                filtered_data['Qty'] > 0,
+                filtered_data['Basic Amt.LocCur'] / filtered_data['Qty'],
+                0
+            )
 
-        filtered_data['Qty'] = filtered_data['Inv Qty'] + filtered_data['Kit Qty']
-        filtered_data['Basic Value Per Item'] = np.where(
-            filtered_data['Qty'] > 0,
-            filtered_data['Basic Amt.LocCur'] / filtered_data['Qty'],
-            0
-        )
-        
-        filtered_data = filtered_data.drop(columns=['Inv Qty', 'Kit Qty'], errors='ignore')
+            # Deduplicate Logic:
+            filtered_data['Basic Amt.LocCur'] = pd.to_numeric(filtered_data['Basic Amt.LocCur'], errors='coerce').fillna(0)
+            filtered_data['Tax Amount'] = pd.to_numeric(filtered_data['Tax Amount'], errors='coerce').fillna(0)
+            filtered_data['Amt.Locl Currency'] = pd.to_numeric(filtered_data['Amt.Locl Currency'], errors='coerce').fillna(0)
+            filtered_data['Inv Qty'] = pd.to_numeric(filtered_data['Inv Qty'], errors='coerce').fillna(0)
+            filtered_data['Kit Qty'] = pd.to_numeric(filtered_data['Kit Qty'], errors='coerce').fillna(0)
+
+            # Invoice totals aligned to the rows (rows without a Billing Doc are
+            # dropped by the dedup below)
+            amount_cols = ['Basic Amt.LocCur', 'Tax Amount', 'Amt.Locl Currency']
+            invoice_totals = filtered_data.groupby('Billing Doc No.')[amount_cols].transform('sum')
+        
+            mask_item_10 = filtered_data['Item'] == 10
+            for col in amount_cols:
+                filtered_data[col] = filtered_data[col].where(~mask_item_10, invoice_totals[col])
+
+            filtered_data = dedup_dispatch(filtered_data, variant='invoice')
+
+            filtered_data['Qty'] = filtered_data['Inv Qty'] + filtered_data['Kit Qty']
+            filtered_data['Basic Value Per Item'] = np.where(
+                filtered_data['Qty'] > 0,
+                filtered_data['Basic Amt.LocCur'] / filtered_data['Qty'],
+                0
+            )
         
-        cols = filtered_data.columns.tolist()
-        if 'Material' in cols and 'Qty' in cols and 'Basic Value Per Item' in cols:
-            material_idx = cols.index('Material')
-            cols.remove('Qty')
-            cols.remove('Basic Value Per Item')
-            cols.insert(material_idx + 1, 'Qty')
-            cols.insert(material_idx + 2, 'Basic Value Per Item')
-            filtered_data = filtered_data[cols]
+            filtered_data = filtered_data.drop(columns=['Inv Qty', 'Kit Qty'], errors='ignore')
         
-        subtotal_data = filtered_data.copy()
+            cols = filtered_data.columns.tolist()
+            if 'Material' in cols and 'Qty' in cols and 'Basic Value Per Item' in cols:
+                material_idx = cols.index('Material')
+                cols.remove('Qty')
+                cols.remove('Basic Value Per Item')
+                cols.insert(material_idx + 1, 'Qty')
+                cols.insert(material_idx + 2, 'Basic Value Per Item')
+                filtered_data = filtered_data[cols]
         
-        basic_amt_sum = subtotal_data['Basic Amt.LocCur'].sum()
-        tax_amt_sum = subtotal_data['Tax Amount'].sum()
-        amt_loc_sum = subtotal_data['Amt.Locl Currency'].sum()
+            basic_amt_sum = filtered_data['Basic Amt.LocCur'].sum()
+            tax_amt_sum = filtered_data['Tax Amount'].sum()
+            amt_loc_sum = filtered_data['Amt.Locl Currency'].sum()
         
-        if 'Month Start Date' in filtered_data.columns:
-            filtered_data = filtered_data.drop(columns=['Month Start Date'])
+            if 'Month Start Date' in filtered_data.columns:
+                filtered_data = filtered_data.drop(columns=['Month Start Date'])
             
-        st.dataframe(filtered_data)
+            paginated_table(
+                filtered_data, key='invoice_value',
+                sum_cols=['Qty', 'Basic Amt.LocCur', 'Tax Amount', 'Amt.Locl Currency']
+            )
+
+        invoice_value_table(selected_month, selected_fy, {
+            'Customer Category': selected_category,
+            'Updated Customer Name': selected_updated_customer,
+            'Customer Name': selected_customer,
+            'Plant': selected_plant,
+            'Material Category': selected_material_category,
+            'Model New': selected_model,
+        })
 
 
     elif page == 'Dispatch Details':
@@ -773,326 +774,248 @@ if uploaded_file is not None:
         category_options = ['All', 'OEM', 'SPD', 'OEM + SPD']
         selected_category = st.sidebar.radio('Select Customer Category', category_options)
 
-        filtered_for_customer_list = dispatch_data.copy()
-
-        if selected_category == 'OEM + SPD':
-            filtered_data = filtered_for_customer_list[filtered_for_customer_list['Customer Category'].isin(['OEM', 'SPD'])]
-        elif selected_category != 'All':
-            filtered_data = filtered_for_customer_list[filtered_for_customer_list['Customer Category'] == selected_category]
 
-        month_list = sorted(dispatch_data['Month-Year'].dropna().unique().tolist())
-        month_list.insert(0, 'All')
+        month_list = dimensions.options('Month-Year')
         selected_month = st.sidebar.selectbox('Select Month-Year', month_list)
 
-        fy_list = sorted(dispatch_data['Financial Year'].dropna().unique().tolist())
-        fy_list.insert(0, 'All')
+        fy_list = dimensions.options('Financial Year')
         selected_fy = st.sidebar.selectbox('Select Financial Year', fy_list)
 
-        updated_customer_list = sorted(filtered_for_customer_list['Updated Customer Name'].dropna().unique().tolist())
-        updated_customer_list.insert(0, 'All')
+        updated_customer_list = dimensions.options('Updated Customer Name')
         selected_updated_customer = st.sidebar.selectbox('Select Updated Customer Name', updated_customer_list)
 
-        model_list = sorted(dispatch_data['Model New'].dropna().unique().tolist())
-        model_list.insert(0, 'All')
+        model_list = dimensions.options('Model New')
         selected_model = st.sidebar.selectbox('Select Model New', model_list)
 
-        filtered_for_original = filtered_for_customer_list.copy()
-        if selected_updated_customer != 'All':
-            filtered_for_original = filtered_for_original[filtered_for_original['Updated Customer Name'] == selected_updated_customer]
-
-        customer_list = sorted(filtered_for_original['Customer Name'].dropna().unique().tolist())
-        customer_list.insert(0, 'All')
+        customer_list = dimensions.child_options('Updated Customer Name', 'Customer Name', selected_updated_customer)
         selected_customer = st.sidebar.selectbox('Select Customer Name', customer_list)
 
-        plant_list = sorted(dispatch_data['Plant'].dropna().unique().astype(str).tolist())
-        plant_list.insert(0, 'All')
+        plant_list = dimensions.options('Plant')
         selected_plant = st.sidebar.selectbox('Select Plant', plant_list)
 
-        material_category_list = sorted(dispatch_data['Material Category'].dropna().unique().tolist())
-        material_category_list.insert(0, 'All')
+        material_category_list = dimensions.options('Material Category')
         selected_material_category = st.sidebar.selectbox('Select Material Category', material_category_list)
 
-        billing_dates = pd.to_datetime(dispatch_data['Billing Date'], dayfirst=True, errors='coerce')
-
-        if selected_month != 'All':
-            month_year_date = pd.to_datetime('01 ' + selected_month, format='%d %B-%y', errors='coerce')
-            min_date = month_year_date
-            max_date = month_year_date + pd.offsets.MonthEnd(0)
-        else:
-            min_date = billing_dates.min()
-            max_date = billing_dates.max()
-
-        st.sidebar.markdown('---')
-        st.sidebar.subheader('Select Date Range (Billing Date)')
-
-        date_range = st.sidebar.date_input(
-            "Billing Date Range:",
-            [min_date, max_date],
-            min_value=min_date,
-            max_value=max_date
-        )
-
-        clear_date_filter = st.sidebar.button("Clear Date Filter")
-
-        st.sidebar.markdown('---')
-        st.sidebar.subheader('Material Filter (Type to Search)')
-
-        material_numbers = sorted(dispatch_data['Material'].dropna().unique().astype(str).tolist())
-        typed_material = st.sidebar.text_input('Type Material')
-        suggested_materials = [p for p in material_numbers if typed_material.lower() in p.lower()] if typed_material else []
-
-        selected_material = st.sidebar.selectbox('Select from Suggestions', ['All'] + suggested_materials, index=0)
-        clear_material_filter = st.sidebar.button("Clear Material Filter")
-
-        filtered_data = dispatch_data.copy()
-
-        if selected_category != 'All':
-            filtered_data = filtered_data[filtered_data['Customer Category'] == selected_category]
-
-        if selected_month != 'All':
-            filtered_data = filtered_data[filtered_data['Month-Year'] == selected_month]
-
-        if selected_fy != 'All':
-            filtered_data = filtered_data[filtered_data['Financial Year'] == selected_fy]
-
-        if selected_updated_customer != 'All':
-            filtered_data = filtered_data[filtered_data['Updated Customer Name'] == selected_updated_customer]
-
-        if selected_customer != 'All':
-            filtered_data = filtered_data[filtered_data['Customer Name'] == selected_customer]
-
-        if selected_plant != 'All':
-            filtered_data = filtered_data[filtered_data['Plant'].astype(str) == selected_plant]
+        # Date range, material search and table rerun on their own (a fragment)
+        @st.fragment
+        def dispatch_details_table(selected_month, selected_fy, selections):
+            if selected_month != 'All':
+                min_date, max_date = month_bounds(selected_month)
+            else:
+                min_date, max_date = billing_index.min, billing_index.max
 
-        if selected_material_category != 'All':
-            filtered_data = filtered_data[filtered_data['Material Category'] == selected_material_category]
-        
-        if selected_model != 'All':
-            filtered_data = filtered_data[filtered_data['Model New'] == selected_model]
+            st.sidebar.markdown('---')
+            st.sidebar.subheader('Select Date Range (Billing Date)')
 
-        filtered_data['Billing Date'] = pd.to_datetime(filtered_data['Billing Date'], dayfirst=True, errors='coerce')
+            date_range = st.sidebar.date_input(
+                "Billing Date Range:",
+                [min_date, max_date],
+                min_value=min_date,
+                max_value=max_date
+            )
 
-        if not clear_date_filter:
-            start_date, end_date = date_range
-            filtered_data = filtered_data[
-                (filtered_data['Billing Date'] >= pd.to_datetime(start_date)) &
-                (filtered_data['Billing Date'] <= pd.to_datetime(end_date))
-            ]
+            clear_date_filter = st.sidebar.button("Clear Date Filter")
+
+            st.sidebar.markdown('---')
+            st.sidebar.subheader('Material Filter (Type to Search)')
+
+            material_numbers = dimensions.values('Material')
+            typed_material = st.sidebar.text_input('Type Material')
+            suggested_materials = [p for p in material_numbers if typed_material.lower() in p.lower()] if typed_material else []
+
+            selected_material = st.sidebar.selectbox('Select from Suggestions', ['All'] + suggested_materials, index=0)
+            clear_material_filter = st.sidebar.button("Clear Material Filter")
+
+            # date selections are one slice of the date-ordered rows (a view)
+            rows = date_slice(billing_index, selected_month, selected_fy, None if clear_date_filter else date_range)
+            view = dispatch_data.iloc[rows]
+
+            mask = selection_mask(view, selections)
+
+            if not clear_material_filter:
+                if typed_material:
+                    mask &= contains_mask(view['Material'], typed_material, case=False)
+                elif selected_material != 'All':
+                    mask &= (view['Material'].astype(str) == selected_material).to_numpy(dtype=bool)
+
+            filtered_data = view[mask]
+
+            filtered_data['Inv Qty'] = pd.to_numeric(filtered_data['Inv Qty'], errors='coerce').fillna(0)
+            filtered_data['Kit Qty'] = pd.to_numeric(filtered_data['Kit Qty'], errors='coerce').fillna(0)
+
+            inv_qty_sum = filtered_data['Inv Qty'].sum()
+            kit_qty_sum = filtered_data['Kit Qty'].sum()
+            basic_amt_sum = filtered_data['Basic Amt.LocCur'].sum()
+
+            st.markdown(
+                """
+                <style>
+                .subtotal-box {
+                    padding: 10px;
+                    border-radius: 5px;
+                    border: 1px solid;
+                    font-weight: bold;
+                }
+                .subtotal-box-light {
+                    background-color: #f0f0f0;
+                    color: #000;
+                    border-color: #ccc;
+                }
+                .subtotal-box-dark {
+                    background-color: #222;
+                    color: #fff;
+                    border-color: #555;
+                }
+                </style>
+                """,
+                unsafe_allow_html=True
+            )
 
-        filtered_data['Billing Date'] = filtered_data['Billing Date'].dt.strftime('%d-%m-%Y')
-
-        if not clear_material_filter:
-            if typed_material:
-                filtered_data = filtered_data[filtered_data['Material'].astype(str).str.lower().str.contains(typed_material.lower(), na=False)]
-            elif selected_material != 'All':
-                filtered_data = filtered_data[filtered_data['Material'].astype(str) == selected_material]
-
-        filtered_data['Inv Qty'] = pd.to_numeric(filtered_data['Inv Qty'], errors='coerce').fillna(0)
-        filtered_data['Kit Qty'] = pd.to_numeric(filtered_data['Kit Qty'], errors='coerce').fillna(0)
-
-        inv_qty_sum = filtered_data['Inv Qty'].sum()
-        kit_qty_sum = filtered_data['Kit Qty'].sum()
-        basic_amt_sum = filtered_data['Basic Amt.LocCur'].sum()
-
-        st.markdown(
-            """
-            <style>
-            .subtotal-box {
-                padding: 10px;
-                border-radius: 5px;
-                border: 1px solid;
-                font-weight: bold;
-            }
-            .subtotal-box-light {
-                background-color: #f0f0f0;
-                color: #000;
-                border-color: #ccc;
-            }
-            .subtotal-box-dark {
-                background-color: #222;
-                color: #fff;
-                border-color: #555;
-            }
-            </style>
-            """,
-            unsafe_allow_html=True
-        )
+            theme = st.get_option("theme.base")
+            box_class = "subtotal-box-light" if theme == "light" else "subtotal-box-dark"
+
+            st.markdown(
+                f"""
+                <div class="subtotal-box {box_class}">
+                Subtotal (Filtered Data):<br>
+                Inv Qty: {inv_qty_sum:,.0f} &nbsp;&nbsp;&nbsp;
+                Kit Qty: {kit_qty_sum:,.0f} &nbsp;&nbsp;&nbsp;
+                Basic Amt.LocCur: ₹ {basic_amt_sum:,.2f}
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
 
-        theme = st.get_option("theme.base")
-        box_class = "subtotal-box-light" if theme == "light" else "subtotal-box-dark"
-
-        st.markdown(
-            f"""
-            <div class="subtotal-box {box_class}">
-            Subtotal (Filtered Data):<br>
-            Inv Qty: {inv_qty_sum:,.0f} &nbsp;&nbsp;&nbsp;
-            Kit Qty: {kit_qty_sum:,.0f} &nbsp;&nbsp;&nbsp;
-            Basic Amt.LocCur: ₹ {basic_amt_sum:,.2f}
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+            if 'Month Start Date' in filtered_data.columns:
+                filtered_data = filtered_data.drop(columns=['Month Start Date'])
 
-        if 'Month Start Date' in filtered_data.columns:
-            filtered_data = filtered_data.drop(columns=['Month Start Date'])
+            paginated_table(filtered_data, key='dispatch_details', sum_cols=['Inv Qty', 'Kit Qty', 'Basic Amt.LocCur'])
 
-        st.dataframe(filtered_data)
+        dispatch_details_table(selected_month, selected_fy, {
+            'Customer Category': selected_category,
+            'Updated Customer Name': selected_updated_customer,
+            'Customer Name': selected_customer,
+            'Plant': selected_plant,
+            'Material Category': selected_material_category,
+            'Model New': selected_model,
+        })
 
     elif page == 'Daywise Dispatch':
         st.header('Daywise Dispatch Page')
 
-        dispatch_data['Inv Qty'] = pd.to_numeric(dispatch_data['Inv Qty'], errors='coerce').fillna(0)
-        dispatch_data['Kit Qty'] = pd.to_numeric(dispatch_data['Kit Qty'], errors='coerce').fillna(0)
-
-        filtered_daywise = dispatch_data[
-            ~dispatch_data['Material'].astype(str).str.upper().str.startswith('C') &
-            (dispatch_data['Material'].astype(str) != '8043975905')
-        ].copy()
-
-        def should_keep(row, billing_counts):
-            if billing_counts[row['Billing Doc No.']] == 1:
-                return True
-            if str(row['Sales Order No']).startswith('10'):
-                return True
-            return row['Item'] == 10
-
-        billing_counts = filtered_daywise['Billing Doc No.'].value_counts()
-        filtered_daywise = filtered_daywise[filtered_daywise.apply(lambda row: should_keep(row, billing_counts), axis=1)].copy()
-
-        if 'Total Dispatch' not in filtered_daywise.columns:
-            kit_qty_index = filtered_daywise.columns.get_loc('Kit Qty')
-            filtered_daywise.insert(kit_qty_index + 1, 'Total Dispatch', filtered_daywise['Inv Qty'] + filtered_daywise['Kit Qty'])
+        # daywise rows (C* materials dropped, invoices deduplicated) are kept
+        # with the enriched data; only the pivot's columns are taken
+        if 'daywise' not in enriched:
+            daywise_rows = dispatch_data[
+                ~dispatch_data['Material'].astype(str).str.upper().str.startswith('C') &
+                (dispatch_data['Material'].astype(str) != '8043975905')
+            ]
+            daywise_rows = dedup_dispatch(daywise_rows, variant='daywise')
+            daywise_rows = daywise_rows[
+                ['Sold-to Party', 'Customer Name', 'Updated Customer Name', 'Customer Category',
+                 'Material', 'Material Category', 'Model New', 'Plant']
+            ].assign(**{'Total Dispatch': derived['Total Dispatch']})
+            enriched['daywise'] = daywise_rows, billing_index.take(daywise_rows.index.to_numpy())
+        filtered_daywise, daywise_index = enriched['daywise']
+
+        daywise_dimensions = session_catalog(
+            (dataset_key, 'daywise'), filtered_daywise,
+            columns=['Updated Customer Name', 'Customer Name'],
+            hierarchies=[('Updated Customer Name', 'Customer Name')],
+        )
 
         category_options = ['All', 'OEM', 'SPD', 'OEM + SPD']
         selected_category = st.sidebar.radio('Select Customer Category', category_options)
 
-        filtered_for_customer_list = filtered_daywise.copy()
-
-        if selected_category == 'OEM + SPD':
-            filtered_data = filtered_for_customer_list[filtered_for_customer_list['Customer Category'].isin(['OEM', 'SPD'])]
-        elif selected_category != 'All':
-            filtered_data = filtered_for_customer_list[filtered_for_customer_list['Customer Category'] == selected_category]
 
-        month_list = sorted(dispatch_data['Month-Year'].dropna().unique().tolist())
-        month_list.insert(0, 'All')
+        month_list = dimensions.options('Month-Year')
         selected_month = st.sidebar.selectbox('Select Month-Year', month_list)
 
-        fy_list = sorted(dispatch_data['Financial Year'].dropna().unique().tolist())
-        fy_list.insert(0, 'All')
+        fy_list = dimensions.options('Financial Year')
         selected_fy = st.sidebar.selectbox('Select Financial Year', fy_list)
 
-        updated_customer_list = sorted(filtered_for_customer_list['Updated Customer Name'].dropna().unique().tolist())
-        updated_customer_list.insert(0, 'All')
+        updated_customer_list = daywise_dimensions.options('Updated Customer Name')
         selected_updated_customer = st.sidebar.selectbox('Select Updated Customer Name', updated_customer_list)
 
-        filtered_for_original = filtered_for_customer_list.copy()
-        if selected_updated_customer != 'All':
-            filtered_for_original = filtered_for_original[filtered_for_original['Updated Customer Name'] == selected_updated_customer]
-
-        customer_list = sorted(filtered_for_original['Customer Name'].dropna().unique().tolist())
-        customer_list.insert(0, 'All')
+        customer_list = daywise_dimensions.child_options('Updated Customer Name', 'Customer Name', selected_updated_customer)
         selected_customer = st.sidebar.selectbox('Select Customer Name', customer_list)
 
-        plant_list = sorted(dispatch_data['Plant'].dropna().unique().astype(str).tolist())
-        plant_list.insert(0, 'All')
+        plant_list = dimensions.options('Plant')
         selected_plant = st.sidebar.selectbox('Select Plant', plant_list)
 
-        material_category_list = sorted(dispatch_data['Material Category'].dropna().unique().tolist())
-        material_category_list.insert(0, 'All')
+        material_category_list = dimensions.options('Material Category')
         selected_material_category = st.sidebar.selectbox('Select Material Category', material_category_list)
 
-        model_list = sorted(dispatch_data['Model New'].dropna().unique().tolist())
-        model_list.insert(0, 'All')
+        model_list = dimensions.options('Model New')
         selected_model = st.sidebar.selectbox('Select Model New', model_list)
 
-        st.sidebar.markdown('---')
-        st.sidebar.subheader('Material Filter (Type to Search)')
-        material_numbers = sorted(dispatch_data['Material'].dropna().unique().astype(str).tolist())
-        typed_material = st.sidebar.text_input('Type Material')
-        suggested_materials = [p for p in material_numbers if typed_material.lower() in p.lower()] if typed_material else []
+        # Material search, date range and pivot rerun on their own (a fragment)
+        @st.fragment
+        def daywise_table(selected_month, selected_fy, selections):
+            st.sidebar.markdown('---')
+            st.sidebar.subheader('Material Filter (Type to Search)')
+            material_numbers = dimensions.values('Material')
+            typed_material = st.sidebar.text_input('Type Material')
+            suggested_materials = [p for p in material_numbers if typed_material.lower() in p.lower()] if typed_material else []
 
-        selected_material = st.sidebar.selectbox('Select from Suggestions', ['All'] + suggested_materials, index=0)
-        clear_material_filter = st.sidebar.button("Clear Material Filter")
+            selected_material = st.sidebar.selectbox('Select from Suggestions', ['All'] + suggested_materials, index=0)
+            clear_material_filter = st.sidebar.button("Clear Material Filter")
 
-        billing_dates = pd.to_datetime(filtered_daywise['Billing Date'], dayfirst=True, errors='coerce')
-
-        if selected_month != 'All':
-            month_year_date = pd.to_datetime('01 ' + selected_month, format='%d %B-%y', errors='coerce')
-            min_date = month_year_date
-            max_date = month_year_date + pd.offsets.MonthEnd(0)
-        else:
-            min_date = billing_dates.min()
-            max_date = billing_dates.max()
-
-        st.sidebar.markdown('---')
-        st.sidebar.subheader('Select Date Range (Billing Date)')
-
-        date_range = st.sidebar.date_input(
-            "Billing Date Range:",
-            [min_date, max_date],
-            min_value=min_date,
-            max_value=max_date
-        )
-
-        clear_date_filter = st.sidebar.button("Clear Date Filter")
-
-        final_daywise = filtered_daywise.copy()
-
-        if selected_category != 'All':
-            final_daywise = final_daywise[final_daywise['Customer Category'] == selected_category]
+            if selected_month != 'All':
+                min_date, max_date = month_bounds(selected_month)
+            else:
+                min_date, max_date = daywise_index.min, daywise_index.max
 
-        if selected_month != 'All':
-            final_daywise = final_daywise[final_daywise['Month-Year'] == selected_month]
+            st.sidebar.markdown('---')
+            st.sidebar.subheader('Select Date Range (Billing Date)')
 
-        if selected_fy != 'All':
-            final_daywise = final_daywise[final_daywise['Financial Year'] == selected_fy]
+            date_range = st.sidebar.date_input(
+                "Billing Date Range:",
+                [min_date, max_date],
+                min_value=min_date,
+                max_value=max_date
+            )
 
-        if selected_updated_customer != 'All':
-            final_daywise = final_daywise[final_daywise['Updated Customer Name'] == selected_updated_customer]
+            clear_date_filter = st.sidebar.button("Clear Date Filter")
 
-        if selected_customer != 'All':
-            final_daywise = final_daywise[final_daywise['Customer Name'] == selected_customer]
+            rows = date_slice(daywise_index, selected_month, selected_fy, None if clear_date_filter else date_range)
+            view = filtered_daywise.iloc[rows]
 
-        if selected_plant != 'All':
-            final_daywise = final_daywise[final_daywise['Plant'].astype(str) == selected_plant]
+            mask = selection_mask(view, selections)
 
-        if selected_material_category != 'All':
-            final_daywise = final_daywise[final_daywise['Material Category'] == selected_material_category]
+            if not clear_material_filter:
+                if typed_material:
+                    mask &= contains_mask(view['Material'], typed_material, case=False)
+                elif selected_material != 'All':
+                    mask &= (view['Material'].astype(str) == selected_material).to_numpy(dtype=bool)
 
-        if selected_model != 'All':
-            final_daywise = final_daywise[final_daywise['Model New'] == selected_model]
+            # only the pivot's columns are taken, with Billing Date as datetime
+            final_daywise = view.loc[mask, ['Sold-to Party', 'Customer Name', 'Material', 'Plant', 'Total Dispatch']]
+            final_daywise['Billing Date'] = daywise_index.dates[rows][mask]
 
-        final_daywise['Billing Date'] = pd.to_datetime(final_daywise['Billing Date'], dayfirst=True, errors='coerce')
+            pivot_table = final_daywise.pivot_table(
+                index=['Sold-to Party', 'Customer Name', 'Material', 'Plant'],
+                columns='Billing Date',
+                values='Total Dispatch',
+                aggfunc='sum',
+                fill_value=0
+            ).reset_index()
 
-        if not clear_date_filter:
-            start_date, end_date = date_range
-            final_daywise = final_daywise[
-                (final_daywise['Billing Date'] >= pd.to_datetime(start_date)) &
-                (final_daywise['Billing Date'] <= pd.to_datetime(end_date))
+            pivot_table.columns = [
+                col.strftime('%d-%m-%Y') if isinstance(col, pd.Timestamp) else col
+                for col in pivot_table.columns
             ]
 
-        if not clear_material_filter:
-            if typed_material:
-                final_daywise = final_daywise[final_daywise['Material'].astype(str).str.lower().str.contains(typed_material.lower(), na=False)]
-            elif selected_material != 'All':
-                final_daywise = final_daywise[final_daywise['Material'].astype(str) == selected_material]
-
-        final_daywise['Billing Date'] = pd.to_datetime(final_daywise['Billing Date'], dayfirst=True, errors='coerce')
-
-        pivot_table = final_daywise.pivot_table(
-            index=['Sold-to Party', 'Customer Name', 'Material', 'Plant'],
-            columns='Billing Date',
-            values='Total Dispatch',
-            aggfunc='sum',
-            fill_value=0
-        ).reset_index()
-
-        pivot_table.columns = [
-            col.strftime('%d-%m-%Y') if isinstance(col, pd.Timestamp) else col
-            for col in pivot_table.columns
-        ]
+            pivot_table.columns.name = None
 
-        pivot_table.columns.name = None
+            show_dataframe(pivot_table)
 
-        st.dataframe(pivot_table)
+        daywise_table(selected_month, selected_fy, {
+            'Customer Category': selected_category,
+            'Updated Customer Name': selected_updated_customer,
+            'Customer Name': selected_customer,
+            'Plant': selected_plant,
+            'Material Category': selected_material_category,
+            'Model New': selected_model,
+        })
 
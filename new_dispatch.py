@@ -4,6 +4,10 @@ from io import BytesIO
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Border, Side
 import openpyxl
+from dispatch_rules import dedup_dispatch, normalize_sold_to
+from key_encoding import KeyEncoder, sum_by_key, lookup_by_key
+from export_cache import dataset_hash, filter_state
+from report_jobs import job_download_button
 
 st.set_page_config(layout="wide")
 st.title("Schedule vs Dispatch Report")
@@ -31,53 +35,79 @@ def apply_filters(df, code, customer, billing_plant, model, part_number_search,
     return df
 
 
+def build_schedule_export(power_df, mech_df, progress=None):
+    # progress(step, total): called after each sheet is formatted and after saving
+    sheet_count = int(not power_df.empty) + int(not mech_df.empty)
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        if not power_df.empty:
+            power_df.to_excel(writer, sheet_name='Power', index=False)
+        if not mech_df.empty:
+            mech_df.to_excel(writer, sheet_name='Mech', index=False)
+
+        workbook = writer.book
+        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+
+        for sheet_name in writer.sheets:
+            worksheet = workbook[sheet_name]
+            for col in worksheet.columns:
+                max_length = 0
+                column = col[0].column
+                for cell in col:
+                    try:
+                        if cell.value:
+                            max_length = max(max_length, len(str(cell.value)))
+                    except:
+                        pass
+                worksheet.column_dimensions[get_column_letter(column)].width = (max_length + 2)
+            max_row, max_col = worksheet.max_row, worksheet.max_column
+            for row in worksheet.iter_rows(min_row=1, max_row=max_row, min_col=1, max_col=max_col):
+                for cell in row:
+                    cell.border = thin_border
+            if progress:
+                progress(sheet_name, sheet_count + 1)
+
+    if progress:
+        progress("saved", sheet_count + 1)
+    output.seek(0)
+    return output
+
+
 if dispatch_file and schedule_file:
     dispatch_df = pd.read_excel(dispatch_file)
     schedule_power = pd.read_excel(schedule_file, sheet_name="POWER", header=3)
     schedule_mech = pd.read_excel(schedule_file, sheet_name="MECH", header=3)
 
-    dispatch_df['Sold-to Party'] = dispatch_df.apply(
-        lambda x: str(x['Sold-to Party']) + '.' if (x['Plant'] == 2000 and not str(x['Sold-to Party']).upper().startswith('V')) else x['Sold-to Party'],
-        axis=1
-    )
+    dispatch_df['Sold-to Party'] = normalize_sold_to(dispatch_df, variant='report')
     dispatch_df = dispatch_df[~dispatch_df['Material'].astype(str).str.startswith('C')]
     dispatch_df.loc[dispatch_df['Inv Qty'] == 0, 'Inv Qty'] = dispatch_df['Kit Qty']
     dispatch_df = dispatch_df[dispatch_df['Material'] != 8043975905]
     dispatch_df = dispatch_df[dispatch_df['Customer Group'] == 10]
 
-    keep_sales_order_10 = dispatch_df[dispatch_df['Sales Order No'].astype(str).str.startswith('10')]
-    remaining = dispatch_df[~dispatch_df['Sales Order No'].astype(str).str.startswith('10')]
-    billing_doc_counts = remaining['Billing Doc No.'].value_counts()
-    duplicates = billing_doc_counts[billing_doc_counts > 1].index.tolist()
-
-    duplicates_df = remaining[remaining['Billing Doc No.'].isin(duplicates)]
-    unique_df = remaining[~remaining['Billing Doc No.'].isin(duplicates)]
-    duplicates_df = duplicates_df[duplicates_df['Item'] == 10]
-    dispatch_df = pd.concat([keep_sales_order_10, unique_df, duplicates_df], ignore_index=True)
-
-    dispatch_summary = dispatch_df.groupby(['Sold-to Party', 'Material'], as_index=False)['Inv Qty'].sum()
-    dispatch_summary.rename(columns={'Inv Qty': 'Dispatch Qty'}, inplace=True)
+    dispatch_df = dedup_dispatch(dispatch_df, variant='register')
 
     schedule_power['Code'] = schedule_power['Code'].astype(str)
     schedule_power['Part Number'] = schedule_power['Part Number'].astype(str)
     schedule_mech['Code'] = schedule_mech['Code'].astype(str)
     schedule_mech['Part Number'] = schedule_mech['Part Number'].astype(str)
 
-    schedule_power = pd.merge(
-        schedule_power, dispatch_summary,
-        left_on=['Code', 'Part Number'],
-        right_on=['Sold-to Party', 'Material'],
-        how='left'
+    # (Sold-to Party, Material) <-> (Code, Part Number) joined on shared integer keys
+    keys = KeyEncoder()
+    keys.fit('customer', schedule_power['Code'], schedule_mech['Code'], dispatch_df['Sold-to Party'])
+    keys.fit('material', schedule_power['Part Number'], schedule_mech['Part Number'], dispatch_df['Material'])
+
+    dispatch_summary = sum_by_key(
+        keys.pair_key('customer', dispatch_df['Sold-to Party'], 'material', dispatch_df['Material']),
+        dispatch_df['Inv Qty']
     )
-    schedule_mech = pd.merge(
-        schedule_mech, dispatch_summary,
-        left_on=['Code', 'Part Number'],
-        right_on=['Sold-to Party', 'Material'],
-        how='left'
+    schedule_power['Dispatch Qty'] = lookup_by_key(
+        keys.pair_key('customer', schedule_power['Code'], 'material', schedule_power['Part Number']),
+        dispatch_summary, index=schedule_power.index
+    )
+    schedule_mech['Dispatch Qty'] = lookup_by_key(
+        keys.pair_key('customer', schedule_mech['Code'], 'material', schedule_mech['Part Number']),
+        dispatch_summary, index=schedule_mech.index
     )
-
-    schedule_power['Dispatch Qty'] = schedule_power['Dispatch Qty'].fillna(0)
-    schedule_mech['Dispatch Qty'] = schedule_mech['Dispatch Qty'].fillna(0)
 
     columns_to_keep_power = [
         'Code', 'Customer', 'MODEL', 'BILLING PLANT', 'Part Number',
@@ -96,11 +126,9 @@ if dispatch_file and schedule_file:
     schedule_mech = schedule_mech[final_columns_mech]
 
     for df, marketing_columns in [(schedule_power, marketing_columns_power), (schedule_mech, marketing_columns_mech)]:
-        df['Balance Dispatch'] = (df[marketing_columns].sum(axis=1) - df['Dispatch Qty']).clip(lower=0)
-        df['Excess Dispatch'] = df.apply(
-            lambda x: x['Dispatch Qty'] - x[marketing_columns].sum() if x['Dispatch Qty'] > x[marketing_columns].sum() else 0,
-            axis=1
-        )
+        marketing = df[marketing_columns].sum(axis=1)
+        df['Balance Dispatch'] = (marketing - df['Dispatch Qty']).clip(lower=0)
+        df['Excess Dispatch'] = (df['Dispatch Qty'] - marketing).clip(lower=0)
 
     if view_option == "Power Schedule":
         st.header("Power Schedule")
@@ -109,12 +137,14 @@ if dispatch_file and schedule_file:
         billing_plant = st.sidebar.multiselect('Billing Plant', schedule_power['BILLING PLANT'].unique())
         model = st.sidebar.multiselect('Model', schedule_power['MODEL'].unique())
         part_number_search = st.sidebar.text_input('Part Number (Type & Press Enter)')
+        export_filters = filter_state(code=code, customer=customer, billing_plant=billing_plant,
+                                      model=model, part_number_search=part_number_search)
         filtered_power = apply_filters(schedule_power, code, customer, billing_plant, model, part_number_search, sheet_type='Power')
 
         if filtered_power.empty:
             st.warning("No data or Wrong Filter Selection")
         else:
-            st.dataframe(filtered_power, use_container_width=True)
+            st.dataframe(filtered_power, width='stretch')
 
         power_to_download = filtered_power
         mech_to_download = pd.DataFrame()
@@ -126,12 +156,14 @@ if dispatch_file and schedule_file:
         billing_plant = st.sidebar.multiselect('Billing Plant', schedule_mech['Billing Plant'].unique())
         model = st.sidebar.multiselect('Model', schedule_mech['Model'].unique())
         part_number_search = st.sidebar.text_input('Part Number (Type & Press Enter)')
+        export_filters = filter_state(code=code, customer=customer, billing_plant=billing_plant,
+                                      model=model, part_number_search=part_number_search)
         filtered_mech = apply_filters(schedule_mech, code, customer, billing_plant, model, part_number_search, sheet_type='Mech')
 
         if filtered_mech.empty:
             st.warning("No data or Wrong Filter Selection")
         else:
-            st.dataframe(filtered_mech, use_container_width=True)
+            st.dataframe(filtered_mech, width='stretch')
 
         power_to_download = pd.DataFrame()
         mech_to_download = filtered_mech
@@ -140,56 +172,31 @@ if dispatch_file and schedule_file:
         st.header("All Schedules (Power & Mech)")
         power_to_download = schedule_power.copy()
         mech_to_download = schedule_mech.copy()
+        export_filters = filter_state()
 
         if power_to_download.empty:
             st.warning("Power Schedule: No data")
         else:
             st.subheader("Power Schedule")
-            st.dataframe(power_to_download, use_container_width=True)
+            st.dataframe(power_to_download, width='stretch')
 
         if mech_to_download.empty:
             st.warning("Mech Schedule: No data")
         else:
             st.subheader("Mech Schedule")
-            st.dataframe(mech_to_download, use_container_width=True)
+            st.dataframe(mech_to_download, width='stretch')
 
     # ✅ THIS FIX AVOIDS ERROR
     if power_to_download.empty and mech_to_download.empty:
         st.warning("No data or Wrong Filter Selection")
     else:
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            if not power_to_download.empty:
-                power_to_download.to_excel(writer, sheet_name='Power', index=False)
-            if not mech_to_download.empty:
-                mech_to_download.to_excel(writer, sheet_name='Mech', index=False)
-
-            workbook = writer.book
-            thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-            for sheet_name in writer.sheets:
-                worksheet = workbook[sheet_name]
-                for col in worksheet.columns:
-                    max_length = 0
-                    column = col[0].column
-                    for cell in col:
-                        try:
-                            if cell.value:
-                                max_length = max(max_length, len(str(cell.value)))
-                        except:
-                            pass
-                    worksheet.column_dimensions[get_column_letter(column)].width = (max_length + 2)
-                max_row, max_col = worksheet.max_row, worksheet.max_column
-                for row in worksheet.iter_rows(min_row=1, max_row=max_row, min_col=1, max_col=max_col):
-                    for cell in row:
-                        cell.border = thin_border
-
-        output.seek(0)
-
+        # Workbook is built in the background once requested, cached per upload + filters
+        export_key = ('new_dispatch', dataset_hash(dispatch_file, schedule_file), view_option, export_filters)
         st.subheader("📥 Download Schedule vs Dispatch Excel")
-        st.download_button(
+        job_download_button(
+            export_key,
+            lambda progress: build_schedule_export(power_to_download, mech_to_download, progress),
             label="Download Excel File",
-            data=output,
             file_name="Schedule_with_Dispatch.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+import requests
+
+from kit_catalog import load_catalog, open_current
+
+# Reference data (Google Drive schedule + Kit workbook) is the same for every
+# planner, so one copy is held per server process and shared by all Streamlit
+# sessions. This module is imported once per process, unlike the page scripts
+# which re-run on every interaction.
+
+logger = logging.getLogger(__name__)
+
+# --- Google Drive Links (schedule & kit) ---
+schedule_url = "https://drive.google.com/uc?id=19FkajdpPaiQHqXqR5eH0WqximI5Sohs7"
+kit_part_url = "https://drive.google.com/uc?id=18YkiGvirKsrrwg8IZq2H3Aje5HAw-Djp"
+
+REFERENCE_TTL_SECONDS = 10 * 60
+
+# Background loads started by the pages so that downloads and workbook
+# parsing overlap with parsing the user's own upload
+_load_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='reference-load')
+
+
+class ReferenceCache:
+    # Stale-while-revalidate: the first read loads synchronously; once the TTL
+    # has passed, readers keep getting the current copy while a single
+    # background thread builds the replacement and swaps it in.
+
+    def __init__(self, loader, ttl=REFERENCE_TTL_SECONDS):
+        self._loader = loader
+        self._ttl = ttl
+        self._entry = None  # (value, loaded_at) swapped as one reference
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self):
+        entry = self._entry
+        if entry is None:
+            with self._lock:
+                if self._entry is None:
+                    self._entry = (self._loader(), time.monotonic())
+                entry = self._entry
+        value, loaded_at = entry
+        if time.monotonic() - loaded_at > self._ttl:
+            self._refresh_in_background()
+        return value
+
+    @property
+    def version(self):
+        # changes whenever a new copy is swapped in (None before the first load)
+        entry = self._entry
+        return None if entry is None else entry[1]
+
+    def invalidate(self):
+        self._entry = None
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self._entry = (self._loader(), time.monotonic())
+        except Exception:
+            # Keep serving the previous copy; the next read after the TTL retries
+            logger.exception("Reference data refresh failed")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+# ---------------- LOADERS ----------------
+
+def download(url):
+    response = requests.get(url)
+    response.raise_for_status()
+    return BytesIO(response.content)
+
+
+def read_schedule_sheets(schedule_file):
+    schedule_power = pd.read_excel(schedule_file, sheet_name="POWER", header=3)
+    schedule_mech = pd.read_excel(schedule_file, sheet_name="MECH", header=3)
+    return schedule_power, schedule_mech
+
+
+def load_schedule():
+    return read_schedule_sheets(download(schedule_url))
+
+
+def load_kit_catalog():
+    # The workbook is only parsed when its hash has no snapshot yet
+    try:
+        data = download(kit_part_url).getvalue()
+    except requests.RequestException as e:
+        try:
+            catalog = open_current()
+        except FileNotFoundError:
+            raise e
+        logger.warning("Kit workbook download failed, using the last snapshot: %s", e)
+        return catalog
+    return load_catalog(data)
+
+
+def submit_load(fn, *args):
+    # returns a Future; .result() re-raises any loading error in the caller
+    return _load_pool.submit(fn, *args)
+
+
+def prefetch(cache):
+    return submit_load(cache.get)
+
+
+# Process-wide instances. Frames returned by schedule_cache are shared, so
+# callers must copy them before mutating.
+schedule_cache = ReferenceCache(load_schedule)
+kit_cache = ReferenceCache(load_kit_catalog)
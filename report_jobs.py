@@ -0,0 +1,123 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from export_cache import cached_export, store_export
+
+# Heavy report builds (FG workbooks, godown aging, Schedule_with_Dispatch)
+# run on a worker thread instead of the Streamlit script thread, so the page
+# stays usable while they run. Sheets are still rendered in the excel_export
+# process pool where the builder uses it.
+#
+# Jobs are process-wide and keyed like the export cache (dataset hash, view,
+# filters): a second session asking for the same artifact attaches to the
+# running job. A job leaves the process-wide table as soon as it ends: a
+# finished one hands its bytes to the export cache, a failed one keeps only
+# its error. Each session keeps in session state the jobs it asked for, so
+# it still sees a failure (and can retry) after the job is gone.
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 1.0
+
+_job_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='report-job')
+_jobs = {}
+_lock = threading.Lock()
+
+
+class ReportJob:
+
+    def __init__(self, key):
+        self.key = key
+        self.done = 0
+        self.total = None  # known once the builder reports its first step
+        self.step = None
+        self.error = None
+        self.future = None
+
+    def advance(self, step, total):
+        # progress callback handed to the builder: one call per finished step
+        self.done += 1
+        self.total = total
+        self.step = step
+
+    @property
+    def fraction(self):
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    def _run(self, build):
+        try:
+            store_export(self.key, build(self.advance))
+        except Exception as e:
+            logger.exception("Report build failed: %s", self.key)
+            # the traceback would keep the builder's stack frames alive
+            self.error = e.with_traceback(None)
+        finally:
+            # nothing keeps the builder (and the data it closes over) alive
+            with _lock:
+                if _jobs.get(self.key) is self:
+                    del _jobs[self.key]
+
+    @property
+    def finished(self):
+        return self.future is not None and self.future.done()
+
+
+def start_job(key, build):
+    # build(progress) -> bytes or BytesIO; returns the job building `key`,
+    # the one already running if there is one
+    with _lock:
+        job = _jobs.get(key)
+        if job is None:
+            job = _jobs[key] = ReportJob(key)
+            job.future = _job_pool.submit(job._run, build)
+    return job
+
+
+def current_job(key):
+    return _jobs.get(key)
+
+
+def _requested():
+    # {artifact key: the ReportJob this session started or joined}
+    return st.session_state.setdefault('_report_jobs', {})
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def _job_progress(key, file_name):
+    # polls the running job without rerunning the page; a full rerun once
+    # it has ended shows the download button (or the error)
+    job = _requested().get(key)
+    if job is None or job.finished:
+        st.rerun()
+    text = f"Building {file_name}"
+    if job.step:
+        text += f": {job.step} ({job.done}/{job.total})"
+    st.progress(job.fraction, text=text)
+
+
+def job_download_button(key, build, label, file_name, mime, prepare_label=None):
+    # Download button for an artifact built in the background: "Prepare"
+    # starts (or joins) the job, progress is shown until the bytes are ready
+    requested = _requested()
+    data = cached_export(key)
+    if data is not None:
+        requested.pop(key, None)
+        return st.download_button(label=label, data=data, file_name=file_name, mime=mime)
+
+    job = requested.get(key)
+    if job is not None and job.error is not None:
+        # shown until the build is retried
+        st.error(f"Building {file_name} failed: {job.error}")
+    if job is None or job.finished:
+        # another session's running build is joined without a click
+        job = current_job(key)
+    if job is None:
+        if not st.button(prepare_label or f"Prepare {file_name}", key=f"prepare {file_name}"):
+            return None
+        job = start_job(key, build)
+    requested[key] = job
+    _job_progress(key, file_name)
+    return None
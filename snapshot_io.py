@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+import pyarrow as pa
+
+# File helpers shared by the Arrow (Feather v2) snapshot stores: kit_catalog,
+# fg_history and godown_aging.
+
+
+def write_atomic(path, write):
+    # write(tmp) fills a temporary file next to `path`, which then replaces
+    # `path` in one rename: readers see the old file or the new one, never a
+    # partial one
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def read_mapped(path, schema_only=False):
+    # Arrow table of a snapshot, memory-mapped: columns point into the OS
+    # page cache instead of being read into process memory
+    with pa.memory_map(path, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        return reader.schema if schema_only else reader.read_all()
+
+
+def stored_text(column):
+    # mixed object columns (numbers and text) are stored as strings; missing
+    # values stay missing
+    return column.where(column.isna(), column.astype(str)).astype(object)
@@ -0,0 +1,133 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+# Server-side table: the full frame stays in the Python process, sorting,
+# searching and subtotals run here, and only the visible page is sent to
+# the browser.
+
+DEFAULT_PAGE_SIZE = 200
+NO_SORT = '(none)'
+
+# Date columns the pages keep as 'dd-mm-YYYY' strings
+DATE_COLUMNS = {'Billing Date': '%d-%m-%Y', 'Cust PO Date': '%d-%m-%Y'}
+# String columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_RATIO = 0.5
+MAX_PREPARED_FRAMES = 8
+
+
+# ---------------- DISPLAY PREPARATION ----------------
+# st.dataframe serializes through Arrow. Object columns mixing int/float/str,
+# or dates held as strings, make pyarrow fail and fall back to slow per-cell
+# fixes. Every column is given one Arrow-native type up front.
+
+def _parse_dates(s, date_format):
+    # a register has a few hundred distinct dates over many rows: parse
+    # each distinct string once
+    codes, uniques = pd.factorize(s)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=date_format, errors='coerce')
+    values = np.append(parsed.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT'))[codes]  # -1: missing
+    return pd.Series(values, index=s.index, name=s.name)
+
+
+def _arrow_column(s):
+    if s.name in DATE_COLUMNS and not pd.api.types.is_datetime64_any_dtype(s):
+        dates = _parse_dates(s, DATE_COLUMNS[s.name])
+        return dates.astype(pd.ArrowDtype(pa.date32()))
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.astype(pd.ArrowDtype(pa.date32())) if s.name in DATE_COLUMNS else s
+    if not (s.dtype == object or pd.api.types.is_string_dtype(s)):
+        return s
+
+    kind = pd.api.types.infer_dtype(s, skipna=True)
+    if kind in ('integer', 'floating', 'mixed-integer-float', 'decimal'):
+        numbers = pd.to_numeric(s, errors='coerce')
+        if numbers.notna().all() and (numbers % 1 == 0).all():
+            return numbers.astype('int64')
+        return numbers.astype('float64')
+    if kind == 'empty':
+        return s.astype('string')
+
+    text = s.astype('string') if kind == 'string' else s.where(s.isna(), s.astype(str)).astype('string')
+    if len(text) and text.nunique() <= CATEGORY_MAX_RATIO * len(text):
+        return text.astype('category')
+    return text
+
+
+def prepare_display(df):
+    if df.shape[1] == 0:
+        return df, {}
+    prepared = pd.concat([_arrow_column(df.iloc[:, i]) for i in range(df.shape[1])], axis=1)
+    prepared.columns = df.columns
+    column_config = {
+        col: st.column_config.DateColumn(col, format='DD-MM-YYYY')
+        for col in df.columns if col in DATE_COLUMNS
+    }
+    return prepared, column_config
+
+
+def show_dataframe(df, cache_key=None, **kwargs):
+    # cache_key identifies the frame's content (upload hash + filters); when
+    # given, the converted frame is reused across reruns instead of rebuilt.
+    if cache_key is None:
+        prepared, column_config = prepare_display(df)
+    else:
+        memo = st.session_state.setdefault('_display_frames', OrderedDict())
+        if cache_key not in memo:
+            memo[cache_key] = prepare_display(df)
+            while len(memo) > MAX_PREPARED_FRAMES:
+                memo.popitem(last=False)
+        memo.move_to_end(cache_key)
+        prepared, column_config = memo[cache_key]
+    st.dataframe(prepared, column_config=column_config, **kwargs)
+
+
+def _sorted(view, sort_col, descending):
+    try:
+        return view.sort_values(sort_col, ascending=not descending, kind='stable')
+    except TypeError:
+        # mixed int/str columns (e.g. Material) sort as text
+        return view.sort_values(sort_col, ascending=not descending, kind='stable', key=lambda s: s.astype(str))
+
+
+def paginated_table(df, key, sum_cols=(), page_size=DEFAULT_PAGE_SIZE):
+    columns = df.columns.tolist()
+
+    c1, c2, c3, c4 = st.columns([2, 1, 2, 2])
+    sort_col = c1.selectbox('Sort by', [NO_SORT] + columns, key=f'{key}_sort')
+    descending = c2.checkbox('Descending', key=f'{key}_desc')
+    search_col = c3.selectbox('Search in', columns, key=f'{key}_search_col')
+    search_text = c4.text_input('Contains', key=f'{key}_search')
+
+    view = df
+    if search_text and search_col is not None:
+        view = view[view[search_col].astype(str).str.contains(search_text, case=False, na=False, regex=False)]
+    if sort_col != NO_SORT:
+        view = _sorted(view, sort_col, descending)
+
+    total_rows = len(view)
+    page_count = max(1, math.ceil(total_rows / page_size))
+
+    # Filters can shrink the result below the page the user was on
+    page_key = f'{key}_page'
+    if st.session_state.get(page_key, 1) > page_count:
+        st.session_state[page_key] = 1
+    page = st.number_input(f'Page (of {page_count})', min_value=1, max_value=page_count, step=1, key=page_key)
+
+    start = (page - 1) * page_size
+    end = min(start + page_size, total_rows)
+
+    summary = [f"Rows: {total_rows:,}", f"Showing {start + 1 if total_rows else 0:,}–{end:,}"]
+    for col in sum_cols:
+        if col in view.columns:
+            total = pd.to_numeric(view[col], errors='coerce').sum()
+            summary.append(f"{col}: {total:,.2f}")
+    st.caption(' | '.join(summary))
+
+    # only the visible page is converted and serialized
+    show_dataframe(view.iloc[start:end], width='stretch')
+    return view
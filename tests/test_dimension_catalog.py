@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dimension_catalog import DimensionCatalog
+
+SPEC = dict(
+    columns=['Month-Year', 'Updated Customer Name', 'Customer Name'],
+    text_columns=['Plant'],
+    hierarchies=[('Updated Customer Name', 'Customer Name')],
+)
+
+
+def register(rows, seed, customers):
+    rng = np.random.default_rng(seed)
+    names = np.array([f"Customer {i}" for i in range(customers)], dtype=object)
+    frame = pd.DataFrame({
+        'Month-Year': rng.choice(['April-24', 'May-24', 'June-24', None], rows),
+        'Customer Name': rng.choice(names, rows),
+        'Plant': rng.choice([2000, 2100, 4000.0, np.nan], rows),
+    })
+    frame['Updated Customer Name'] = frame['Customer Name'].str[:10]
+    return frame
+
+
+def _lists(catalog, df):
+    lists = {col: catalog.values(col) for col in SPEC['columns'] + SPEC['text_columns']}
+    for parent in catalog.values('Updated Customer Name') + ['All']:
+        lists[parent] = catalog.child_options('Updated Customer Name', 'Customer Name', parent)
+    return lists
+
+
+@pytest.mark.parametrize('sort', [True, False])
+@pytest.mark.parametrize('seed', range(20))
+def test_update_matches_a_fresh_build(seed, sort):
+    grown = pd.concat([register(300, seed, 8), register(200, seed + 100, 15)], ignore_index=True)
+    catalog = DimensionCatalog(sort=sort, **SPEC).update(grown.iloc[:300])
+    _lists(catalog, grown.iloc[:300])  # cached lists must be invalidated by the update
+    catalog.update(grown.iloc[300:])
+    assert _lists(catalog, grown) == _lists(DimensionCatalog(sort=sort, **SPEC).update(grown), grown)
@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from dispatch_rules import dedup_dispatch, dedup_mask, mech_kit_numbers, normalize_sold_to, power_kit_numbers
+from kit_catalog import KitLookup
+
+SEEDS = range(200)
+
+
+# ---------------- LEGACY IMPLEMENTATIONS ----------------
+# The page code the dedup variants replaced, kept here as the reference.
+
+def legacy_register(dispatch_df, billing_col='Billing Doc No.'):
+    # manual_dispatch.py / new_dispatch.py
+    keep_sales_order_10 = dispatch_df[dispatch_df['Sales Order No'].astype(str).str.startswith('10')]
+    remaining = dispatch_df[~dispatch_df['Sales Order No'].astype(str).str.startswith('10')]
+    if billing_col in remaining.columns:
+        duplicates = remaining[billing_col].value_counts()[lambda x: x > 1].index.tolist()
+        duplicates_df = remaining[remaining[billing_col].isin(duplicates)]
+        unique_df = remaining[~remaining[billing_col].isin(duplicates)]
+    else:
+        duplicates_df = pd.DataFrame(columns=remaining.columns)
+        unique_df = remaining.copy()
+    if 'Item' in duplicates_df.columns:
+        duplicates_df = duplicates_df[duplicates_df['Item'] == 10]
+    return pd.concat([keep_sales_order_10, unique_df, duplicates_df], ignore_index=True)
+
+
+def legacy_daywise(filtered_daywise):
+    # new2.py Daywise page
+    def should_keep(row, billing_counts):
+        if billing_counts[row['Billing Doc No.']] == 1:
+            return True
+        if str(row['Sales Order No']).startswith('10'):
+            return True
+        return row['Item'] == 10
+
+    billing_counts = filtered_daywise['Billing Doc No.'].value_counts()
+    return filtered_daywise[filtered_daywise.apply(lambda row: should_keep(row, billing_counts), axis=1)]
+
+
+def legacy_invoice(filtered_data):
+    # new2.py Invoice Value page (groupby.apply over Billing Doc, NaN docs dropped)
+    parts = []
+    for _, group in filtered_data.groupby('Billing Doc No.'):
+        if (group['Billing Doc No.'].nunique() > 1) or group['Sales Order No'].astype(str).str.startswith('10').any():
+            parts.append(group)
+        else:
+            parts.append(group[group['Item'] == 10])
+    if not parts:
+        return filtered_data.iloc[:0].reset_index(drop=True)
+    return pd.concat(parts).reset_index(drop=True)
+
+
+# ---------------- FRAMES ----------------
+
+def random_register(seed, missing_docs=True):
+    rng = np.random.default_rng(seed)
+    rows = int(rng.integers(0, 60))
+    docs = rng.integers(90000000, 90000000 + max(rows // 2, 1), rows).astype(float)
+    if missing_docs:
+        docs[rng.random(rows) < 0.1] = np.nan
+    # Sales Order numbers as ints, strings and missing values
+    so = rng.choice(['10', '20', '11', '21'], rows).astype(object) + rng.integers(100000, 999999, rows).astype(str)
+    so = pd.Series(so, dtype=object)
+    numeric = rng.random(rows) < 0.5
+    so[numeric] = so[numeric].astype(np.int64)
+    so[rng.random(rows) < 0.05] = np.nan
+    frame = pd.DataFrame({
+        'Billing Doc No.': docs,
+        'Sales Order No': so.to_numpy(),
+        'Item': rng.choice([10, 20, 30], rows),
+        'Qty': rng.integers(1, 100, rows),
+    })
+    # a non-default index, as the pages pass filtered frames
+    frame.index = rng.permutation(rows) + 1000
+    return frame
+
+
+# ---------------- EQUIVALENCE ----------------
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_register_matches_legacy(seed):
+    df = random_register(seed)
+    pd.testing.assert_frame_equal(dedup_dispatch(df, variant='register'), legacy_register(df), check_dtype=False)
+
+
+@pytest.mark.parametrize('seed', SEEDS[:50])
+def test_register_without_billing_or_item_column(seed):
+    df = random_register(seed).rename(columns={'Billing Doc No.': 'Billing Doc'})
+    pd.testing.assert_frame_equal(
+        dedup_dispatch(df, variant='register', billing_col=None),
+        legacy_register(df, billing_col=None),
+        check_dtype=False,
+    )
+    df = random_register(seed).drop(columns=['Item'])
+    pd.testing.assert_frame_equal(dedup_dispatch(df, variant='register'), legacy_register(df), check_dtype=False)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_daywise_matches_legacy(seed):
+    # the legacy row-wise rule raised KeyError on a missing Billing Doc
+    df = random_register(seed, missing_docs=False)
+    pd.testing.assert_frame_equal(dedup_dispatch(df, variant='daywise'), legacy_daywise(df))
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_invoice_matches_legacy(seed):
+    df = random_register(seed)
+    pd.testing.assert_frame_equal(dedup_dispatch(df, variant='invoice'), legacy_invoice(df), check_dtype=False)
+
+
+# ---------------- EDGE CASES ----------------
+
+def _frame(docs, so, items):
+    return pd.DataFrame({'Billing Doc No.': docs, 'Sales Order No': so, 'Item': items})
+
+
+def test_daywise_keeps_rows_without_billing_doc():
+    df = _frame([np.nan, np.nan, 1.0, 1.0], ['20', '20', '20', '20'], [20, 20, 20, 10])
+    assert dedup_mask(df, variant='daywise').tolist() == [True, True, False, True]
+
+
+def test_invoice_keeps_whole_doc_with_an_so_10_row():
+    df = _frame([2.0, 2.0, 1.0, 1.0, np.nan], ['20', '10', '20', '20', '10'], [20, 30, 20, 10, 10])
+    out = dedup_dispatch(df, variant='invoice')
+    # Billing Doc order; doc 1 keeps its Item 10 row only; no-doc rows dropped
+    assert out['Billing Doc No.'].tolist() == [1.0, 2.0, 2.0]
+    assert out['Item'].tolist() == [10, 20, 30]
+
+
+def test_register_block_order():
+    df = _frame([1.0, 2.0, 4.0, 3.0, 1.0, 2.0], ['20', '20', '20', '10', '20', '20'], [20, 10, 20, 20, 10, 20])
+    out = dedup_dispatch(df, variant='register')
+    # [SO-10, unique, duplicates at Item 10 only]
+    assert out['Billing Doc No.'].tolist() == [3.0, 4.0, 2.0, 1.0]
+    assert out['Item'].tolist() == [20, 20, 10, 10]
+
+
+def test_unknown_variant():
+    with pytest.raises(ValueError):
+        dedup_mask(_frame([1.0], ['10'], [10]), variant='other')
+
+
+# ---------------- SOLD-TO NORMALIZATION (golden) ----------------
+
+def test_manual_sold_to_plant_2000_a_f_prefix():
+    df = pd.DataFrame({
+        'Sold-to Party': ['A001', 'f002', 'A003.', 'V001', 'B001', np.nan, 123, 'F004', 'A005', 'A006'],
+        'Plant': [2000, '2000 ', 2000, 2000, 2000, 2000, 2000, '20001', 2100, np.nan],
+    })
+    assert normalize_sold_to(df, variant='manual').tolist() == [
+        'A001.', 'f002.', 'A003.', 'V001', 'B001', '', '123', 'F004.', 'A005', 'A006',
+    ]
+
+
+def test_manual_sold_to_without_plant_column():
+    df = pd.DataFrame({'Sold-to Party': ['A001', np.nan]})
+    assert normalize_sold_to(df, variant='manual').tolist() == ['A001', '']
+
+
+def test_report_sold_to_plant_2000_not_v():
+    df = pd.DataFrame({
+        'Sold-to Party': pd.Series(['A001', 'v01', np.nan, 555, 'B002.', 'A003', np.nan], dtype=object),
+        'Plant': [2000, 2000, 2000, 2000, 2000, '2000', 2100],
+    })
+    out = normalize_sold_to(df, variant='report')
+    # plant compared as the number 2000; a missing Sold-to becomes 'nan.'
+    assert out.iloc[:6].tolist() == ['A001.', 'v01', 'nan.', '555.', 'B002..', 'A003']
+    assert pd.isna(out.iloc[6])
+
+
+def test_unknown_sold_to_variant():
+    with pytest.raises(ValueError):
+        normalize_sold_to(pd.DataFrame({'Sold-to Party': [], 'Plant': []}), variant='other')
+
+
+# ---------------- KIT PART NUMBERS (golden) ----------------
+
+def _lookup(mapping):
+    # parts sorted, as in a catalog snapshot
+    parts = sorted(mapping)
+    return KitLookup(pa.array(parts, pa.string()), pa.array([mapping[p] for p in parts], pa.string()))
+
+
+def test_power_kit_numbers():
+    df = pd.DataFrame({
+        'Description': ['STG GEAR KIT', ' STG GEAR KIT H-Pas ', 'STG GEAR KIT', 'VANE PUMP KIT 12',
+                        'XVANE PUMP KIT', 'STG GEAR KIT', np.nan, 'Other'],
+        'Part Number': np.array(['P1', 123, 'P9', 'P2', 'P1', np.nan, 'P1', 'P1'], dtype=object),
+    }, index=range(10, 18))
+    out = power_kit_numbers(df, _lookup({'P1': 'K1', '123': 'K123'}), _lookup({'P2': 'K2'}))
+    assert out.index.tolist() == list(range(10, 18))
+    assert out.tolist() == ['K1', 'K123', '', 'K2', '', '', '', '']
+
+
+def test_power_kit_numbers_without_description():
+    df = pd.DataFrame({'Part Number': ['P1']})
+    assert power_kit_numbers(df, _lookup({'P1': 'K1'}), _lookup({})).tolist() == ['']
+
+
+def test_mech_kit_numbers():
+    df = pd.DataFrame({'Part Number': pd.Series(['7820975001', '734097xyz', '7820975999', 'P1', np.nan], dtype=object)})
+    lookup = _lookup({'7820975001': 'MK1', '734097xyz': 'MK2', 'P1': 'X'})
+    # only 7820975* / 734097* parts are looked up; unknown kits are ''
+    assert mech_kit_numbers(df, lookup).tolist() == ['MK1', 'MK2', '', '', '']
+
+
+def test_kit_numbers_with_an_empty_lookup():
+    df = pd.DataFrame({'Description': ['STG GEAR KIT'], 'Part Number': ['7820975001']})
+    assert power_kit_numbers(df, _lookup({}), _lookup({})).tolist() == ['']
+    assert mech_kit_numbers(df, _lookup({})).tolist() == ['']
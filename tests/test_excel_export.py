@@ -0,0 +1,73 @@
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from excel_export import build_workbooks, write_aging_sheet, write_fg_sheet
+
+
+def _fg_frame(rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Material': [f"M{i:05d}" for i in rng.integers(0, 500, rows)],
+        'Plant': rng.choice(['1000', '2000', '3000'], rows),
+        'Unrestricted': rng.integers(0, 1000, rows),
+        'Value': rng.random(rows).round(2),
+        'Note': rng.choice(['', 'subtotal', 'hold', None], rows),
+    })
+
+
+def _aging_frame(rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Code': rng.integers(100, 110, rows),
+        'Name': rng.choice(['Alpha', 'Beta', 'Gamma'], rows),
+        'Inv No': rng.integers(10000, 20000, rows),
+        'Inv Date': pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.integers(0, 200, rows), unit='D'),
+        'Item Code': [f"I{i:04d}" for i in rng.integers(0, 50, rows)],
+        'Item Desc': rng.choice(['Bracket', 'Housing', 'Shaft'], rows),
+        'Qty': rng.integers(1, 100, rows),
+        'Amount': rng.random(rows).round(2) * 1000,
+        'Days': rng.integers(30, 120, rows),
+        'GDN Receipt': rng.choice(['Yes', 'No'], rows),
+        'ASN': rng.choice(['A1', 'A2', None], rows),
+    })
+
+
+def _sheet_parts(data):
+    # every part of the package except docProps (creation timestamps)
+    with zipfile.ZipFile(data) as z:
+        return {name: z.read(name) for name in z.namelist() if not name.startswith('docProps/')}
+
+
+def _assert_identical(workbooks, writer):
+    parallel = build_workbooks(workbooks, writer, parallel=True, max_workers=2)
+    serial = build_workbooks(workbooks, writer, parallel=False)
+    assert list(parallel) == list(serial) == list(workbooks)
+    for name in workbooks:
+        parallel_parts, serial_parts = _sheet_parts(parallel[name]), _sheet_parts(serial[name])
+        assert any(part.startswith('xl/worksheets/') for part in serial_parts)
+        assert parallel_parts == serial_parts, name
+
+
+def test_fg_workbooks_identical_parallel_and_serial():
+    _assert_identical({
+        'ALL FG.xlsx': {'1000': _fg_frame(300, 1), '2000': _fg_frame(200, 2), 'Empty': _fg_frame(0, 3)},
+        '2000 Plant FG.xlsx': {'Stores': _fg_frame(150, 4)},
+    }, write_fg_sheet)
+
+
+def test_aging_workbooks_identical_parallel_and_serial():
+    _assert_identical({
+        'Pending_Godown_Stock.xlsx': {
+            '30 - 45 Days': _aging_frame(120, 5),
+            '46 - 60 Days': _aging_frame(80, 6),
+            '61 & Above Days': _aging_frame(60, 7),
+        },
+    }, write_aging_sheet)
+
+
+def test_pool_follows_max_workers():
+    from excel_export import _get_pool
+    assert _get_pool(1) is _get_pool(1)
+    assert _get_pool(1) is not _get_pool(2)
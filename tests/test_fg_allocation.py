@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fg_allocation import FULL, NO_BALANCE, NO_STOCK, PARTIAL, TAKEN, FGAllocation, allocate_fg
+
+
+# ---------------- SEQUENTIAL REFERENCE ----------------
+
+def reference_allocate(lines, fg, priority_ranking=(), plant_sources=None):
+    # One line at a time, straight from the rules: customer priority, then
+    # largest balance, then line order; each line takes from its part pool
+    # and then its kit pool, at its plant and then at its source plants.
+    stock = {}
+    for material, plant, quantity in fg[['Material', 'Plant', 'Unrestricted']].itertuples(index=False):
+        key = (str(material).strip(), str(plant).strip())
+        stock[key] = stock.get(key, 0) + quantity
+    rank = {customer: position for position, customer in enumerate(priority_ranking)}
+    rows = list(lines[['Customer', 'Part Number', 'Kit Part Number', 'Plant', 'Balance Dispatch']].itertuples(index=False))
+    order = sorted(range(len(rows)), key=lambda i: (rank.get(rows[i][0], len(rank)), -rows[i][4], i))
+    allocated = [0] * len(rows)
+    for i in order:
+        customer, part, kit, plant, need = rows[i]
+        part, kit, plant = part.strip(), kit.strip(), plant.strip()
+        if need <= 0 or part == '' or plant == '':
+            continue
+        plants = [plant] + [p for p in (plant_sources or {}).get(plant, []) if p != plant]
+        for source in plants:
+            for material in (part, kit):
+                have = stock.get((material, source), 0) if material else 0
+                take = min(have, need) if have > 0 else 0
+                stock[(material, source)] = have - take
+                allocated[i] += take
+                need -= take
+    return pd.Series(allocated, index=lines.index, dtype=float)
+
+
+def random_case(seed, lines=300):
+    rng = np.random.default_rng(seed)
+    parts = [f"P{i}" for i in range(25)]
+    kits = [f"K{i}" for i in range(6)] + [''] * 6
+    plants = ['2000', '2100', '4000', '']
+    frame = pd.DataFrame({
+        'Customer': rng.choice([f"C{i}" for i in range(5)], lines),
+        'Part Number': rng.choice(parts + [''], lines),
+        'Kit Part Number': rng.choice(kits, lines),
+        'Plant': rng.choice(plants, lines, p=[0.45, 0.3, 0.2, 0.05]),
+        'Balance Dispatch': rng.integers(-5, 60, lines),
+    }, index=pd.RangeIndex(1000, 1000 + lines))
+    rows = lines // 2
+    fg = pd.DataFrame({
+        'Material': rng.choice(parts + kits[:6], rows),
+        'Plant': rng.choice(plants[:3], rows),
+        'Unrestricted': rng.integers(0, 80, rows),
+    })
+    return frame, fg
+
+
+PLANT_SOURCES = {'2000': ['2100'], '4000': ['2000', '2100'], '2100': ['2100']}
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_matches_the_sequential_reference(seed):
+    lines, fg = random_case(seed)
+    rng = np.random.default_rng(seed)
+    ranking = list(rng.permutation([f"C{i}" for i in range(5)])[:rng.integers(0, 4)])
+    sources = PLANT_SOURCES if seed % 2 else None
+    allocation = FGAllocation(lines, fg, ranking, sources)
+    pd.testing.assert_series_equal(
+        allocation.allocated, reference_allocate(lines, fg, ranking, sources), check_names=False
+    )
+    # no pool gives more than it holds
+    assert (allocation.taken >= 0).all()
+    used = np.zeros(len(allocation.stock))
+    np.add.at(used, allocation.slots[allocation.slots >= 0], allocation.taken[allocation.slots >= 0])
+    assert (used <= allocation.stock + 1e-9).all()
+
+
+# ---------------- RULES AND EXPLANATION ----------------
+
+LINES = pd.DataFrame({
+    'Customer': ['Low', 'High', 'Low', 'Low', 'Low'],
+    'Part Number': ['P1', 'P1', 'P2', 'P3', 'P1'],
+    'Kit Part Number': ['K1', 'K1', '', '', 'K1'],
+    'Plant': ['2000', '2000', '2000', '2000', '2000'],
+    'Balance Dispatch': [40, 25, 5, 0, 10],
+}, index=['L0', 'L1', 'L2', 'L3', 'L4'])
+FG = pd.DataFrame({
+    'Material': ['P1', 'K1', 'P2'],
+    'Plant': ['2000', '2000', '2100'],
+    'Unrestricted': [30, 20, 10],
+})
+
+
+def test_largest_balance_first_with_a_shared_part_and_kit_pool():
+    report = allocate_fg(LINES, FG)
+    assert report.index.tolist() == ['L0', 'L1', 'L4', 'L2', 'L3']
+    assert report['Rank'].tolist() == [1, 2, 3, 4, 5]
+    assert report['Dispatchable FG'].tolist() == [40, 10, 0, 0, 0]
+    assert report['Part FG Used'].tolist() == [30, 0, 0, 0, 0]
+    assert report['Kit FG Used'].tolist() == [10, 10, 0, 0, 0]
+    assert report['Reason'].tolist() == [FULL, PARTIAL, TAKEN, NO_STOCK, NO_BALANCE]
+    assert report.loc['L0', 'Drawn From'] == 'P1 @ 2000: 30; K1 @ 2000: 10'
+    assert report.loc['L1', 'Drawn From'] == 'K1 @ 2000: 10'
+    assert report.loc['L0', 'FG Available'] == 50
+    assert report.loc['L0', 'Lines Sharing Part FG'] == 3
+    assert report.loc['L3', 'Lines Sharing Part FG'] == 1
+    assert report['Short'].tolist() == [0, 15, 10, 5, 0]
+
+
+def test_customer_priority_comes_before_balance():
+    report = allocate_fg(LINES, FG, priority_ranking=['High'])
+    assert report.index.tolist() == ['L1', 'L0', 'L4', 'L2', 'L3']
+    assert report['Priority'].tolist() == [0, 1, 1, 1, 1]
+    assert report['Dispatchable FG'].tolist() == [25, 25, 0, 0, 0]
+    assert report.loc['L0', 'Drawn From'] == 'P1 @ 2000: 5; K1 @ 2000: 20'
+
+
+def test_plant_sources_are_drawn_on_after_the_billing_plant():
+    report = allocate_fg(LINES, FG, plant_sources={'2000': ['2100']})
+    assert report.loc['L2', 'Dispatchable FG'] == 5
+    assert report.loc['L2', 'Drawn From'] == 'P2 @ 2100: 5'
+    assert report.loc['L2', 'Reason'] == FULL
+    # the billing plant's own FG is used up first
+    fg = pd.concat([FG, pd.DataFrame({'Material': ['P2'], 'Plant': ['2000'], 'Unrestricted': [3]})])
+    report = allocate_fg(LINES, fg, plant_sources={'2000': ['2100']})
+    assert report.loc['L2', 'Drawn From'] == 'P2 @ 2000: 3; P2 @ 2100: 2'
+
+
+def test_no_lines():
+    allocation = FGAllocation(LINES.iloc[:0], FG)
+    assert allocation.allocated.empty
+    assert allocation.report().empty
+
+
+# ---------------- WHAT-IF ----------------
+
+def rebuilt_fg(fg, stock_changes):
+    # FG rows giving each changed pool what_if's stock: the change added,
+    # never below zero
+    totals = fg.assign(Material=fg['Material'].astype(str), Plant=fg['Plant'].astype(str)).groupby(['Material', 'Plant'])['Unrestricted'].sum()
+    extra = []
+    for (material, plant), quantity in stock_changes.items():
+        before = totals.get((material, plant), 0)
+        extra.append((material, plant, max(before + quantity, 0) - before))
+    return pd.concat([fg, pd.DataFrame(extra, columns=['Material', 'Plant', 'Unrestricted'])], ignore_index=True)
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_what_if_matches_a_full_recompute(seed):
+    lines, fg = random_case(seed)
+    rng = np.random.default_rng(seed + 1000)
+    ranking = ['C1', 'C3']
+    sources = PLANT_SOURCES if seed % 2 else None
+    allocation = FGAllocation(lines, fg, ranking, sources)
+
+    materials = np.append(fg['Material'].unique(), ['P99'])
+    stock_changes = {
+        (str(rng.choice(materials)), str(rng.choice(['2000', '2100', '4000']))): float(rng.integers(-60, 60))
+        for _ in range(rng.integers(0, 6))
+    }
+    scenario_ranking = None if seed % 3 == 0 else list(rng.permutation([f"C{i}" for i in range(5)])[:rng.integers(0, 5)])
+
+    changed = allocation.what_if(stock_changes, scenario_ranking)
+    scenario = allocation.allocated.copy()
+    scenario[changed.index] = changed['Scenario Dispatchable FG']
+    full = FGAllocation(lines, rebuilt_fg(fg, stock_changes), ranking if scenario_ranking is None else scenario_ranking, sources)
+    pd.testing.assert_series_equal(scenario, full.allocated)
+    assert (changed['Change'] != 0).all()
+    assert (changed['Baseline Dispatchable FG'] == allocation.allocated[changed.index]).all()
+
+
+def test_what_if_without_changes():
+    allocation = FGAllocation(LINES, FG, ['High'])
+    assert allocation.what_if().empty
+    assert allocation.what_if({('P9', '2000'): 100}, ['High']).empty
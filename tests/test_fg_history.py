@@ -0,0 +1,84 @@
+import os
+from datetime import date
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fg_history import add_snapshot, open_as_of, open_part, snapshot_dates, unrestricted_history
+
+
+def fg_file(rows, seed=0):
+    # FG workbook bytes as SAP exports it (leading index column included)
+    rng = np.random.default_rng(seed)
+    fg = pd.DataFrame({
+        'Material': rng.choice(np.array([8033912345, 'C123', '7820975001', 'M033912'], dtype=object), rows),
+        'Plant': rng.choice([2000, 2100, 4000], rows),
+        'Storage Location': rng.choice(np.array(['FG01', 'PT01', 4010, None], dtype=object), rows),
+        'Unrestricted': rng.integers(0, 100, rows),
+    })
+    buffer = BytesIO()
+    fg.to_excel(buffer)
+    return buffer.getvalue(), fg
+
+
+def test_add_snapshot_stores_a_file_once_per_day(tmp_path):
+    directory = str(tmp_path)
+    first, _ = fg_file(20, seed=1)
+    second, _ = fg_file(20, seed=2)
+    day = date(2026, 10, 1)
+    path = add_snapshot(first, day, directory)
+    assert add_snapshot(first, day, directory) == path
+    corrected = add_snapshot(second, day, directory)
+    assert os.path.basename(path).startswith('0001-') and os.path.basename(corrected).startswith('0002-')
+    # the first file again is a new correction of the day, not the old part
+    assert os.path.basename(add_snapshot(first, day, directory)).startswith('0003-')
+    assert len(os.listdir(os.path.dirname(path))) == 3
+    assert snapshot_dates(directory) == [day]
+
+
+def test_latest_part_of_a_day_is_in_effect(tmp_path):
+    directory = str(tmp_path)
+    day = date(2026, 10, 1)
+    first, _ = fg_file(20, seed=1)
+    second, expected = fg_file(30, seed=2)
+    add_snapshot(first, day, directory)
+    add_snapshot(second, day, directory)
+    snapshot = open_as_of(day, directory)
+    assert len(snapshot.frame) == 30
+    assert snapshot.unrestricted('C123') == expected.loc[expected['Material'] == 'C123', 'Unrestricted'].sum()
+
+
+def test_open_as_of_before_on_and_after_the_snapshot_dates(tmp_path):
+    directory = str(tmp_path)
+    early, _ = fg_file(10, seed=1)
+    late, _ = fg_file(10, seed=2)
+    add_snapshot(early, date(2026, 10, 1), directory)
+    add_snapshot(late, date(2026, 10, 5), directory)
+    assert open_as_of(date(2026, 9, 30), directory) is None
+    assert open_as_of(date(2026, 10, 1), directory).day == date(2026, 10, 1)
+    assert open_as_of(date(2026, 10, 4), directory).day == date(2026, 10, 1)
+    assert open_as_of(date(2026, 10, 5), directory).day == date(2026, 10, 5)
+    assert open_as_of(date(2027, 1, 1), directory).day == date(2026, 10, 5)
+    history = unrestricted_history('C123', 2000, directory=directory)
+    assert history.index.tolist() == [date(2026, 10, 1), date(2026, 10, 5)]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_lookups_match_a_filter_on_the_file(tmp_path, seed):
+    data, fg = fg_file(400, seed)
+    snapshot = open_part(add_snapshot(data, date(2026, 10, 1), str(tmp_path)))
+    text = fg.astype({'Material': str, 'Plant': str}).assign(**{'Storage Location': fg['Storage Location'].map(lambda v: None if v is None else str(v))})
+    for material in ['8033912345', 'C123', '7820975001', 'M033912', 'missing']:
+        for plant in [None, '2000', 2100, '4000', '9999']:
+            for location in ([None] if plant is None else [None, 'FG01', '4010', 'XX']):
+                mask = text['Material'] == material
+                if plant is not None:
+                    mask &= text['Plant'] == str(plant)
+                if location is not None:
+                    mask &= text['Storage Location'] == location
+                assert snapshot.unrestricted(material, plant, location) == fg.loc[mask, 'Unrestricted'].sum()
+                assert len(snapshot.lookup(material, plant, location)) == mask.sum()
+    # lookups read the mapped table, not a materialized frame
+    assert 'frame' not in vars(snapshot)
@@ -0,0 +1,80 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from godown_aging import diff_snapshots, load_snapshot, movement_summary, save_snapshot, snapshot_frame
+
+
+def pending(rows):
+    # rows: (Inv No, Item Code, Qty, Days)
+    return snapshot_frame(pd.DataFrame(
+        [(inv, item, qty, qty * 10.0, days, f"Party {inv}") for inv, item, qty, days in rows],
+        columns=['Inv No', 'Item Code', 'Qty', 'Amount', 'Days', 'Party'],
+    ))
+
+
+PREVIOUS = pending([
+    ('I1', 'A', 5, 35),   # same bucket tomorrow
+    ('I1', 'B', 2, 44),   # 30-45 -> 46-60: aged
+    ('I2', 'A', 1, 20),   # below the first bucket -> 30-45: aged
+    ('I3', 'C', 4, 70),   # gone: received
+])
+CURRENT = pending([
+    ('I1', 'A', 5, 36),
+    ('I1', 'B', 2, 46),
+    ('I2', 'A', 1, 30),
+    ('I4', 'D', 3, 1),    # new, not yet in a bucket
+    (1005, 'E', 7, 50),   # new
+])
+
+
+def _bucket(value):
+    return None if pd.isna(value) else value
+
+
+def _movements(report):
+    return {(row['Inv No'], row['Item Code']): (row['Movement'], _bucket(row['Previous Bucket']), _bucket(row['Bucket']))
+            for _, row in report.iterrows()}
+
+
+def test_new_aged_received_split():
+    report = diff_snapshots(PREVIOUS, CURRENT)
+    assert _movements(report) == {
+        ('I4', 'D'): ('New', None, None),
+        ('1005', 'E'): ('New', None, '46 - 60 Days'),
+        ('I1', 'B'): ('Aged', '30 - 45 Days', '46 - 60 Days'),
+        ('I2', 'A'): ('Aged', None, '30 - 45 Days'),
+        ('I3', 'C'): ('Received', '61 & Above Days', None),
+    }
+    assert report.columns.tolist() == ['Movement', 'Inv No', 'Item Code', 'Qty', 'Amount', 'Days', 'Party',
+                                       'Previous Bucket', 'Bucket']
+    summary = movement_summary(report)
+    assert summary['Lines'].tolist() == [2, 2, 1]
+    assert summary['Qty'].tolist() == [10, 3, 4]
+
+
+def test_duplicate_keys_are_summed():
+    current = pending([('I1', 'A', 5, 36), ('I1', 'A', 3, 50), ('I1', 'B', 2, 46), ('I2', 'A', 1, 30)])
+    report = diff_snapshots(PREVIOUS, current)
+    row = report[(report['Inv No'] == 'I1') & (report['Item Code'] == 'A')].iloc[0]
+    # the oldest Days decides the bucket
+    assert (row['Movement'], row['Qty'], row['Days'], row['Bucket']) == ('Aged', 8, 50, '46 - 60 Days')
+
+
+@pytest.mark.parametrize('empty', ['previous', 'current', 'both'])
+def test_empty_snapshots(empty):
+    previous = PREVIOUS.iloc[:0] if empty in ('previous', 'both') else PREVIOUS
+    current = CURRENT.iloc[:0] if empty in ('current', 'both') else CURRENT
+    report = diff_snapshots(previous, current)
+    expected = {'New': len(current) if len(previous) == 0 else 0,
+                'Aged': 0,
+                'Received': len(previous) if len(current) == 0 else 0}
+    assert movement_summary(report)['Lines'].to_dict() == expected
+
+
+def test_snapshot_round_trip(tmp_path):
+    day = datetime.date(2026, 10, 1)
+    save_snapshot(CURRENT, day, 'sha', directory=str(tmp_path))
+    loaded = load_snapshot(day, directory=str(tmp_path))
+    assert diff_snapshots(loaded, CURRENT)['Movement'].tolist() == []
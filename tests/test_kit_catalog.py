@@ -0,0 +1,69 @@
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from kit_catalog import KitLookup, load_catalog
+
+
+def _lookup(parts):
+    parts = sorted(parts)
+    return KitLookup(pa.array(parts, pa.string()), pa.array([f"K-{p}" for p in parts], pa.string()))
+
+
+def kit_workbook(power, mech, vp):
+    # the three mapping ranges the catalog reads: PSG K:M and S:T, VP B:D
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        pd.DataFrame({'Part': list(power), 'Desc': 'x', 'Kit': list(power.values())}).to_excel(writer, sheet_name='PSG', index=False, startcol=10)
+        pd.DataFrame({'Part': list(mech), 'Kit': list(mech.values())}).to_excel(writer, sheet_name='PSG', index=False, startcol=18)
+        pd.DataFrame({'Part': list(vp), 'Desc': 'x', 'Kit': list(vp.values())}).to_excel(writer, sheet_name='VP', index=False, startcol=1)
+    return buffer.getvalue()
+
+
+def test_snapshot_lookups(tmp_path):
+    power = {'P9': 'K9', 1234: 'K1234', 'P1': 'K1', 'A7': 'KA7', 'P1 ': 'KP1-space'}
+    catalog = load_catalog(kit_workbook(power, {'M2': 'MK2', 'M1': 'MK1'}, {'V1': 'VK1'}), directory=str(tmp_path))
+    lookup = catalog.lookup('power_stg')
+    # scalar access (binary search) and map() (vectorized) agree
+    for part, kit in power.items():
+        assert lookup[part] == kit
+        assert lookup.get(str(part)) == kit
+    assert lookup.get('P2') is None and 'P2' not in lookup
+    parts = np.array(['P1', 1234, 'P2', np.nan, 'A7'], dtype=object)
+    assert lookup.map(parts).tolist() == ['K1', 'K1234', '', '', 'KA7']
+    assert sorted(lookup) == sorted(str(p) for p in power)
+    # rows below the shorter block on the shared PSG sheet read as 'nan', as before
+    assert dict(catalog.lookup('mech')) == {'M1': 'MK1', 'M2': 'MK2', 'nan': ''}
+    assert catalog.lookup('power_vp')['V1'] == 'VK1'
+
+
+def test_empty_lookup():
+    lookup = _lookup([])
+    assert lookup.get('P1') is None
+    assert lookup.map(['P1', 'P2'], default='-').tolist() == ['-', '-']
+
+
+def _get_seconds(lookup, parts, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for part in parts:
+            lookup.get(part)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+@pytest.mark.parametrize('hit', [True, False])
+def test_scalar_lookup_cost_does_not_grow_with_the_slice(hit):
+    small = [f"P{i:07d}" for i in range(2_000)]
+    large = [f"P{i:07d}" for i in range(200_000)]
+    queries = small[::10] if hit else [f"Q{i}" for i in range(200)]
+    small_seconds = _get_seconds(_lookup(small), queries)
+    large_seconds = _get_seconds(_lookup(large), queries)
+    # a binary search reads ~17 instead of ~11 parts; a per-call hash set
+    # over the slice would be ~100x slower on the large one
+    assert large_seconds < 3 * small_seconds + 0.01